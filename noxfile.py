@@ -33,6 +33,30 @@ def test(session: nox.Session):
     session.run("pytest", "./tests/unit/local", env={"LC_CTYPE": "en_US.UTF-8"})
 
 
+@nox.session
+def benchmark(session: nox.Session):
+    """
+    Times the makei parsers on a synthetic project, no IBM i is needed.
+
+    Usage:
+    $ nox -s benchmark -- --dirs 20 --members-per-dir 500 --output benchmark.json
+    """
+    session.env['PYTHONPATH'] = f"{Path(__file__).parent}/src:{Path(__file__).parent}"
+    session.run("python", "-m", "tests.benchmark.run_benchmarks", *session.posargs)
+
+
+@nox.session
+def benchmark_upload(session: nox.Session):
+    """
+    Times copying a source into a QTEMP member with CPYFRMSTMF and with multi-row INSERTs, runs on IBM i.
+
+    Usage:
+    $ nox -s benchmark_upload -- --lines 5000 --repeat 5 --output upload.json
+    """
+    session.env['PYTHONPATH'] = f"{Path(__file__).parent}/src:{Path(__file__).parent}"
+    session.run("python", "-m", "tests.benchmark.upload_benchmark", *session.posargs)
+
+
 VENV_DIR = Path('./.venv').resolve()
 
 
@@ -2,20 +2,58 @@
 
 """ The module used to build a project"""
 from datetime import datetime
+import re
 import shutil
 import sys
 import os
+import time
 from pathlib import Path
-from tempfile import mkstemp
-from typing import Any, Dict, List, Optional
-
-from makei.const import TOBI_PATH, MK_PATH
+from tempfile import mkdtemp, mkstemp
+from typing import Any, Dict, Iterable, List, Optional
+
+from makei import evfevent_deps, joblog_store
+from makei.build_makefile import BUILD_MAKEFILE, generate_build_makefile, remove_rules_mk_build
+from makei.build_state import BuildState
+from makei.evfevent_deps import DEP_DIR, write_dep_file
+from makei.include_scanner import STATIC_DEP_SUFFIX, IncludeScanner
+from makei.const import BUILD_ENV_VAR, DEFAULT_INDEX_IGNORE, TOBI_PATH, MK_PATH
 from makei.ibmi_json import IBMiJson
 from makei.iproj_json import IProjJson
+from makei.db_relations import DB_RELATIONS_FILE, DbRelations
+from makei.native_engine import NativeEngine
+from makei.obj_backup import BACKUP_STRATEGIES
+from makei.project_index import ProjectIndex
 from makei.rules_mk import RulesMk
-from makei.utils import objlib_to_path, \
+from makei.rules_mk_cache import RulesMkCache
+from makei.stmf_ccsid import CRTFRMSTMF_RECIPES, CcsidCache
+from makei.system_facts import SystemFacts
+from makei.utils import objlib_to_path, write_if_changed, \
     run_command, support_color, print_to_stdout, Colors, colored
 
+# Markers printed by logSuccess and logFail in def_rules.mk and by make itself when running with -k
+SUCCESS_PATTERN = re.compile(r"(\S+) was created successfully!")
+FAIL_PATTERN = re.compile(r"Failed to create (\S+?)!")
+NOT_REMADE_PATTERN = re.compile(r"Target [`'](\S+)' not remade because of errors")
+ANSI_ESCAPE_PATTERN = re.compile(r"\x1b\[[0-9;]*m")
+
+
+def resolve_jobs(value: str) -> int:
+    """ Returns the number of make jobs for a --jobs value, 'auto' uses the processor count of the partition
+
+    >>> resolve_jobs("4")
+    4
+    >>> resolve_jobs("auto") >= 1
+    True
+    """
+    if value.lower() == "auto":
+        if hasattr(os, "sched_getaffinity"):
+            return max(len(os.sched_getaffinity(0)), 1)
+        return os.cpu_count() or 1
+    jobs = int(value)
+    if jobs < 1:
+        raise ValueError(f"The number of jobs must be at least 1: {value}")
+    return jobs
+
 
 class BuildEnv:
     """ The Build Environment used to build or compile a project. """
@@ -25,6 +63,7 @@ class BuildEnv:
     src_dir: Path
     targets: List[str]
     make_options: Optional[str]
+    jobs: int
     tobi_path: Path
     tobi_makefile: Path
     build_vars_path: Path
@@ -35,18 +74,37 @@ class BuildEnv:
     iproj_json_path: Path
     iproj_json: IProjJson
     ibmi_env_cmds: str
-
-    tmp_files: List[Path] = []
+    build_tmp_dir: Optional[Path]
+    project_index: ProjectIndex
+    build_state: Optional[BuildState]
+    include_scanner: IncludeScanner
+    engine: str
+    rules_mks: List[RulesMk]
+    up_to_date_targets: List[str]
+    stale_targets: List[str]
+    ccsid_sources: List[Path]
+    relation_libraries: List[str]
+    build_makefile_path: Path
+
+    tmp_files: List[Path]
+    target_sources: Dict[str, Optional[str]]
 
     success_targets: List[str]
     failed_targets: List[str]
 
     def __init__(self, targets: List[str] = None, make_options: Optional[str] = None,
-                 overrides: Dict[str, Any] = None, trace=False):
+                 overrides: Dict[str, Any] = None, trace=False, jobs: int = 1, use_state: bool = True,
+                 engine: str = "make"):
+        # pylint: disable=too-many-arguments
         overrides = overrides or {}
         self.src_dir = Path.cwd()
         self.targets = targets if targets is not None else ["all"]
         self.make_options = make_options if make_options else ""
+        self.jobs = jobs
+        self.engine = engine
+        self.build_tmp_dir = None
+        self.tmp_files = []
+        self.target_sources = {}
         self.tobi_path = Path(
             overrides["tobi_path"]) if "tobi_path" in overrides else TOBI_PATH
         self.tobi_makefile = MK_PATH / 'Makefile'
@@ -64,6 +122,7 @@ class BuildEnv:
             self.trace_dir = None
 
         self.build_vars_path = Path(path)
+        self.build_makefile_path = self.src_dir / BUILD_MAKEFILE
         self.iproj_json_path = self.src_dir / "iproj.json"
         self.iproj_json = IProjJson.from_file(self.iproj_json_path)
         self.color = support_color()
@@ -76,9 +135,34 @@ class BuildEnv:
 
         self.success_targets = []
         self.failed_targets = []
+        # The project is walked once, everything below asks the index instead of the file system
+        self.project_index = ProjectIndex(self.src_dir, DEFAULT_INDEX_IGNORE + self._extra_index_ignore())
+        include_dirs = [Path(include_dir) for include_dir in self.iproj_json.include_path]
+        self.build_state = BuildState(self.src_dir, include_dirs, self.project_index) if use_state else None
+        self.include_scanner = IncludeScanner(self.src_dir, include_dirs, index=self.project_index)
 
         self._create_build_vars()
 
+    def _extra_index_ignore(self) -> List[str]:
+        """ Returns the patterns listed in iproj.json under "extensions": {"makei": {"ignore": [...]}}"""
+        makei_extension = self.iproj_json.extensions.get("makei")
+        if not isinstance(makei_extension, dict):
+            return []
+        patterns = makei_extension.get("ignore", [])
+        return [pattern for pattern in patterns if isinstance(pattern, str)] if isinstance(patterns, list) else []
+
+    def _backup_strategy_var(self) -> str:
+        """ Returns the BACKUP_STRATEGY build variable for iproj.json "extensions": {"makei": {"backup": ...}}"""
+        makei_extension = self.iproj_json.extensions.get("makei")
+        if not isinstance(makei_extension, dict) or "backup" not in makei_extension:
+            return ""
+        strategy = makei_extension["backup"]
+        if strategy not in BACKUP_STRATEGIES:
+            print(colored(f"Warning: unknown backup strategy {strategy} in iproj.json, "
+                          f"expected one of {', '.join(BACKUP_STRATEGIES)}", Colors.WARNING))
+            return ""
+        return f"BACKUP_STRATEGY := {strategy}\n"
+
     def __del__(self):
         if not self._trace:
             self.build_vars_path.unlink()
@@ -98,23 +182,35 @@ class BuildEnv:
             cmd = f"{self.generate_make_cmd()} -r -R -p -q"
             run_command(cmd, stdout_handler=write_line)
 
-    def generate_make_cmd(self):
-        """ Returns the make command used to build the project."""
+    def generate_make_cmd(self, makefile: Optional[Path] = None, targets: Optional[List[str]] = None,
+                          jobs: Optional[int] = None):
+        """ Returns the make command used to build the project, by default the targets with the TOBi Makefile"""
+        makefile = makefile if makefile is not None else self.tobi_makefile
+        targets = targets if targets is not None else self.targets
+        jobs = jobs if jobs is not None else self.jobs
         cmd = f'/QOpenSys/pkgs/bin/make -k BUILDVARSMKPATH="{self.build_vars_path}"' + \
-              f' -k TOBI_PATH="{self.tobi_path}" -f "{self.tobi_makefile}"'
+              f' BUILDMKPATH="{self.build_makefile_path}" -k TOBI_PATH="{self.tobi_path}" -f "{makefile}"'
+        if jobs > 1:
+            # Keep the output of each recipe together so that it is not interleaved with other recipes
+            cmd = f"{cmd} -j{jobs} -Otarget"
+        if self.build_tmp_dir is not None:
+            cmd = f'{cmd} BUILDTMPDIR="{self.build_tmp_dir}"'
         if self.make_options:
             cmd = f"{cmd} {self.make_options}"
-        cmd = f"{cmd} {' '.join(self.targets)}"
+        cmd = f"{cmd} {' '.join(targets)}"
         return cmd
 
     def _create_build_vars(self):
         target_file_path = self.build_vars_path
 
-        rules_mk_paths = list(Path(".").rglob("Rules.mk"))
+        rules_mk_paths = self.project_index.files_named("Rules.mk")
+        rules_mk_cache = RulesMkCache(self.src_dir, map(Path, self.iproj_json.include_path),
+                                      index=self.project_index)
+        rules_mks = []
+        source_paths = {}
         real_targets = []
-        # Create Rules.mk.build for each Rules.mk
         for rules_mk_path in rules_mk_paths:
-            rules_mk = RulesMk.from_file(rules_mk_path,  self.src_dir, map(Path, self.iproj_json.include_path))
+            rules_mk = rules_mk_cache.load(rules_mk_path)
             rules_mk_src_obj_mapping = rules_mk.src_obj_mapping.copy()
             if self.targets and self.targets[0] != "all":
                 for target in self.targets:
@@ -134,16 +230,16 @@ class BuildEnv:
                         if tgt_dir == str(rules_mk.containing_dir) and tgt.upper() in rules_mk_src_obj_mapping:
                             real_targets.extend(rules_mk_src_obj_mapping.pop(tgt.upper()))
             rules_mk.build_context = self
-            rules_mk_build_path = rules_mk_path.parent / ".Rules.mk.build"
-            rules_mk_build_path.write_text(str(rules_mk))
-            self.tmp_files.append(rules_mk_build_path)
-            # Copy to trace directory
-            if self._trace:
-                # Recreate relative folder structure in trace/rules/
-                relative_dir = rules_mk_path.parent.resolve().relative_to(self.src_dir.resolve())
-                trace_rules_subdir = self.trace_dir / "rules" / relative_dir
-                trace_rules_subdir.mkdir(parents=True, exist_ok=True)
-                shutil.copy(rules_mk_build_path, trace_rules_subdir / rules_mk_build_path.name)
+            rules_mks.append(rules_mk)
+            for rule in rules_mk.rules:
+                if not rule.commands:
+                    self.target_sources[rule.target] = rule.source_file.split("/")[-1] if rule.source_file else None
+                    if rule.is_source_file:
+                        source_paths[rule.target] = self.src_dir / rules_mk.containing_dir / \
+                            self.target_sources[rule.target]
+
+        remove_rules_mk_build(self.src_dir, rules_mk_paths, self.project_index)
+        self._write_static_deps(source_paths)
 
         subdirs = list(map(lambda x: x.parents[0], rules_mk_paths))
 
@@ -166,6 +262,39 @@ class BuildEnv:
             incdir = '\'' + '\' \''.join(include_path) + '\''
         elif len(include_path) == 1:
             incdir = include_path[0].upper()
+        if self.build_state is not None:
+            # COLOR_TTY is left out, it does not change the objects created
+            self.build_state.set_common_settings([
+                f"curlib={self.iproj_json.curlib}",
+                f"preUsrlibl={' '.join(self.iproj_json.pre_usr_libl)}",
+                f"postUsrlibl={' '.join(self.iproj_json.post_usr_libl)}",
+                f"INCDIR={incdir}",
+                f"IBMiEnvCmd={self.ibmi_env_cmds}",
+                f"make_options={self.make_options}",
+            ])
+            for rules_mk in rules_mks:
+                build_vars = dir_var_map[rules_mk.containing_dir].build
+                object_dir = objlib_to_path(build_vars['objlib'])
+                self.build_state.add_rules(rules_mk, f"{build_vars['tgt_ccsid']} {object_dir}", object_dir)
+            up_to_date, stale = self.build_state.classify()
+        else:
+            up_to_date, stale = [], []
+        self.rules_mks = rules_mks
+        self.up_to_date_targets = up_to_date
+        self.stale_targets = stale
+
+        # All the rules in one file, kept between builds and only rewritten when something changed
+        self.build_makefile_path.parent.mkdir(parents=True, exist_ok=True)
+        write_if_changed(self.build_makefile_path, generate_build_makefile(rules_mks, up_to_date, stale))
+        if self._trace:
+            shutil.copy(self.build_makefile_path, self.trace_dir / self.build_makefile_path.name)
+
+        system_facts = SystemFacts()
+        system_vars = self._system_vars(system_facts, dir_var_map.values())
+        self.ccsid_sources = self._ccsid_sources(system_facts, rules_mks, dir_var_map, source_paths, up_to_date)
+        self.relation_libraries = self._relation_libraries(rules_mks, dir_var_map, up_to_date)
+        system_facts.save()
+
         with target_file_path.open("w", encoding="utf8") as file:
             file.write(f"""# This file is generated by makei, DO NOT EDIT.
 # Modify .ibmi.json to override values
@@ -178,7 +307,7 @@ unquotedINCDIR := {' '.join(include_path)}
 doublequotedINCDIR := {incdir.replace("'", "''")}
 IBMiEnvCmd := {self.ibmi_env_cmds}
 COLOR_TTY := {'true' if self.color else 'false'}
-
+{self._backup_strategy_var()}{system_vars}
 """)
             for subdir in subdirs:
                 # print(dir_var_map[subdir].build)
@@ -187,6 +316,12 @@ COLOR_TTY := {'true' if self.color else 'false'}
                 file.write(
                     f"OBJPATH_{subdir.absolute()} := {objlib_to_path(dir_var_map[subdir].build['objlib'])}\n")
 
+            # Rebuild decisions from the content fingerprints in .makei/state, also written into build.mk
+            if up_to_date:
+                file.write(f"\nMAKEI_UPTODATE := {' '.join(up_to_date)}\n")
+            if stale:
+                file.write(f"\nMAKEI_STALE := {' '.join(stale)}\n")
+
             # for rules_mk in rules_mks:
             #     with rules_mk.open('r') as rules_mk_file:
             #         lines = rules_mk_file.readlines()
@@ -197,29 +332,135 @@ COLOR_TTY := {'true' if self.color else 'false'}
             #                 file.write(
             #                     f"{line.split(':')[0]}_d := {rules_mk.parents[0].absolute()}\n")
 
+    def _system_vars(self, facts: SystemFacts, ibmi_jsons: Iterable[IBMiJson]) -> str:
+        """ Returns the build variables read from the cached system facts, so that make does not probe them again
+
+        Also warns about the libraries of the build that do not exist.
+        """
+        release = facts.ibmi_release()
+        libraries = [self.iproj_json.curlib] + self.iproj_json.pre_usr_libl + self.iproj_json.post_usr_libl + \
+            [ibmi_json.build["objlib"] for ibmi_json in ibmi_jsons if ibmi_json.build["objlib"]]
+        missing_libraries = facts.missing_libraries(libraries)
+        if missing_libraries:
+            print(colored(f"Warning: these libraries do not exist: {' '.join(missing_libraries)}", Colors.WARNING))
+
+        system_vars = f"SYS_ENCODING := {sys.getdefaultencoding()}\n"
+        if release is not None:
+            # The compatibility mode of def_rules.mk is for releases older than V7R5M0
+            system_vars += f"IBMiRelease := {release}\n" \
+                           f"COMPATIBILITYMODE := {'true' if int(release) < 750 else 'false'}\n"
+        return system_vars
+
+    @staticmethod
+    def _ccsid_sources(facts: SystemFacts, rules_mks: List[RulesMk], dir_var_map: Dict[Path, IBMiJson],
+                       source_paths: Dict[str, Path], up_to_date: List[str]) -> List[Path]:
+        """ Returns the sources to build with crtfrmstmf that will need their own CCSID
+
+        crtfrmstmf only reads the CCSID of the source when the target CCSID of the directory is not valid.
+        """
+        sources = []
+        for rules_mk in rules_mks:
+            if facts.is_valid_ccsid(dir_var_map[rules_mk.containing_dir].build["tgt_ccsid"] or ""):
+                continue
+            for rule in rules_mk.rules:
+                if rule.target in source_paths and rule.target not in up_to_date and \
+                        rule.recipe_name in CRTFRMSTMF_RECIPES:
+                    sources.append(source_paths[rule.target])
+        return sources
+
+    @staticmethod
+    def _relation_libraries(rules_mks: List[RulesMk], dir_var_map: Dict[Path, IBMiJson],
+                            up_to_date: List[str]) -> List[str]:
+        """ Returns the object libraries of the physical files to build, whose dependents crtfrmstmf deletes"""
+        libraries = set()
+        for rules_mk in rules_mks:
+            objlib = dir_var_map[rules_mk.containing_dir].build["objlib"]
+            if not objlib or objlib.startswith(("*", "&", "$")):
+                continue
+            if any(rule.recipe_name == "PF_TO_FILE_RECIPE" and rule.target not in up_to_date
+                   for rule in rules_mk.rules):
+                libraries.add(objlib.upper())
+        return sorted(libraries)
+
+    def _write_static_deps(self, source_paths: Dict[str, Path]):
+        """ Writes the includes found in the sources, known before the first compile, to .deps/<TARGET>.static.d"""
+        dep_dir = self.src_dir / DEP_DIR
+        for target, includes in self.include_scanner.graph(source_paths).items():
+            write_dep_file(dep_dir, target, [include.resolve() for include in includes], STATIC_DEP_SUFFIX,
+                           "the include directives")
+
     def make(self):
         """ Generate and execute the make command."""
-        if (self.src_dir / ".logs" / "joblog.json").exists():
-            (self.src_dir / ".logs" / "joblog.json").unlink()
-        if (self.src_dir / ".logs" / "output.log").exists():
-            (self.src_dir / ".logs" / "output.log").unlink()
-
-        def handle_make_output(line_bytes: bytes):
-            if isinstance(line_bytes, bytes):
-                line = line_bytes.decode(sys.getdefaultencoding())
-            if "Failed to create" in line:
-                self.failed_targets.append(line.split()[-1].split("!")[0])
-            if "was created successfully!" in line:
-                self.success_targets.append(line.split()[1])
-            print_to_stdout(line)
-
-        run_command(self.generate_make_cmd(), handle_make_output)
+        logs_dir = self.src_dir / ".logs"
+        joblog_store.clear(logs_dir / "joblog.json")
+        logs_dir.mkdir(exist_ok=True)
+        # Temporary files of the recipes, e.g. the extracted SQL statements, are private to this build
+        self.build_tmp_dir = Path(mkdtemp(prefix="makei-"))
+        start_time = time.time()
+        self.include_scanner.save()
+        if self.ccsid_sources:
+            # One query for all the sources instead of an `attr` in each crtfrmstmf
+            ccsid_cache = CcsidCache(self.src_dir)
+            ccsid_cache.prefetch(self.ccsid_sources)
+            ccsid_cache.save()
+        if self.relation_libraries:
+            # One query per library instead of a DSPDBR for each physical file created again
+            DbRelations.create(self.build_tmp_dir / DB_RELATIONS_FILE, self.relation_libraries)
+
+        # Tells the recipes not to merge their joblog entries, _post_make does it once
+        os.environ[BUILD_ENV_VAR] = "1"
+        with (logs_dir / "output.log").open("wb") as output_log:
+            def handle_make_output(line_bytes: bytes):
+                # The build is the only writer of output.log, the recipes write to their own .splf files
+                output_log.write(line_bytes)
+                self.handle_make_output_line(line_bytes.decode(sys.getdefaultencoding(), errors="replace"))
+                print_to_stdout(line_bytes)
+
+            if self.engine == "native":
+                NativeEngine(self).run(handle_make_output)
+            else:
+                run_command(self.generate_make_cmd(), handle_make_output)
+        # Record the includes read by the compiles, so that a change to an include rebuilds the objects using it
+        built_targets = [target for target in self.success_targets if target in self.target_sources]
+        evfevent_deps.update_dep_files(self.src_dir, built_targets, self.target_sources, start_time,
+                                       self.project_index)
+        if self.build_state is not None:
+            self.build_state.refresh()
+            self.build_state.update(self.success_targets, self.failed_targets)
+            self.build_state.save()
         self._post_make()
         return not self.failed_targets
 
+    def handle_make_output_line(self, line: str):
+        """ Records the targets reported in a line of the make output
+
+        Each target is counted once, a target reported as failed stays failed.
+        """
+        line = ANSI_ESCAPE_PATTERN.sub("", line)
+        for match in SUCCESS_PATTERN.finditer(line):
+            target = match.group(1)
+            if target not in self.failed_targets and target not in self.success_targets:
+                self.success_targets.append(target)
+        failed = [match.group(1) for match in FAIL_PATTERN.finditer(line)]
+        # make reports the goals it did not make, which are objects only when they are rule targets and not e.g.
+        # all or dir_QRPGLESRC
+        failed += [match.group(1) for match in NOT_REMADE_PATTERN.finditer(line)
+                   if match.group(1) in self.target_sources]
+        for target in failed:
+            if target in self.success_targets:
+                self.success_targets.remove(target)
+            if target not in self.failed_targets:
+                self.failed_targets.append(target)
+
     def _post_make(self):
         for tmp_file in self.tmp_files:
             tmp_file.unlink(missing_ok=True)
+        if self.build_tmp_dir is not None:
+            shutil.rmtree(self.build_tmp_dir, ignore_errors=True)
+            self.build_tmp_dir = None
+        # Recipes append their joblog entries to per-object segments, which are merged once here
+        os.environ.pop(BUILD_ENV_VAR, None)
+        joblog_store.merge_segments(self.src_dir / ".logs" / "joblog.json")
         print(colored("Objects:            ", Colors.BOLD), colored(f"{len(self.failed_targets)} failed", Colors.FAIL),
               colored(f"{len(self.success_targets)} succeed", Colors.OKGREEN),
               f"{len(self.success_targets) + len(self.failed_targets)} total")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+""" Writes the rules of the whole project into one makefile, .makei/build.mk, included by Makefile
+
+Makefile used to walk the directories itself: footer.mk included the .Rules.mk.build written next to each
+Rules.mk and generated the rule of every target with $(eval). The same rules are now written out here, with
+absolute source paths and the per-target variables set once, so make reads a single file and nothing is
+written into the source directories.
+"""
+
+import os
+from pathlib import Path
+from typing import Collection, Dict, List, Optional
+
+from makei.project_index import ProjectIndex
+from makei.rules_mk import RulesMk
+
+BUILD_MAKEFILE = Path(".makei") / "build.mk"
+
+# The generic rule of `makei build -d`, dir_QRPGLESRC builds dir_<TOP>/QRPGLESRC
+DIR_PATTERN_RULE = """slashify = $(subst _,/,$(1))
+
+dir_% : dir_$$(TOP)/$$(call slashify,$$(subst dir_,,$$(@)))
+\t@echo
+"""
+
+
+def _directory_key(directory: Path) -> Path:
+    return Path(os.path.normpath(directory))
+
+
+def _subtree(rules_mks: Dict[Path, RulesMk], directory: Path, order: List[RulesMk]):
+    """ Appends the RulesMk of directory and of its SUBDIRS to order, in the order make included them"""
+    rules_mk = rules_mks.get(_directory_key(directory))
+    if rules_mk is None or rules_mk in order:
+        return
+    order.append(rules_mk)
+    for subdir in rules_mk.subdirs:
+        _subtree(rules_mks, rules_mk.containing_dir / subdir, order)
+
+
+def generate_build_makefile(rules_mks: List[RulesMk], up_to_date: Collection[str] = (),
+                            stale: Collection[str] = ()) -> str:
+    """ Returns the content of .makei/build.mk for the parsed Rules.mk files of the project
+
+    Like the recursive include it replaces, only the directories reachable from the root Rules.mk through
+    SUBDIRS are part of the build.
+    """
+    by_directory = {_directory_key(rules_mk.containing_dir): rules_mk for rules_mk in rules_mks}
+    order: List[RulesMk] = []
+    _subtree(by_directory, Path("."), order)
+
+    own_targets = {}
+    subdirs = {}
+    for rules_mk in order:
+        directory = rules_mk.containing_dir.absolute()
+        own_targets[directory] = [target for targets in rules_mk.targets.values() for target in targets]
+        subdirs[directory] = [(rules_mk.containing_dir / subdir).absolute() for subdir in rules_mk.subdirs
+                              if _directory_key(rules_mk.containing_dir / subdir) in by_directory]
+
+    def directory_targets(directory: Path) -> List[str]:
+        # A directory only grouping others builds the targets of its subdirectories
+        if own_targets[directory]:
+            return own_targets[directory]
+        return [target for subdir in subdirs[directory] for target in directory_targets(subdir)]
+
+    up_to_date = set(up_to_date)
+    stale = set(stale)
+    blocks = ["# This file is generated by makei, DO NOT EDIT.\n# Modify the Rules.mk files instead\n"]
+    for rules_mk in order:
+        directory = rules_mk.containing_dir.absolute()
+        block = [f"# {rules_mk.containing_dir}",
+                 f"SUBDIRS_{directory} := {' '.join(map(str, subdirs[directory]))}",
+                 f"TARGETS_{directory} := {' '.join(directory_targets(directory))}",
+                 ""]
+        block.extend(rule.flat_str(directory, rule.target in up_to_date, rule.target in stale)
+                     for rule in rules_mk.rules)
+        # Targets named by an absolute path are removed by dist_clean together with the object directory
+        clean = [target for target in own_targets[directory] if target.startswith("/")]
+        block += [f".PHONY: dir_{directory} tree_{directory} clean_{directory} clean_extra_{directory} "
+                  f"clean_tree_{directory} dist_clean_{directory}",
+                  f"CLEAN_{directory} := {' '.join(clean)}",
+                  f"dir_{directory} : {' '.join(directory_targets(directory))}",
+                  f"tree_{directory} : "
+                  f"{' '.join(own_targets[directory] + [f'tree_{subdir}' for subdir in subdirs[directory]])}",
+                  f"clean_{directory} :",
+                  "\t$(info cleaning $(CLEAN_DIR))",
+                  f"clean_tree_{directory} : "
+                  f"{' '.join([f'clean_{directory}'] + [f'clean_tree_{subdir}' for subdir in subdirs[directory]])}",
+                  f"clean_all :: clean_{directory}",
+                  # dist_clean removes the whole TOP_BUILD_DIR at once in skel.mk when it is set
+                  "ifeq ($(strip $(TOP_BUILD_DIR)),)",
+                  f"dist_clean :: dist_clean_{directory}",
+                  f"dist_clean_{directory} :{f' clean_extra_{directory}' if clean else ''}",
+                  "\trm -rf $(DIST_CLEAN_DIR)",
+                  "endif",
+                  ""]
+        blocks.append("\n".join(block))
+
+    # make used to read `all ::` of a directory after the ones of its subdirectories, which sets the build order
+    def all_rules(directory: Path) -> List[str]:
+        return [rule for subdir in subdirs[directory] for rule in all_rules(subdir)] + \
+            [f"all :: {' '.join(own_targets[directory])}"]
+    if order:
+        blocks.append("\n".join(all_rules(order[0].containing_dir.absolute())) + "\n")
+    blocks.append(".SECONDARY: $(OBJPATH)\n")
+    blocks.append(DIR_PATTERN_RULE)
+    return "\n".join(blocks)
+
+
+def remove_rules_mk_build(src_dir: Path, rules_mk_paths: List[Path], index: Optional[ProjectIndex] = None):
+    """ Removes the .Rules.mk.build files earlier versions wrote next to each Rules.mk"""
+    for rules_mk_path in rules_mk_paths:
+        path = rules_mk_path.parent / ".Rules.mk.build"
+        if index.exists(path) if index is not None else (src_dir / path).exists():
+            (src_dir / path).unlink(missing_ok=True)
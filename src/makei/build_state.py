@@ -0,0 +1,187 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+""" Content fingerprints of the build targets, stored in .makei/state
+
+GNU make decides what to rebuild by comparing the mtime of a source with the mtime of its object, so a
+`git checkout` rebuilds everything and a change to a target variable in Rules.mk rebuilds nothing.
+The fingerprint of a target hashes the content of its source and dependencies, including the includes
+found by the include scanner and in its events file (see evfevent_deps), the fingerprints of the targets
+it depends on and everything that goes into its compile command. After a build the fingerprints of the
+targets created successfully are recorded. In the next build a target is
+- up to date if its fingerprint is unchanged and the object still exists, make skips it whatever the mtimes
+- stale if its fingerprint changed, make rebuilds it whatever the mtimes
+- left to make if nothing has been recorded for it yet
+"""
+
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from makei.const import MK_PATH
+from makei.evfevent_deps import DEP_DIR, read_dep_file
+from makei.include_scanner import STATIC_DEP_SUFFIX
+from makei.project_index import ProjectIndex
+from makei.rules_mk import MKRule, RulesMk
+from makei.utils import atomic_write
+
+STATE_DIR = Path(".makei") / "state"
+STATE_FILE = "fingerprints.json"
+
+# Files defining the recipes and the default compile settings
+RECIPE_FILES = ["def_rules.mk", "skel.mk"]
+
+
+def _hash_file(path: Path) -> Optional[str]:
+    try:
+        with path.open("rb") as file:
+            return hashlib.sha256(file.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def overridable_variables(def_rules_path: Path = MK_PATH / "def_rules.mk") -> List[str]:
+    """ Returns the compile settings of def_rules.mk that can be overridden from the environment"""
+    try:
+        content = def_rules_path.read_text(encoding="utf-8")
+    except OSError:
+        return []
+    return sorted(set(re.findall(r"^ifndef\s+(\w+)", content, re.MULTILINE)))
+
+
+class BuildState:
+    """ Computes the fingerprints of the targets and keeps the ones recorded by the previous builds"""
+    # pylint: disable=too-many-instance-attributes
+
+    src_dir: Path
+    state_path: Path
+    recorded: Dict[str, str]
+    fingerprints: Dict[str, str]
+
+    def __init__(self, src_dir: Path, include_dirs: Iterable[Path] = (), index: Optional[ProjectIndex] = None):
+        self.src_dir = src_dir
+        self.include_dirs = [src_dir / include_dir for include_dir in include_dirs]
+        self.index = index
+        self.state_path = src_dir / STATE_DIR / STATE_FILE
+        self.recorded = self._load()
+        self.fingerprints = {}
+        self._rules: Dict[str, MKRule] = {}
+        self._settings: Dict[str, str] = {}
+        self._object_paths: Dict[str, str] = {}
+        self._file_hashes: Dict[Path, Optional[str]] = {}
+        self._common = ""
+
+    def _load(self) -> Dict[str, str]:
+        try:
+            with self.state_path.open(encoding="utf-8") as file:
+                recorded = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        return recorded if isinstance(recorded, dict) else {}
+
+    def save(self):
+        """ Writes the recorded fingerprints, replacing the file in one go"""
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(self.state_path, json.dumps(self.recorded, indent=1, sort_keys=True))
+
+    def set_common_settings(self, settings: Iterable[str]):
+        """ Settings shared by all compile commands, e.g. the library list and the recipe definitions"""
+        common = list(settings)
+        for recipe_file in RECIPE_FILES:
+            common.append(f"{recipe_file}={_hash_file(MK_PATH / recipe_file)}")
+        for var in overridable_variables():
+            if var in os.environ:
+                common.append(f"{var}={os.environ[var]}")
+        self._common = "\n".join(common)
+
+    def add_rules(self, rules_mk: RulesMk, dir_settings: str, object_dir: str):
+        """ Adds the targets of a Rules.mk, dir_settings are the settings of its directory, e.g. TGTCCSID"""
+        for rule in rules_mk.rules:
+            # Custom recipes are left to make
+            if rule.commands:
+                continue
+            self._rules[rule.target] = rule
+            self._settings[rule.target] = dir_settings
+            self._object_paths[rule.target] = f"{object_dir}/{rule.target}"
+
+    def _file_hash(self, path: Path) -> Optional[str]:
+        if path not in self._file_hashes:
+            self._file_hashes[path] = _hash_file(path)
+        return self._file_hashes[path]
+
+    def _resolve_file(self, name: str, containing_dir: Path) -> Optional[Path]:
+        if name.startswith("$(d)/"):
+            name = name[len("$(d)/"):]
+        for directory in [self.src_dir / containing_dir] + self.include_dirs:
+            path = directory / name
+            if self.index.is_file(path) if self.index is not None else path.is_file():
+                return path
+        return None
+
+    def _dependency_hash(self, name: str, containing_dir: Path, visiting: Set[str]) -> str:
+        if name.upper() in self._rules:
+            return self.fingerprint(name.upper(), visiting) or ""
+        path = self._resolve_file(name, containing_dir)
+        if path is None:
+            # Objects built outside the project, e.g. in the library list
+            return name
+        return f"{name}:{self._file_hash(path)}"
+
+    def fingerprint(self, target: str, visiting: Optional[Set[str]] = None) -> Optional[str]:
+        """ Returns the fingerprint of a target, None if it is not tracked"""
+        if target in self.fingerprints:
+            return self.fingerprints[target]
+        rule = self._rules.get(target)
+        if rule is None:
+            return None
+        visiting = visiting if visiting is not None else set()
+        if target in visiting:
+            # A dependency cycle, make reports it
+            return None
+        visiting.add(target)
+
+        sha = hashlib.sha256()
+        for part in [self._common, self._settings[target], str(rule)]:
+            sha.update(part.encode("utf-8"))
+            sha.update(b"\0")
+        names = ([rule.source_file] if rule.source_file else []) + rule.dependencies + \
+            read_dep_file(self.src_dir / DEP_DIR, target) + \
+            read_dep_file(self.src_dir / DEP_DIR, target, STATIC_DEP_SUFFIX)
+        for name in names:
+            sha.update(self._dependency_hash(name, rule.containing_dir, visiting).encode("utf-8"))
+            sha.update(b"\0")
+
+        visiting.discard(target)
+        self.fingerprints[target] = sha.hexdigest()
+        return self.fingerprints[target]
+
+    def refresh(self):
+        """ Forgets the fingerprints computed so far, e.g. after the build updated the dependency files"""
+        self.fingerprints = {}
+        self._file_hashes = {}
+
+    def classify(self) -> Tuple[List[str], List[str]]:
+        """ Returns the targets that are up to date and the ones that are stale"""
+        up_to_date = []
+        stale = []
+        for target in self._rules:
+            recorded = self.recorded.get(target)
+            if recorded is None:
+                continue
+            if recorded != self.fingerprint(target):
+                stale.append(target)
+            elif os.path.exists(self._object_paths[target]):
+                up_to_date.append(target)
+        return up_to_date, stale
+
+    def update(self, success_targets: Iterable[str], failed_targets: Iterable[str]):
+        """ Records the fingerprints of the targets created and forgets the ones that failed"""
+        for target in success_targets:
+            fingerprint = self.fingerprint(target.upper())
+            if fingerprint is not None:
+                self.recorded[target.upper()] = fingerprint
+        for target in failed_targets:
+            self.recorded.pop(target.upper(), None)
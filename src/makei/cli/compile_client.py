@@ -0,0 +1,88 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+""" Thin client forwarding crtfrmstmf and launch requests to a running `makei serve` compile server"""
+
+import json
+import os
+import socket
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from makei.const import BUILD_ENV_VAR, DEFAULT_SERVER_SOCKET, SERVER_SOCKET_ENV, SERVER_UNAVAILABLE_EXIT_CODE
+
+# Environment variables read by the recipes that have to be replayed in the server's job
+FORWARDED_ENV_VARS = ["curlib", "preUsrlibl", "postUsrlibl", "IBMiEnvCmd", "tmpCurlib", BUILD_ENV_VAR]
+
+
+def get_socket_path() -> Path:
+    """ Returns the socket path of the compile server"""
+    return Path(os.environ.get(SERVER_SOCKET_ENV, str(DEFAULT_SERVER_SOCKET)))
+
+
+def connect(socket_path: Optional[Path] = None) -> Optional[socket.socket]:
+    """ Connects to the compile server, returns None if it is not running"""
+    if socket_path is None:
+        socket_path = get_socket_path()
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(str(socket_path))
+    except OSError:
+        client.close()
+        return None
+    return client
+
+
+def send_request(request: Dict, socket_path: Optional[Path] = None, out=None) -> int:
+    """ Sends a single request to the compile server and streams its output to `out`
+
+    Returns:
+        int: the exit code reported by the server, or SERVER_UNAVAILABLE_EXIT_CODE if the server
+        cannot be reached before the request was accepted
+    """
+    if out is None:
+        out = sys.stdout
+    client = connect(socket_path)
+    if client is None:
+        return SERVER_UNAVAILABLE_EXIT_CODE
+    with client, client.makefile("rwb") as stream:
+        try:
+            stream.write(json.dumps(request).encode("utf-8") + b"\n")
+            stream.flush()
+        except OSError:
+            return SERVER_UNAVAILABLE_EXIT_CODE
+        for line in stream:
+            message = json.loads(line)
+            if "out" in message:
+                out.write(message["out"])
+                out.flush()
+            elif "exit" in message:
+                return message["exit"]
+    # The server went away in the middle of the request
+    print("Lost connection to the compile server", file=sys.stderr)
+    return 1
+
+
+def build_request(kind: str, argv: List[str]) -> Dict:
+    """ Builds a request replaying the current working directory and the library list settings"""
+    return {
+        "kind": kind,
+        "argv": argv,
+        "cwd": os.getcwd(),
+        "env": {var: os.environ[var] for var in FORWARDED_ENV_VARS if var in os.environ},
+    }
+
+
+def cli():
+    """
+    compile client entry: compile_client.py <crtfrmstmf|launch> [arguments...]
+    """
+    if len(sys.argv) < 2 or sys.argv[1] not in ("crtfrmstmf", "launch"):
+        print("Usage: compile_client.py <crtfrmstmf|launch> [arguments...]", file=sys.stderr)
+        sys.exit(2)
+    sys.exit(send_request(build_request(sys.argv[1], sys.argv[2:])))
+
+
+if __name__ == "__main__":
+    cli()
@@ -2,7 +2,9 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import os
 
+from makei import joblog_store
 from makei.ibm_job import save_joblog_json
 
 
@@ -52,6 +54,7 @@ def cli():
     args = parser.parse_args()
     save_joblog_json(args.cmd, args.cmdtime, args.jobid, args.object, args.source, args.output,
                      False if args.failed == "False" else True, args.f)
+    joblog_store.merge_if_standalone(args.f, os.environ)
 
 
 if __name__ == "__main__":
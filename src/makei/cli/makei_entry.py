@@ -8,8 +8,9 @@ import sys
 
 from makei import __version__
 from makei import init_project
-from makei.build import BuildEnv
-from makei.cvtsrcpf import CvtSrcPf
+from makei.build import BuildEnv, resolve_jobs
+from makei.compile_server import request_server, serve
+from makei.cvtsrcpf import ALL_SRCFILES, SYNC_MANIFEST, CvtSrcPf, cvtsrcpf_library
 from makei.utils import Colors, colored, decompose_filename
 from pathlib import Path
 
@@ -28,6 +29,7 @@ def cli():
     add_compile_parser(subparsers)
     add_build_parser(subparsers)
     add_cvtsrcpf_parser(subparsers)
+    add_serve_parser(subparsers)
     parser.add_argument(
         '-l', '--log',
         help="log build files and output the make command without executing it; "
@@ -75,6 +77,26 @@ def add_build_parser(subparsers: argparse.ArgumentParser):
         help='options to pass to make',
         metavar='<options>',
     )
+    build_parser.add_argument(
+        '-j',
+        '--jobs',
+        help='number of objects to build in parallel, auto uses the processor count',
+        metavar='<N|auto>',
+        type=jobs_type,
+        default=1,
+    )
+    build_parser.add_argument(
+        '--no-state',
+        help='decide what to rebuild from the modification times only, ignoring .makei/state',
+        action='store_true'
+    )
+    build_parser.add_argument(
+        '--engine',
+        help='make runs GNU make over the whole project, native orders the objects in makei and runs '
+             'make for one object at a time',
+        choices=['make', 'native'],
+        default='make',
+    )
     build_parser.add_argument(
         '--tobi-path',
         help='path to the TOBi directory',
@@ -113,6 +135,26 @@ def add_compile_parser(subparsers: argparse.ArgumentParser):
         help='options to pass to make',
         metavar='<options>',
     )
+    compile_parser.add_argument(
+        '-j',
+        '--jobs',
+        help='number of objects to build in parallel, auto uses the processor count',
+        metavar='<N|auto>',
+        type=jobs_type,
+        default=1,
+    )
+    compile_parser.add_argument(
+        '--no-state',
+        help='decide what to rebuild from the modification times only, ignoring .makei/state',
+        action='store_true'
+    )
+    compile_parser.add_argument(
+        '--engine',
+        help='make runs GNU make over the whole project, native orders the objects in makei and runs '
+             'make for one object at a time',
+        choices=['make', 'native'],
+        default='make',
+    )
     compile_parser.add_argument(
         '-e',
         '--env',
@@ -155,7 +197,8 @@ def add_cvtsrcpf_parser(subparsers: argparse.ArgumentParser):
 
     cvtsrcpf_parser.add_argument(
         "file",
-        help='the name of the source file',
+        help=f'the name of the source file, {ALL_SRCFILES} converts every source file of the library into '
+             'a directory of its name',
         metavar='<file>',
     )
 
@@ -190,10 +233,76 @@ def add_cvtsrcpf_parser(subparsers: argparse.ArgumentParser):
         action='store_true'
     )
 
+    cvtsrcpf_parser.add_argument(
+        "-j",
+        "--jobs",
+        help='number of members to convert in parallel, auto uses the processor count',
+        metavar='<N|auto>',
+        type=jobs_type,
+        default=1,
+    )
+
+    cvtsrcpf_parser.add_argument(
+        "-s",
+        "--sync",
+        help=f'only convert the members changed since the last sync, recorded in {SYNC_MANIFEST}, '
+             'and write over their files',
+        action='store_true'
+    )
+
     cvtsrcpf_parser.set_defaults(tolower=False)
     cvtsrcpf_parser.set_defaults(handle=handle_cvtsrcpf)
 
 
+def add_serve_parser(subparsers: argparse.ArgumentParser):
+    """Add subparsers for serve commands"""
+    serve_parser = subparsers.add_parser(
+        'serve',
+        help='run a compile server that keeps IBM i jobs connected across compiles',
+        description='Runs in the foreground and serves crtfrmstmf and launch requests from builds on the same '
+                    'partition over a Unix socket. Builds fall back to starting their own jobs when no server '
+                    'is running.'
+    )
+    serve_parser.add_argument(
+        '--socket',
+        help='path of the Unix socket, defaults to $MAKEI_SERVER_SOCKET or ~/.cache/makei/server.sock',
+        metavar='<path>',
+    )
+    serve_parser.add_argument(
+        '--prestart',
+        help='number of jobs to connect before accepting requests',
+        metavar='<count>',
+        type=int,
+        default=0
+    )
+    serve_parser.add_argument(
+        '--max-jobs',
+        help='maximum number of jobs kept connected, defaults to 8',
+        metavar='<count>',
+        type=int,
+        default=8
+    )
+    serve_parser.add_argument(
+        '--idle-timeout',
+        help='seconds after which an idle job is disconnected, defaults to 600',
+        metavar='<seconds>',
+        type=float,
+        default=600
+    )
+    serve_action_group = serve_parser.add_mutually_exclusive_group()
+    serve_action_group.add_argument(
+        '--stop',
+        help='stop the running compile server',
+        action='store_true'
+    )
+    serve_action_group.add_argument(
+        '--status',
+        help='print the job pool counters of the running compile server',
+        action='store_true'
+    )
+    serve_parser.set_defaults(handle=handle_serve)
+
+
 def add_info_parser(subparsers: argparse.ArgumentParser):
     """Add subparsers for info commands"""
     info_parser = subparsers.add_parser(
@@ -267,7 +376,8 @@ def handle_compile(args):
             source_names.append(name)
             targets = read_and_filter_rules_mk(source_names)
     print(colored("targets: " + ', '.join(targets), Colors.OKBLUE))
-    build_env = BuildEnv(targets, args.make_options, get_override_vars(args), trace=args.log)
+    build_env = BuildEnv(targets, args.make_options, get_override_vars(args), trace=args.log, jobs=args.jobs,
+                         use_state=not args.no_state, engine=args.engine)
     if args.log:
         build_env.dump_resolved_makefile()
     else:
@@ -293,7 +403,8 @@ def handle_build(args):
 
     else:
         target = "all"
-    build_env = BuildEnv([target], args.make_options, get_override_vars(args), trace=args.log)
+    build_env = BuildEnv([target], args.make_options, get_override_vars(args), trace=args.log, jobs=args.jobs,
+                         use_state=not args.no_state, engine=args.engine)
     if args.log:
         build_env.dump_resolved_makefile()
     else:
@@ -303,6 +414,14 @@ def handle_build(args):
             sys.exit(1)
 
 
+def jobs_type(value: str) -> int:
+    """ argparse type of the --jobs option"""
+    try:
+        return resolve_jobs(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"expected a positive number or auto: {value}") from e
+
+
 def make_dir_target(filename):
     return f"dir_{filename.replace('/', '_')}"
 
@@ -313,7 +432,33 @@ def handle_cvtsrcpf(args):
     """
     if args.log:
         print(colored("Warning: --trace has no effect on 'cvtsrcpf' command.", Colors.WARNING))
-    CvtSrcPf(args.file, args.library, args.tolower, args.ccsid, args.text).run()
+    if args.file.upper() == ALL_SRCFILES:
+        cvtsrcpf_library(args.library, args.tolower, args.ccsid, args.text, Path.cwd(), args.jobs, args.sync)
+        return
+    cvtsrcpf = CvtSrcPf(args.file, args.library, args.tolower, args.ccsid, args.text, jobs=args.jobs,
+                        sync=args.sync)
+    try:
+        cvtsrcpf.run()
+    finally:
+        cvtsrcpf.close()
+
+
+def handle_serve(args):
+    """
+    Processing the serve command
+    """
+    if args.log:
+        print(colored("Warning: --log has no effect on 'serve' command.", Colors.WARNING))
+    socket_path = Path(args.socket) if args.socket else None
+    if args.stop:
+        sys.exit(0 if request_server("shutdown", socket_path) == 0 else 1)
+    elif args.status:
+        sys.exit(0 if request_server("stats", socket_path) == 0 else 1)
+    else:
+        if args.max_jobs < 2:
+            print(colored("--max-jobs must be at least 2", Colors.FAIL))
+            sys.exit(1)
+        serve(socket_path, args.prestart, args.max_jobs, args.idle_timeout)
 
 
 def get_override_vars(args):
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+""" Long-lived compile server used by `makei serve`
+
+Every crtfrmstmf and launch recipe otherwise starts a new python process, imports ibm_db_dbi and opens
+its own database connections. The compile server keeps connected jobs around and runs those requests
+in-process. `scripts/crtfrmstmf` and `scripts/launch` forward their arguments through
+`makei/cli/compile_client.py` and fall back to running locally when no server is listening.
+
+Protocol: the client sends one JSON object per connection,
+    {"kind": "crtfrmstmf" | "launch" | "stats" | "shutdown", "argv": [...], "cwd": "...", "env": {...}}
+and the server answers with JSON lines, {"out": "<text>"} for output and a final {"exit": <code>}.
+"""
+
+import json
+import os
+import socketserver
+import sys
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from makei.cli.compile_client import connect, get_socket_path, send_request
+from makei import joblog_store
+from makei.const import SERVER_UNAVAILABLE_EXIT_CODE
+from makei.crtfrmstmf import create_parser, run_from_args
+from makei.ibm_job import IBMJob, IBMJobPool, save_joblog_json
+from makei.utils import Colors, colored, format_datetime
+
+
+class _ThreadLocalStdout():
+    """ sys.stdout replacement that sends each request thread's output to its own client"""
+
+    def __init__(self, default):
+        self.default = default
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def redirect(self, stream):
+        # Make sure we are still installed, e.g. if something swapped sys.stdout after the server started
+        with self._lock:
+            if sys.stdout is not self:
+                self.default = sys.stdout
+                sys.stdout = self
+        self._local.stream = stream
+
+    def release(self):
+        self._local.stream = None
+
+    def _current(self):
+        stream = getattr(self._local, "stream", None)
+        return stream if stream is not None else self.default
+
+    def write(self, text: str) -> int:
+        return self._current().write(text)
+
+    def flush(self):
+        self._current().flush()
+
+
+class _ClientWriter():
+    """ File-like object wrapping the output of a request into {"out": ...} messages"""
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def write(self, text: str) -> int:
+        if text:
+            self.send({"out": text})
+        return len(text)
+
+    def flush(self):
+        self.wfile.flush()
+
+    def send(self, message: Dict):
+        self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+
+class CompileRequestHandler(socketserver.StreamRequestHandler):
+    """ Handles one request per connection"""
+
+    server: "CompileServer"
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        writer = _ClientWriter(self.wfile)
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError:
+            writer.send({"out": "Invalid request\n"})
+            writer.send({"exit": 2})
+            return
+
+        kind = request.get("kind")
+        if kind == "stats":
+            writer.send({"out": self.server.pool.summary() + "\n"})
+            writer.send({"exit": 0})
+            return
+        if kind == "shutdown":
+            writer.send({"exit": 0})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return
+        if kind not in ("crtfrmstmf", "launch"):
+            writer.send({"out": f"Unknown request: {kind}\n"})
+            writer.send({"exit": 2})
+            return
+
+        self.server.stdout.redirect(writer)
+        try:
+            exit_code = self.server.run_request(kind, request)
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else 1
+        # pylint: disable=broad-except
+        except Exception as e:
+            print(f"Compile server failed to handle the request: {e}")
+            exit_code = 1
+        finally:
+            self.server.stdout.release()
+        writer.send({"exit": exit_code})
+
+
+class CompileServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """ Unix socket server running crtfrmstmf and launch requests on pooled jobs"""
+
+    daemon_threads = True
+    pool: IBMJobPool
+    stdout: _ThreadLocalStdout
+
+    def __init__(self, socket_path: Path, prestart: int = 0, max_jobs: int = 8, idle_timeout: float = 600):
+        # pylint: disable=too-many-arguments
+        self.socket_path = socket_path
+        socket_path.parent.mkdir(parents=True, exist_ok=True)
+        if socket_path.exists():
+            # A socket nobody listens on is left over from a server that did not shut down cleanly
+            client = connect(socket_path)
+            if client is not None:
+                client.close()
+                raise OSError(f"A compile server is already listening on {socket_path}")
+            socket_path.unlink()
+        super().__init__(str(socket_path), CompileRequestHandler)
+        os.chmod(socket_path, 0o600)
+        self.stdout = _ThreadLocalStdout(sys.stdout)
+        self.pool = IBMJobPool(max_jobs, idle_timeout)
+        for job in self.pool.lease_many([None] * min(prestart, max_jobs)):
+            self.pool.release(job)
+
+    def server_close(self):
+        super().server_close()
+        if sys.stdout is self.stdout:
+            sys.stdout = self.stdout.default
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+
+    def run_request(self, kind: str, request: Dict) -> int:
+        env_settings = request.get("env", {})
+        if kind == "launch":
+            env_settings = launch_env_settings(env_settings)
+        job, setup_job = self.pool.lease_many([env_settings, None])
+        try:
+            if kind == "crtfrmstmf":
+                args = create_parser().parse_args(request.get("argv", []))
+                success = run_from_args(args, env_settings, request.get("cwd"), job, setup_job)
+                exit_code = 0 if success else 1
+            else:
+                exit_code = run_launch(request.get("argv", []), env_settings, request.get("cwd"), job, setup_job)
+        except BaseException:
+            # The state of the jobs is unknown, do not hand them out again
+            self.pool.release(job, discard=True)
+            self.pool.release(setup_job, discard=True)
+            raise
+        self.pool.release(job)
+        self.pool.release(setup_job)
+        return exit_code
+
+
+def launch_env_settings(env_settings: Dict[str, str]) -> Dict[str, str]:
+    """ Library list settings after `scripts/launch` applied tmpCurlib
+
+    The current library is moved to the front of the user library list and tmpCurlib becomes the current library.
+    """
+    settings = {var: value for var, value in env_settings.items() if var != "tmpCurlib"}
+    tmp_curlib = env_settings.get("tmpCurlib")
+    if tmp_curlib:
+        if settings.get("curlib"):
+            settings["preUsrlibl"] = f"{settings['curlib']} {settings.get('preUsrlibl', '')}".strip()
+        settings["curlib"] = tmp_curlib
+    return settings
+
+
+def run_launch(argv: List[str], env_settings: Dict[str, str], cwd: Optional[str], job: IBMJob,
+               query_job: IBMJob) -> int:
+    """ In-process equivalent of `scripts/launch` for commands that do not need a spawned job
+
+    env_settings have to be applied to the job already, see `launch_env_settings()`.
+
+    argv: path_to_joblog_json command [precmd] [postcmd] [object] [source] [output] [spawned_job] [text_command]
+    """
+    # pylint: disable=too-many-locals
+    if len(argv) < 2 or len(argv) > 9:
+        print("launch: expected between 2 and 9 arguments")
+        return 2
+    joblog_json, cmd, precmd, postcmd, build_object, source, output, spawned_job, text_command = \
+        (argv + [""] * 9)[:9]
+    if spawned_job:
+        # Spawned jobs are only supported by the shell script
+        return SERVER_UNAVAILABLE_EXIT_CODE
+    start_datetime = datetime.now()
+
+    # The library list settings have been applied by the pool when the job was leased
+    print(">>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>")
+    if env_settings.get("IBMiEnvCmd"):
+        print(env_settings["IBMiEnvCmd"])
+    job.run_cl("CHGJOB LOG(4 00 *SECLVL)", ignore_errors=True)
+    print(f">> executing command: {cmd}")
+    records, _ = job.run_sql("SELECT SYSTEM_SCHEMA_NAME FROM QSYS2.LIBRARY_LIST_INFO ORDER BY ORDINAL_POSITION")
+    print(f">> liblist: {' '.join(record[0].strip() for record in records)}")
+    cmd_time = datetime.now()
+    print(f">> executing time: {format_datetime(cmd_time)}")
+    print()
+
+    if precmd:
+        print(f">> precmd: {precmd}")
+        job.untracked_changes = True
+        job.run_cl(precmd, ignore_errors=True)
+    failed = False
+    try:
+        job.run_cl(cmd)
+    # pylint: disable=broad-except
+    except Exception as e:
+        print(e)
+        failed = True
+    if text_command:
+        job.run_cl(text_command, ignore_errors=True)
+    if postcmd:
+        print(f">> postcmd: {postcmd}")
+        job.untracked_changes = True
+        job.run_cl(postcmd, ignore_errors=True)
+
+    print("<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<")
+    print()
+    base_dir = Path(cwd) if cwd is not None else Path.cwd()
+    save_joblog_json(cmd, format_datetime(cmd_time), job.job_id, build_object, source, output, failed,
+                     str(base_dir / joblog_json), query_job=query_job, since=start_datetime)
+    joblog_store.merge_if_standalone(base_dir / joblog_json, env_settings)
+    return 1 if failed else 0
+
+
+def serve(socket_path: Optional[Path] = None, prestart: int = 0, max_jobs: int = 8, idle_timeout: float = 600):
+    """ Runs the compile server in the foreground until it is stopped"""
+    if socket_path is None:
+        socket_path = get_socket_path()
+    try:
+        server = CompileServer(socket_path, prestart, max_jobs, idle_timeout)
+    except OSError as e:
+        print(colored(str(e), Colors.FAIL))
+        sys.exit(1)
+    print(colored(f"Compile server listening on {socket_path}", Colors.OKGREEN))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.pool.close()
+        print(f"Compile server stopped: {server.pool.summary()}")
+
+
+def request_server(kind: str, socket_path: Optional[Path] = None) -> int:
+    """ Sends a control request (stats or shutdown) to a running server"""
+    exit_code = send_request({"kind": kind}, socket_path)
+    if exit_code == SERVER_UNAVAILABLE_EXIT_CODE:
+        print(colored(f"No compile server is listening on {socket_path or get_socket_path()}", Colors.WARNING))
+    return exit_code
@@ -8,6 +8,21 @@ DEFAULT_CURLIB = "*CRTDFT"
 TOBI_PATH = Path(__file__).resolve().parent.parent.parent
 MK_PATH = TOBI_PATH / "src" / "mk"
 
+# Per-user cache directory shared by every project built on this partition
+MAKEI_CACHE_PATH = Path.home() / ".cache" / "makei"
+
+# Unix socket the compile server (`makei serve`) listens on; can be overridden with $MAKEI_SERVER_SOCKET
+SERVER_SOCKET_ENV = "MAKEI_SERVER_SOCKET"
+DEFAULT_SERVER_SOCKET = MAKEI_CACHE_PATH / "server.sock"
+# Exit code (EX_TEMPFAIL) used by the compile client when no server is reachable
+SERVER_UNAVAILABLE_EXIT_CODE = 75
+# Set by makei in the environment of make: the build merges the joblog entries of the recipes once make has finished
+BUILD_ENV_VAR = "MAKEI_BUILD"
+
+# Names left out of the project index: version control and the files makei itself writes into the project.
+# More patterns can be added in iproj.json under "extensions": {"makei": {"ignore": [...]}}
+DEFAULT_INDEX_IGNORE = [".git", ".svn", ".logs", ".evfevent", ".deps", ".makei", ".makei-trace", "node_modules"]
+
 METADATA_HEADER = "%METADATA"
 METADATA_FOOTER = "%EMETADATA"
 TEXT_HEADER = "%TEXT"
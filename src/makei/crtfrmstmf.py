@@ -5,11 +5,18 @@ import os
 import shutil
 import sys
 from datetime import datetime
+from decimal import Decimal
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
+from makei import joblog_store
+from makei.const import BUILD_ENV_VAR
+from makei.db_relations import DbRelations, based_on_files
 from makei.ibm_job import IBMJob, save_joblog_json
-from makei.utils import format_datetime, objlib_to_path, validate_ccsid, make_include_dirs_absolute
+from makei.obj_backup import BACKUP_STRATEGIES, DEFAULT_BACKUP_STRATEGY, ObjectBackup
+from makei.stmf_ccsid import CcsidCache
+from makei.system_facts import ibmi_release, is_valid_ccsid
+from makei.utils import format_datetime, objlib_to_path, make_include_dirs_absolute
 
 COMMAND_MAP = {'CRTCMD': 'CMD',
                'CRTBNDCL': 'PGM',
@@ -28,6 +35,31 @@ COMMAND_MAP = {'CRTCMD': 'CMD',
                'CRTRPGPGM': 'PGM',
                'CRTSQLRPG': 'PGM'}
 
+# The release from which each command compiles straight from the stream file with SRCSTMF, the other commands
+# compile from a member of the temporary source file
+SRCSTMF_RELEASES = {'CRTBNDCL': 730,
+                    'CRTCLMOD': 730,
+                    'CRTCMD': 750}
+
+# Record length of the temporary source file: the longest line plus the sequence number and date fields, at least
+# the length of the source files IBM i creates for the command (92, i.e. 80 columns, unless listed here)
+SRC_RECORD_PREFIX = 12
+MIN_RCDLEN = {'CRTQMQRY': 91}
+DEFAULT_MIN_RCDLEN = 92
+MAX_RCDLEN = 32766
+# Used when the source cannot be read
+FALLBACK_RCDLEN = 32000
+# CPYFRMSTMF expands the tabs
+TAB_WIDTH = 8
+
+# How the source stream file gets into the member: CPYFRMSTMF, or read here and inserted over the connection of the
+# job with multi-row INSERTs, which saves the conversion pass of CPYFRMSTMF on large sources
+UPLOAD_ENGINES = ("cpyfrmstmf", "insert")
+UPLOAD_ALIAS = "MAKEI_UPLOAD"
+INSERT_BATCH_ROWS = 500
+# Beyond 9999 lines the sequence numbers go up by 0.01, as with CPYFRMSTMF
+MAX_SRCSEQ_LINES = 999999
+
 
 class CrtFrmStmf():
     """create from stream file
@@ -40,7 +72,7 @@ class CrtFrmStmf():
     obj: str
     lib: str
     cmd: str
-    rcdlen: int
+    rcdlen: Optional[int]
     parameters: Optional[str]
     env_settings: Dict[str, str]
     ccsid_c: str
@@ -49,14 +81,26 @@ class CrtFrmStmf():
     obj_type: str
     precmd: str
     postcmd: str
-
-    def __init__(self, srcstmf: str, obj: str, lib: str, cmd: str, rcdlen: int, tgt_ccsid: Optional[str] = None,
+    upload: str
+    backup_strategy: str
+    obj_backup: Optional[ObjectBackup]
+    db_relations: Optional[DbRelations]
+    ccsid_cache: CcsidCache
+
+    def __init__(self, srcstmf: str, obj: str, lib: str, cmd: str, rcdlen: Optional[int] = None,
+                 tgt_ccsid: Optional[str] = None,
                  parameters: Optional[str] = None, env_settings: Optional[Dict[str, str]] = None,
                  joblog_path: Optional[str] = None, tmp_lib="QTEMP", tmp_src="QSOURCE", precmd="",
-                 postcmd="", output="") -> None:
+                 postcmd="", output="", job: Optional[IBMJob] = None, setup_job: Optional[IBMJob] = None,
+                 upload: str = "cpyfrmstmf", backup: str = DEFAULT_BACKUP_STRATEGY,
+                 db_relations: Optional[str] = None, project_dir: Optional[str] = None) -> None:
         # pylint: disable=too-many-arguments
-        self.job = IBMJob()
-        self.setup_job = IBMJob()
+        # Jobs handed in by the compile server may already have a joblog from earlier requests
+        self.start_datetime = datetime.now()
+        # Jobs handed in (e.g. leased from an IBMJobPool) come with the environment settings applied
+        self.owns_jobs = job is None
+        self.job = job if job is not None else IBMJob()
+        self.setup_job = setup_job if setup_job is not None else IBMJob()
         self.srcstmf = srcstmf
         self.obj = obj
         self.lib = lib
@@ -72,9 +116,18 @@ class CrtFrmStmf():
         self.precmd = precmd
         self.postcmd = postcmd
         self.output = output
-
-        if tgt_ccsid is None or not validate_ccsid(tgt_ccsid):
-            ccsid = retrieve_ccsid(srcstmf)
+        self.upload = upload
+        self.backup_strategy = backup
+        self.obj_backup = None
+        # The relations read by makei at the start of the build, see makei.db_relations
+        self.db_relations = None
+        if db_relations and self.cmd in ("CRTPF", "CRTLF") and Path(db_relations).is_file():
+            self.db_relations = DbRelations(Path(db_relations))
+        # The CCSIDs read by makei before make runs, the compile server does not run in the project directory
+        self.ccsid_cache = CcsidCache(Path(project_dir) if project_dir is not None else Path.cwd())
+
+        if tgt_ccsid is None or not is_valid_ccsid(tgt_ccsid):
+            ccsid = retrieve_ccsid(srcstmf, self.ccsid_cache)
             if ccsid in ["1208", "819"]:
                 self.ccsid_c = '*JOB'
             else:
@@ -85,7 +138,8 @@ class CrtFrmStmf():
         if check_object_exists(self.obj, self.lib, self.obj_type):
             if self.cmd == "CRTPF":
                 # For physical files, delete all its logical file dependencies
-                self.back_up_obj_list = get_physical_dependencies(self.obj, self.lib, True, self.setup_job)
+                self.back_up_obj_list = get_physical_dependencies(self.obj, self.lib, True, self.setup_job,
+                                                                  relations=self.db_relations)
             else:
                 self.back_up_obj_list = [(self.obj, self.lib, self.obj_type)]
         else:
@@ -98,42 +152,50 @@ class CrtFrmStmf():
 
     def run(self):
         success = False
-        self.setup_env()
+        if self.owns_jobs:
+            self.setup_env()
 
         run_datetime = datetime.now()
 
         # Run the pre_cmd
         if self.precmd:
+            self.job.untracked_changes = True
             self.job.run_cl(self.precmd, False, True)
 
-        # Delete the temp source file
-        self.job.run_cl(f'DLTF FILE({self.tmp_lib}/{self.tmp_src})', True)
-        # Create the temp source file
-        self.job.run_cl(
-            f'CRTSRCPF FILE({self.tmp_lib}/{self.tmp_src}) RCDLEN({self.rcdlen}) MBR({self.obj}) CCSID({self.ccsid_c})')
-        # Copy the source stream file to the temp source file
-        self.job.run_cl(
-            f'CPYFRMSTMF FROMSTMF("{self.srcstmf}") '
-            f'TOMBR("/QSYS.LIB/{self.tmp_lib}.LIB/{self.tmp_src}.FILE/{self.obj}.MBR") MBROPT(*REPLACE)')
+        if self._compiles_from_stmf():
+            cmd = f"{self.cmd} {self.obj_type}({self.lib}/{self.obj}) SRCSTMF('{self.srcstmf}')"
+        else:
+            self._copy_to_tmp_src()
+            cmd = f"{self.cmd} {self.obj_type}({self.lib}/{self.obj}) " \
+                  f"SRCFILE({self.tmp_lib}/{self.tmp_src}) SRCMBR({self.obj})"
 
-        self._backup_and_delete_objs()
+        self.obj_backup = BACKUP_STRATEGIES[self.backup_strategy](self.setup_job, self.back_up_obj_list,
+                                                                  self.tmp_lib)
 
-        cmd = f"{self.cmd} {self.obj_type}({self.lib}/{self.obj}) " \
-              f"SRCFILE({self.tmp_lib}/{self.tmp_src}) SRCMBR({self.obj})"
         if self.parameters is not None:
             cmd = cmd + ' ' + self.parameters
         try:
+            # A failed backup fails the compile, the objects it already took are put back below
+            self.obj_backup.backup()
             self.job.run_cl(cmd, False, True)
             success = True
 
             # Run the post_cmd
             if self.postcmd:
+                self.job.untracked_changes = True
                 self.job.run_cl(self.postcmd, False, True)
+            self.obj_backup.discard()
         # pylint: disable=broad-except
         except Exception:
             print(f"Build not successful for {self.lib}/{self.obj}")
-            if len(self.back_up_obj_list) > 0:
-                self._restore_objs()
+            try:
+                self.obj_backup.restore()
+            # pylint: disable=broad-except
+            except Exception:
+                print(f"Cannot restore the objects backed up for {self.lib}/{self.obj}")
+
+        if self.db_relations is not None:
+            self._record_relations(success)
 
             # Process the event file
         if "*EVENTF" in cmd or "*SRCDBG" in cmd or "*LSTDBG" in cmd:
@@ -146,9 +208,92 @@ class CrtFrmStmf():
         if self.joblog_path is not None:
             save_joblog_json(cmd, format_datetime(
                 run_datetime), self.job.job_id, self.obj + "." + self.obj_type, self.srcstmf, self.output,
-                  not success, self.joblog_path, filter_joblogs)
+                  not success, self.joblog_path, filter_joblogs, query_job=self.setup_job, since=self.start_datetime,
+                  rcdlen=self.rcdlen, backup=self.obj_backup.to_dict() if self.back_up_obj_list else None)
         return success
 
+    def _record_relations(self, success: bool):
+        """Record the files deleted and created, for the physical files created after this one in the build"""
+        if not success and self.obj_backup.restores:
+            return
+        deleted = [(obj, lib) for obj, lib, _ in self.back_up_obj_list]
+        based_on = None
+        if success and self.cmd == "CRTLF" and self.lib.upper() != "*CURLIB":
+            try:
+                based_on = based_on_files(self.setup_job, self.obj, self.lib)
+            # pylint: disable=broad-except
+            except Exception:
+                pass
+        if based_on is not None:
+            self.db_relations.record(deleted, (self.obj, self.lib), based_on)
+        elif deleted:
+            self.db_relations.record(deleted)
+
+    def _compiles_from_stmf(self) -> bool:
+        """Returns whether the command can read the source stream file itself
+
+        The stream file is then converted to the CCSID of the job, which is what the member gets with *JOB.
+        """
+        if self.cmd not in SRCSTMF_RELEASES or self.ccsid_c != "*JOB":
+            return False
+        release = ibmi_release()
+        return release is not None and int(release) >= SRCSTMF_RELEASES[self.cmd]
+
+    def _copy_to_tmp_src(self):
+        """Copy the source stream file into a member of the temporary source file
+
+        A source file in QTEMP lasts as long as the job, so a job compiling several objects (e.g. one kept by the
+        compile server) creates it once and only replaces the member afterwards. Without a record length given, the
+        file is created for the longest line of the source, and one up to twice that length is reused.
+        """
+        tmp_src_file = f"{self.tmp_lib}/{self.tmp_src}"
+        if self.rcdlen is None:
+            self.rcdlen = source_rcdlen(self.srcstmf, self.cmd)
+            max_rcdlen = 2 * self.rcdlen
+        else:
+            max_rcdlen = self.rcdlen
+        existing = self.job.tmp_src_files.get(tmp_src_file) if self.tmp_lib.upper() == "QTEMP" else None
+        reusable = existing is not None and existing[1] == self.ccsid_c and self.rcdlen <= existing[0] <= max_rcdlen
+        if reusable and self._upload(ignore_errors=True):
+            self.rcdlen = existing[0]
+            return
+        self.job.tmp_src_files.pop(tmp_src_file, None)
+        # Delete the temp source file
+        self.job.run_cl(f'DLTF FILE({tmp_src_file})', True)
+        # Create the temp source file
+        self.job.run_cl(
+            f'CRTSRCPF FILE({tmp_src_file}) RCDLEN({self.rcdlen}) MBR({self.obj}) CCSID({self.ccsid_c})')
+        # Copy the source stream file to the temp source file
+        self._upload()
+        if self.tmp_lib.upper() == "QTEMP":
+            self.job.tmp_src_files[tmp_src_file] = (self.rcdlen, self.ccsid_c)
+
+    def _upload(self, ignore_errors: bool = False) -> bool:
+        """Copy the source stream file into the member with the selected engine
+
+        The insert engine falls back to CPYFRMSTMF when the source cannot be read as UTF-8 or the records cannot be
+        inserted, e.g. a line longer than the record length.
+        """
+        if self.upload == "insert":
+            try:
+                records = source_records(self.srcstmf)
+                # CPYFRMSTMF adds or clears the member itself
+                if not self.job.run_cl(f"CLRPFM FILE({self.tmp_lib}/{self.tmp_src}) MBR({self.obj})", True):
+                    self.job.run_cl(f"ADDPFM FILE({self.tmp_lib}/{self.tmp_src}) MBR({self.obj})")
+                insert_records(self.job, records, self.tmp_lib, self.tmp_src, self.obj)
+                return True
+            # pylint: disable=broad-except
+            except Exception as e:
+                print(f"Cannot insert the records of {self.srcstmf}, copying it with CPYFRMSTMF: {e}")
+        return self._cpyfrmstmf(ignore_errors)
+
+    def _cpyfrmstmf(self, ignore_errors: bool = False) -> bool:
+        # CPYFRMSTMF adds the member when it does not exist yet
+        return self.job.run_cl(
+            f'CPYFRMSTMF FROMSTMF("{self.srcstmf}") '
+            f'TOMBR("/QSYS.LIB/{self.tmp_lib}.LIB/{self.tmp_src}.FILE/{self.obj}.MBR") MBROPT(*REPLACE)',
+            ignore_errors)
+
     def setup_env(self):
         if "curlib" in self.env_settings and self.env_settings["curlib"]:
             self.job.run_cl(f"CHGCURLIB CURLIB({self.env_settings['curlib']})", log=True)
@@ -200,51 +345,10 @@ class CrtFrmStmf():
 
         self.setup_job.run_sql(f"DROP ALIAS {self.tmp_lib}.{self.obj}")
 
-    def _backup_and_delete_objs(self):
-        obj_list = self.back_up_obj_list
-        if not len(obj_list) > 0:
-            return
-
-        print(f"Backing up {len(obj_list)} object(s)...")
-
-        _, lib_list, _ = list(zip(*obj_list))
-        obj_list_by_lib = {lib: [(obj_tuple[0], obj_tuple[2]) for obj_tuple in obj_list if lib == obj_tuple[1]] for lib
-                           in set(lib_list)}
-
-        for lib, obj_tuples in obj_list_by_lib.items():
-            obj_name_list, obj_type_list = list(zip(*obj_tuples))
-            self.setup_job.run_cl(f"CRTSAVF FILE({self.tmp_lib}/{lib})")
-            self.setup_job.run_cl(
-                f"SAVOBJ OBJ({' '.join(set(obj_name_list))}) LIB({self.lib}) DEV(*SAVF)"
-                f" OBJTYPE({' '.join(map(lambda obj_type: f'*{obj_type}', set(obj_type_list)))})"
-                f" SAVF({self.tmp_lib}/{lib}) SPLFDTA(*ALL) ACCPTH(*YES) QDTA(*DTAQ)")
-
-        for obj_tuple in obj_list:
-            self.setup_job.run_cl(
-                f"DLTOBJ OBJ({obj_tuple[1]}/{obj_tuple[0]}) OBJTYPE(*{obj_tuple[2]})")
-
-    def _restore_objs(self):
-        obj_list = self.back_up_obj_list
-        if not len(obj_list) > 0:
-            return
-        print(f"Restoring {len(obj_list)} object(s)...")
-
-        _, lib_list, _ = list(zip(*obj_list))
-        obj_list_by_lib = {lib: [(obj_tuple[0], obj_tuple[2]) for obj_tuple in obj_list if lib == obj_tuple[1]] for lib
-                           in set(lib_list)}
-
-        for lib, obj_tuples in obj_list_by_lib.items():
-            obj_name_list, obj_type_list = list(zip(*obj_tuples))
-            self.setup_job.run_cl(
-                f"RSTOBJ OBJ({' '.join(set(obj_name_list))}) SAVLIB({self.lib}) DEV(*SAVF)"
-                f" OBJTYPE({' '.join(map(lambda obj_type: f'*{obj_type}', set(obj_type_list)))})"
-                f" SAVF({self.tmp_lib}/{lib})")
-        print("done.")
-
 
-def cli():
+def create_parser() -> argparse.ArgumentParser:
     """
-    crtfrmstmf program cli entry
+    crtfrmstmf argument parser, shared by the cli and the compile server
     """
     parser = argparse.ArgumentParser(prog='crtfrmstmf')
 
@@ -286,10 +390,10 @@ def cli():
     parser.add_argument(
         "-r",
         '--rcdlen',
-        help='Specifies the record length for the temporary source physical file.',
+        help='Specifies the record length for the temporary source physical file. '
+             'Defaults to the smallest one holding the longest line of the source.',
         metavar='<rcdlen>',
-        default=32000
-
+        type=int,
     )
 
     parser.add_argument(
@@ -300,6 +404,29 @@ def cli():
         nargs='?'
     )
 
+    parser.add_argument(
+        '--upload',
+        help='Specifies how the source is copied into the temporary source member: with CPYFRMSTMF, or with '
+             'multi-row INSERTs of the lines read as UTF-8.',
+        choices=UPLOAD_ENGINES,
+        default="cpyfrmstmf",
+    )
+
+    parser.add_argument(
+        '--backup',
+        help='Specifies how the existing object, and the logical files of a physical file, are kept while the '
+             'object is created again, and restored when the compile fails.',
+        choices=BACKUP_STRATEGIES.keys(),
+        default=DEFAULT_BACKUP_STRATEGY,
+    )
+
+    parser.add_argument(
+        '--db-relations',
+        help='The relations of the database files read by makei at the start of the build, used instead of DSPDBR '
+             'to find the files depending on a physical file.',
+        metavar='<path to dbrelations.json>',
+    )
+
     parser.add_argument(
         "--save-joblog",
         help='Output the joblog to the specified json file.',
@@ -322,26 +449,56 @@ def cli():
         "--output",
         metavar='<output>',
     )
+    return parser
 
-    args = parser.parse_args()
-    srcstmf_absolute_path = str(Path(args.stream_file.strip()).resolve())
+
+def get_env_settings(environ: Dict[str, str]) -> Dict[str, str]:
+    """ Collects the library list settings passed down by make"""
     env_settings = {}
-    if "curlib" in os.environ:
-        env_settings["curlib"] = os.environ["curlib"]
-    if "preUsrlibl" in os.environ:
-        env_settings["preUsrlibl"] = os.environ["preUsrlibl"]
-    if "postUsrlibl" in os.environ:
-        env_settings["postUsrlibl"] = os.environ["postUsrlibl"]
-    if "IBMiEnvCmd" in os.environ:
-        env_settings["IBMiEnvCmd"] = os.environ["IBMiEnvCmd"]
+    for var in ["curlib", "preUsrlibl", "postUsrlibl", "IBMiEnvCmd", BUILD_ENV_VAR]:
+        if var in environ:
+            env_settings[var] = environ[var]
+    return env_settings
+
+
+def run_from_args(args: argparse.Namespace, env_settings: Dict[str, str], cwd: Optional[str] = None,
+                  job: Optional[IBMJob] = None, setup_job: Optional[IBMJob] = None) -> bool:
+    """ Runs a compile described by the parsed command line arguments
+
+    Args:
+        args (argparse.Namespace): arguments parsed by `create_parser()`
+        env_settings (Dict[str, str]): library list settings, see `get_env_settings()`
+        cwd (str, optional): directory relative paths are resolved against. Defaults to the current directory.
+        job (IBMJob, optional): job used to run the compile, with env_settings already applied. If none is set, a
+            new job will be created.
+        setup_job (IBMJob, optional): job used for backups and queries. If none is set, a new job will be created.
+
+    Returns:
+        bool: whether the compile succeeded
+    """
+    base_dir = Path(cwd) if cwd is not None else Path.cwd()
+    srcstmf_absolute_path = str((base_dir / args.stream_file.strip()).resolve())
+    joblog_path = str(base_dir / args.save_joblog) if args.save_joblog else args.save_joblog
 
     handle = CrtFrmStmf(srcstmf_absolute_path, args.object.strip(),
                         args.library.strip(), args.command.strip(), args.rcdlen, args.ccsid, args.parameters,
-                        env_settings, args.save_joblog, precmd=args.precmd, postcmd=args.postcmd, output=args.output)
+                        env_settings, joblog_path, precmd=args.precmd, postcmd=args.postcmd, output=args.output,
+                        job=job, setup_job=setup_job, upload=args.upload, backup=args.backup,
+                        db_relations=args.db_relations, project_dir=str(base_dir))
 
     print(">>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>")
     success = handle.run()
+    joblog_store.merge_if_standalone(joblog_path, env_settings)
     print("<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<")
+    return success
+
+
+def cli():
+    """
+    crtfrmstmf program cli entry
+    """
+    args = create_parser().parse_args()
+    success = run_from_args(args, get_env_settings(os.environ))
     sys.exit(0 if success else 1)
 
 
@@ -358,17 +515,60 @@ def _get_attr(srcstmf: str):
     return attrs
 
 
-def retrieve_ccsid(srcstmf: str) -> str:
+def retrieve_ccsid(srcstmf: str, ccsid_cache: Optional[CcsidCache] = None) -> str:
+    # makei reads the CCSIDs of the sources of the build at once before make runs, in the project directory
+    if ccsid_cache is not None:
+        ccsid = ccsid_cache.get(Path(srcstmf).absolute())
+        if ccsid is not None:
+            return ccsid
     return _get_attr(srcstmf)["CCSID"]
 
 
+def source_rcdlen(srcstmf: str, cmd: str) -> int:
+    """Returns the smallest record length of a source file holding every line of the stream file"""
+    longest = 0
+    try:
+        with open(srcstmf, encoding="utf-8", errors="replace") as file:
+            for line in file:
+                line = line.rstrip("\r\n")
+                length = len(line) + (TAB_WIDTH - 1) * line.count("\t")
+                if not line.isascii():
+                    # Double-byte characters take two bytes and may need shift-out and shift-in characters
+                    length += 3 * sum(1 for char in line if ord(char) > 127)
+                longest = max(longest, length)
+    except OSError:
+        return FALLBACK_RCDLEN
+    return min(max(longest + SRC_RECORD_PREFIX, MIN_RCDLEN.get(cmd, DEFAULT_MIN_RCDLEN)), MAX_RCDLEN)
+
+
+def source_records(srcstmf: str) -> List[Tuple[Decimal, int, str]]:
+    """Returns the records CPYFRMSTMF writes for the UTF-8 stream file as (SRCSEQ, SRCDAT, SRCDTA) tuples"""
+    with open(srcstmf, encoding="utf-8") as file:
+        lines = [line.rstrip("\r\n").expandtabs(TAB_WIDTH) for line in file]
+    if len(lines) > MAX_SRCSEQ_LINES:
+        raise ValueError(f"{len(lines)} lines do not fit the sequence numbers")
+    if len(lines) > 9999:
+        return [(Decimal(number) / 100, 0, line) for number, line in enumerate(lines, 1)]
+    return [(Decimal(number), 0, line) for number, line in enumerate(lines, 1)]
+
+
+def insert_records(job: IBMJob, records: List[Tuple[Decimal, int, str]], tmp_lib: str, tmp_src: str, mbr: str,
+                   batch_size: int = INSERT_BATCH_ROWS) -> int:
+    """Inserts the records into the existing, empty source member through an alias in the library of the file"""
+    # pylint: disable=too-many-arguments
+    alias = f"{tmp_lib}.{UPLOAD_ALIAS}"
+    job.run_sql(f"CREATE OR REPLACE ALIAS {alias} FOR {tmp_lib}.{tmp_src} ({mbr})")
+    return job.insert_rows(alias, ("SRCSEQ", "SRCDAT", "SRCDTA"), records, batch_size)
+
+
 def check_object_exists(obj: str, lib: str, obj_type: str) -> bool:
     obj_path = Path(f"/QSYS.LIB/{lib}.LIB/{obj}.{obj_type}")
     return obj_path.exists()
 
 
 def get_physical_dependencies(obj: str, lib: str, include_self: bool, job: Optional[IBMJob] = None,
-                              verbose: bool = False) -> List[Tuple[str, str, str]]:
+                              verbose: bool = False, relations: Optional[DbRelations] = None) \
+        -> List[Tuple[str, str, str]]:
     """Get the dependencies for a given physical file object
 
     Args:
@@ -378,6 +578,8 @@ def get_physical_dependencies(obj: str, lib: str, include_self: bool, job: Optio
         job (IBMJob, optional): Job used to run the commands. If none is set, a new job will be created. Defaults to
         None.
         verbose (bool, optional): Defaults to False.
+        relations (DbRelations, optional): Relations read for the build, DSPDBR is only run when the library of the
+        physical file is not in them. Defaults to None.
 
     Returns:
         List[Tuple[str, str, str]]: List of (obj, lib, obj_type) tuples
@@ -390,6 +592,13 @@ def get_physical_dependencies(obj: str, lib: str, include_self: bool, job: Optio
             print(f"delete_physical_dependencies: {pf_path} does not exist.")
         return []
 
+    cached = relations.dependents(obj, lib) if relations is not None else None
+    if cached is not None:
+        result = [(dep_file, dep_lib, "FILE") for dep_file, dep_lib in cached]
+        if include_self:
+            result.append((obj, lib, "FILE"))
+        return result
+
     if job is None:
         job = IBMJob()
 
@@ -440,6 +649,9 @@ def filter_joblogs(record: Dict[str, Any]) -> bool:
     if msgid == "CPF2105":
         # DLTF errors: no object found
         return False
+    if msgid == "CPF3141":
+        # CLRPFM errors: the member of the temporary source file does not exist yet
+        return False
     if msgid == "CPF1336":
         return False
     if "Job changed successfully; however errors occurred." in msgtext:
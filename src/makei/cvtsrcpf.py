@@ -1,19 +1,177 @@
 #!/usr/bin/env python3.9
 # -*- coding: utf-8 -*-
+import itertools
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Any, Callable, Collection, Dict, Iterable, List, Optional, Set, Tuple
 
-from makei.ibm_job import IBMJob
-from makei.utils import create_ibmi_json, objlib_to_path, validate_ccsid, check_keyword_in_file, get_style_dict
+from makei.ibm_job import IBMJob, IBMJobPool
+from makei.system_facts import is_valid_ccsid
+from makei.utils import atomic_write, create_ibmi_json, objlib_to_path, check_keyword_in_file, get_comment_style, \
+    get_file_extension, get_style_dict
 from makei.const import MEMBER_TEXT_LINES, METADATA_HEADER, METADATA_FOOTER, TEXT_HEADER
 
 
+ALL_SRCFILES = "*ALL"
+# Alias over the member being read, one per job since QTEMP belongs to the job
+MEMBER_ALIAS = "QTEMP.MAKEI_CVTSRCPF"
+FETCH_ROWS = 1000
+# Written next to .ibmi.json by --sync
+SYNC_MANIFEST = ".cvtsrcpf.json"
+
+
+def comment_line(content: str, start_comment_characters: str, end_comment_characters: str, start_column: int,
+                 end_column: int) -> str:
+    starting_whitespace = 0 if start_column == 0 else start_column - 1
+    ending_whitespace = (end_column) - (starting_whitespace +
+                                        len(start_comment_characters + content + end_comment_characters))
+    return ((' ' * starting_whitespace) + start_comment_characters
+            + content + (' ' * ending_whitespace) + end_comment_characters)
+
+
+def member_text_lines(member_text: str, style_dict: dict) -> List[str]:
+    """Returns the %METADATA comment holding the member text, in the comment style of the source"""
+    start_column = style_dict["start_column"]
+    end_column = style_dict["end_column"]
+    if end_column <= start_column:
+        return []
+    return [comment_line(content, style_dict["start_comment"], style_dict["end_comment"], start_column, end_column)
+            for content in (METADATA_HEADER + ' ', ' ' + TEXT_HEADER + ' ' + member_text, METADATA_FOOTER + ' ')]
+
+
+def has_member_text(lines: List[str]) -> bool:
+    """Returns whether the first lines of a source already hold a %TEXT in a %METADATA comment"""
+    for metadata_line, line in enumerate(lines[:MEMBER_TEXT_LINES]):
+        if METADATA_HEADER.lower() in line.lower():
+            return any(TEXT_HEADER.lower() in text_line.lower()
+                       for text_line in lines[metadata_line + 1:metadata_line + MEMBER_TEXT_LINES])
+    return False
+
+
+def write_source(lines: Iterable[str], dst_path: Path, member_text: Optional[str] = None) -> bool:
+    """Writes the lines of a member to dst_path in UTF-8 with LF line ends, in a single pass
+
+    The member text comment is written in place, as import_member_text would insert it afterwards.
+
+    Returns:
+        bool: whether the member text was written
+    """
+    lines = iter(lines)
+    # Enough lines to find an existing %METADATA comment and its %TEXT
+    head = list(itertools.islice(lines, 2 * MEMBER_TEXT_LINES))
+    text_written = False
+    if member_text and not has_member_text(head):
+        style_dict = get_comment_style(get_file_extension(dst_path), free_form=bool(head) and "free" in head[0].lower())
+        if style_dict is not None:
+            header = member_text_lines(member_text, style_dict)
+            write_on_line = style_dict.get("write_on_line", 0)
+            head[write_on_line:write_on_line] = header
+            text_written = bool(header)
+    with dst_path.open("w", encoding="utf-8", newline="\n") as file:
+        for line in itertools.chain(head, lines):
+            file.write(line)
+            file.write("\n")
+    return text_written
+
+
+class ConversionProgress:
+    """Counts the converted members and reports the progress and throughput every `interval` seconds"""
+    total: int
+    converted: int
+    failed: int
+
+    def __init__(self, total: int, interval: float = 5, report: Callable[[str], None] = print):
+        self.total = total
+        self.converted = 0
+        self.failed = 0
+        self.interval = interval
+        self._report = report
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self._last_report = self._start
+
+    def update(self, converted: bool):
+        with self._lock:
+            if converted:
+                self.converted += 1
+            else:
+                self.failed += 1
+            now = time.monotonic()
+            if now - self._last_report >= self.interval and self.converted + self.failed < self.total:
+                self._last_report = now
+                self._report(f"Progress: {self.converted + self.failed}/{self.total} members, "
+                             f"{self.rate(now):.1f} members/s")
+
+    def rate(self, now: Optional[float] = None) -> float:
+        elapsed = (now if now is not None else time.monotonic()) - self._start
+        return (self.converted + self.failed) / elapsed if elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        elapsed = time.monotonic() - self._start
+        return f"Converted {self.converted} of {self.total} members in {elapsed:.1f}s ({self.rate():.1f} members/s)" \
+            + (f", {self.failed} failed" if self.failed else "")
+
+
+class SyncManifest:
+    """The members converted into a directory, with the last change timestamp and the size they had
+
+    Entries are recorded as members are converted and the manifest is written every `interval` seconds and at the
+    end, so an interrupted sync resumes from the last write.
+    """
+    path: Path
+    members: Dict[str, Dict[str, Any]]
+
+    def __init__(self, path: Path, interval: float = 5):
+        self.path = path
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._last_save = time.monotonic()
+        try:
+            with path.open(encoding="utf-8") as file:
+                members = json.load(file)["members"]
+        except (OSError, ValueError, KeyError, TypeError):
+            members = {}
+        self.members = members if isinstance(members, dict) else {}
+
+    @staticmethod
+    def key(lib: str, srcfile: str, mbr: str) -> str:
+        return f"{lib.upper()}/{srcfile.upper()}/{mbr}"
+
+    def files(self) -> Set[str]:
+        with self._lock:
+            return {entry["file"] for entry in self.members.values()}
+
+    def record(self, key: str, file: str, changed: Optional[str], size: Optional[int]):
+        with self._lock:
+            self.members[key] = {"file": file, "changed": changed, "size": size}
+            if time.monotonic() - self._last_save < self.interval:
+                return
+        self.save()
+
+    def forget(self, keys: Iterable[str]):
+        with self._lock:
+            for key in keys:
+                self.members.pop(key, None)
+
+    def save(self):
+        with self._lock:
+            self._last_save = time.monotonic()
+            atomic_write(self.path, json.dumps({"members": self.members}, indent=1, sort_keys=True))
+
+
 class CvtSrcPf:
     """convert from source physical file
     """
     # pylint: disable=too-few-public-methods
     job: IBMJob
+    pool: Optional[IBMJobPool]
+    jobs: int
+    stream: bool
+    sync: bool
 
     lib: str
     srcfile: str
@@ -22,17 +180,27 @@ class CvtSrcPf:
     tolower: bool
     ibmi_json_path: Optional[Path]
     store_member_text: bool
+    member_texts: Dict[str, Optional[str]]
+    member_changes: Dict[str, Tuple[Optional[str], Optional[int]]]
 
     def __init__(
         self, srcfile: str, lib: str, tolower: bool, default_ccsid: str = None, text: bool = False,
-        save_path: Path = Path.cwd()
+        save_path: Path = Path.cwd(), pool: Optional[IBMJobPool] = None, jobs: int = 1, sync: bool = False
     ) -> None:
-        self.job = IBMJob()
+        # pylint: disable=too-many-arguments
+        self.jobs = jobs
+        self.sync = sync
+        self._own_pool = pool is None and jobs > 1
+        if self._own_pool:
+            # One job per worker besides the one running the queries
+            pool = IBMJobPool(max_size=jobs + 1, job_factory=IBMJob)
+        self.pool = pool
+        self.job = pool.lease() if pool is not None else IBMJob()
 
         self.lib = lib
         self.srcfile = srcfile
         self.save_path = save_path
-        if default_ccsid is not None and validate_ccsid(default_ccsid):
+        if default_ccsid is not None and is_valid_ccsid(default_ccsid):
             self.default_ccsid = default_ccsid
         else:
             self.default_ccsid = None
@@ -40,6 +208,17 @@ class CvtSrcPf:
         self.tolower = tolower
         self.ibmi_json_path = save_path / ".ibmi.json"
         self.store_member_text = text
+        self.member_texts = {}
+        self.member_changes = {}
+        self.stream = True
+
+    def close(self):
+        """Hand the job back to the pool it was leased from"""
+        if self.pool is not None:
+            self.pool.release(self.job)
+            if self._own_pool:
+                self.pool.close()
+            self.pool = None
 
     # for free form rpg, write_on_line = 1
     def insert_line(self, file_path, content, start_comment_characters: str, end_comment_characters: str,
@@ -49,14 +228,8 @@ class CvtSrcPf:
                 return False
             with open(file_path, 'r+') as file:
                 lines = file.readlines()
-                lines.insert(write_on_line, '\n')
-
-                starting_whitespace = 0 if start_column == 0 else start_column - 1
-                ending_whitespace = (end_column) - (starting_whitespace +
-                                                    len(start_comment_characters + content + end_comment_characters))
-
-                lines[write_on_line] = ((' ' * starting_whitespace) + start_comment_characters
-                                        + content + (' ' * ending_whitespace) + end_comment_characters + '\n')
+                lines.insert(write_on_line, comment_line(content, start_comment_characters,
+                                                         end_comment_characters, start_column, end_column) + '\n')
                 file.seek(0)
                 file.writelines(lines)
             return True
@@ -96,36 +269,119 @@ class CvtSrcPf:
             raise Exception(f"Source file '{srcpath}' does not exist")
         src_mbrs = self._get_src_mbrs()
         src_ccsid = retrieve_ccsid(str(srcpath), self._default_ccsid())
-        if validate_ccsid(src_ccsid):
+        if is_valid_ccsid(src_ccsid):
             self.default_ccsid = src_ccsid
         else:
             self.default_ccsid = "*JOB"
+        # Db2 converts the records to UTF-8 only when the source file has a CCSID, otherwise CPYTOSTMF does it
+        self.stream = self.stream and src_ccsid.isdigit() and self.default_ccsid == src_ccsid
 
         print(f"{len(src_mbrs)} source members found.")
-        cvt_count = 0
+        manifest = SyncManifest(self.save_path / SYNC_MANIFEST) if self.sync else None
+        manifest_files = manifest.files() if manifest is not None else set()
+        # The destinations are chosen up front so that concurrent conversions cannot pick the same name
+        conversions = []
+        reserved = set()
         for src_mbr in src_mbrs:
             src_mbr_name = self._get_src_mbr_name(src_mbr)
             src_mbr_ext = self._get_src_mbr_ext(src_mbr)
             dst_mbr_name = self._get_dst_mbr_name(src_mbr_name, src_mbr_ext, self.tolower)
-            dst_mbr_path = self._get_dst_mbr_path(dst_mbr_name, src_mbr_name, src_mbr_ext, self.tolower)
+            if manifest is not None:
+                dst_mbr_path = self._get_sync_dst_mbr_path(manifest, manifest_files, src_mbr_name, dst_mbr_name,
+                                                           reserved)
+                if dst_mbr_path is None:
+                    continue
+            else:
+                dst_mbr_path = self._get_dst_mbr_path(dst_mbr_name, src_mbr_name, src_mbr_ext, self.tolower,
+                                                      reserved)
+            reserved.add(dst_mbr_path)
+            conversions.append((src_mbr_name, dst_mbr_path.name, dst_mbr_path))
+        if manifest is not None:
+            self._forget_removed_members(manifest, src_mbrs)
+            print(f"{len(src_mbrs) - len(conversions)} source members unchanged since the last sync.")
+
+        progress = ConversionProgress(len(conversions))
+
+        def convert(conversion: Tuple[str, str, Path]) -> bool:
+            if self.jobs > 1:
+                with self.pool.job() as job:
+                    converted = self._convert_member(srcpath, *conversion, job=job)
+            else:
+                converted = self._convert_member(srcpath, *conversion)
+            if converted and manifest is not None:
+                manifest.record(SyncManifest.key(self.lib, self.srcfile, conversion[0]), conversion[1],
+                                *self.member_changes.get(conversion[0], (None, None)))
+            progress.update(converted)
+            return converted
 
-            if self._cvr_src_mbr(src_mbr_name, srcpath, dst_mbr_name, dst_mbr_path):
-                cvt_count += 1
-                if self.store_member_text:
-                    result = self._get_member_text(src_mbr_name, srcpath)
-                    member_text = result[0][0][0]
-
-                    # If member has text
-                    if member_text is not None:
-                        successfulImport = self.import_member_text(dst_mbr_path, member_text)
-                        if successfulImport:
-                            print("Successfully imported member text!")
+        try:
+            if self.jobs > 1 and len(conversions) > 1:
+                with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+                    cvt_count = sum(executor.map(convert, conversions))
+            else:
+                cvt_count = sum(map(convert, conversions))
+        finally:
+            if manifest is not None:
+                manifest.save()
+        if conversions:
+            print(progress.summary())
 
         if self.ibmi_json_path:
             create_ibmi_json(self.ibmi_json_path, tgt_ccsid=self.default_ccsid)
 
         return cvt_count
 
+    def _get_sync_dst_mbr_path(self, manifest: SyncManifest, manifest_files: Collection[str], src_mbr_name: str,
+                               dst_mbr_name: str, reserved: Collection[Path]) -> Optional[Path]:
+        """Returns where to convert the member to in a sync, None if it has not changed since the last one
+
+        A member converted before is written over its file, a new one takes its plain name unless another member
+        of the manifest owns that file.
+        """
+        entry = manifest.members.get(SyncManifest.key(self.lib, self.srcfile, src_mbr_name))
+        if entry is not None:
+            dst_mbr_path = self.save_path / entry["file"]
+            changed, size = self.member_changes.get(src_mbr_name, (None, None))
+            if changed is not None and [changed, size] == [entry["changed"], entry["size"]] and \
+                    dst_mbr_path.exists():
+                return None
+            return dst_mbr_path
+        dst_mbr_path = self.save_path / dst_mbr_name
+        if dst_mbr_name in manifest_files or dst_mbr_path in reserved:
+            src_mbr_name, src_mbr_ext = dst_mbr_name.split(".", 1)
+            return self._get_dst_mbr_path(dst_mbr_name, src_mbr_name, src_mbr_ext, False, reserved)
+        return dst_mbr_path
+
+    def _forget_removed_members(self, manifest: SyncManifest, src_mbrs: List[Tuple[str, str]]):
+        prefix = SyncManifest.key(self.lib, self.srcfile, "")
+        names = {self._get_src_mbr_name(src_mbr) for src_mbr in src_mbrs}
+        removed = [key for key in manifest.members if key.startswith(prefix) and key[len(prefix):] not in names]
+        if removed:
+            manifest.forget(removed)
+            print(f"{len(removed)} source members no longer exist, their files were kept.")
+
+    def _convert_member(self, srcpath: Path, src_mbr_name: str, dst_mbr_name: str, dst_mbr_path: Path,
+                        job: Optional[IBMJob] = None) -> bool:
+        # pylint: disable=too-many-arguments
+        member_text = None
+        if self.store_member_text:
+            if src_mbr_name in self.member_texts:
+                member_text = self.member_texts[src_mbr_name]
+            else:
+                result = self._get_member_text(src_mbr_name, srcpath, job)
+                member_text = result[0][0][0] if result and result[0] else None
+
+        if self.stream:
+            return self._stream_src_mbr(src_mbr_name, dst_mbr_name, dst_mbr_path, member_text, job)
+        if not self._cvr_src_mbr(src_mbr_name, srcpath, dst_mbr_name, dst_mbr_path, job):
+            return False
+        # If member has text
+        if member_text:
+            successfulImport = self.import_member_text(dst_mbr_path, member_text)
+            if successfulImport:
+                print("Successfully imported member text!")
+        return True
+
     def _default_ccsid(self) -> str:
         if self.default_ccsid is None:
             return "*JOB"
@@ -149,10 +405,11 @@ class CvtSrcPf:
             dst_mbr_name = dst_mbr_name.lower()
         return dst_mbr_name
 
-    def _get_dst_mbr_path(self, dst_mbr_name, src_mbr_name, src_mbr_ext, tolower: bool) -> str:
+    def _get_dst_mbr_path(self, dst_mbr_name, src_mbr_name, src_mbr_ext, tolower: bool,
+                          reserved: Collection[Path] = ()) -> Path:
         dst_mbr_path = self.save_path / dst_mbr_name
         dups = 0
-        while dst_mbr_path.exists():
+        while dst_mbr_path.exists() or dst_mbr_path in reserved:
             # if dst_mbr_name exists, rename it
             dups += 1
             dst_mbr_name = f"{src_mbr_name}_{dups}.{src_mbr_ext}"
@@ -161,29 +418,56 @@ class CvtSrcPf:
             dst_mbr_path = self.save_path / dst_mbr_name
         return dst_mbr_path
 
-    def _cvr_src_mbr(self, src_mbr_name, srcpath, dst_mbr_name, dst_mbr_path) -> bool:
+    def _cvr_src_mbr(self, src_mbr_name, srcpath, dst_mbr_name, dst_mbr_path, job: Optional[IBMJob] = None) -> bool:
         """Convert the source member
         """
         print(f"Converting {src_mbr_name} to {dst_mbr_name}")
-        return self.job.run_cl(
+        return (job or self.job).run_cl(
             f"CPYTOSTMF FROMMBR('{srcpath}/{src_mbr_name}.MBR') "
             f"TOSTMF('{dst_mbr_path}') ENDLINFMT(*LF) STMFCCSID(1208) STMFOPT(*REPLACE)",
             ignore_errors=True, log=True)
 
-    def _get_member_text(self, src_mbr_name, srcpath):
-        """Convert the source member
+    def _stream_src_mbr(self, src_mbr_name, dst_mbr_name, dst_mbr_path: Path, member_text: Optional[str],
+                        job: Optional[IBMJob] = None) -> bool:
+        """Convert the source member by reading its records over the connection of the job
         """
-        return self.job.run_sql(
+        # pylint: disable=too-many-arguments
+        job = job or self.job
+        print(f"Converting {src_mbr_name} to {dst_mbr_name}")
+        tmp_path = dst_mbr_path.with_name(f".{dst_mbr_path.name}.{os.getpid()}.tmp")
+        try:
+            job.run_sql(f"CREATE OR REPLACE ALIAS {MEMBER_ALIAS} "
+                        f"FOR {self.lib.upper()}.{self.srcfile.upper()} ({src_mbr_name})")
+            # CPYTOSTMF drops the trailing blanks of the records as well
+            rows = job.iter_sql(f"SELECT SRCDTA FROM {MEMBER_ALIAS} A ORDER BY RRN(A)", FETCH_ROWS)
+            text_written = write_source((row[0].rstrip(" ") for row in rows), tmp_path, member_text)
+            job.run_cl(f"CHGATR OBJ('{tmp_path}') ATR(*CCSID) VALUE(1208)")
+            os.replace(tmp_path, dst_mbr_path)
+        # pylint: disable=broad-except
+        except Exception as e:
+            print(f"[FAILED]  Converting {src_mbr_name}: {e}")
+            tmp_path.unlink(missing_ok=True)
+            return False
+        if text_written:
+            print("Successfully imported member text!")
+        return True
+
+    def _get_member_text(self, src_mbr_name, srcpath, job: Optional[IBMJob] = None):
+        """Get the text of a member that _get_src_mbrs did not return
+        """
+        return (job or self.job).run_sql(
             f"SELECT TEXT_DESCRIPTION FROM TABLE(qsys2.ifs_object_statistics('{srcpath}/{src_mbr_name}.MBR'))",
             ignore_errors=True, log=False)
 
     def _get_src_mbrs(self) -> List[Tuple[str, str]]:
-        """Get the source members of the source file
+        """Get the source members of the source file, their text into member_texts and their last change
+        timestamp and size into member_changes
         """
         library = self.lib.upper()
         srcpf = self.srcfile.upper()
         results = self.job.run_sql(
-            f"select SYSTEM_TABLE_MEMBER, SOURCE_TYPE from qsys2.syspartitionstat "
+            f"select SYSTEM_TABLE_MEMBER, SOURCE_TYPE, PARTITION_TEXT, LAST_CHANGE_TIMESTAMP, DATA_SIZE "
+            f"from qsys2.syspartitionstat "
             f"where SYSTEM_TABLE_SCHEMA='{library}' and SYSTEM_TABLE_NAME='{srcpf}'")
         if results:
             src_mbrs = []
@@ -194,10 +478,51 @@ class CvtSrcPf:
                 else:
                     mbr_type = ''
                 src_mbrs.append((mbr_name, mbr_type))
+                if len(row) > 2:
+                    self.member_texts[mbr_name] = row[2].strip() if isinstance(row[2], str) else None
+                if len(row) > 4:
+                    self.member_changes[mbr_name] = (str(row[3]) if row[3] is not None else None,
+                                                     int(row[4]) if row[4] is not None else None)
             return src_mbrs
         return []
 
 
+def get_srcfiles(job: IBMJob, lib: str) -> List[str]:
+    """Returns the names of the source physical files in the library"""
+    results = job.run_sql(
+        f"select SYSTEM_TABLE_NAME from qsys2.systables "
+        f"where SYSTEM_TABLE_SCHEMA='{lib.upper()}' and FILE_TYPE='S' order by SYSTEM_TABLE_NAME")
+    return [row[0].strip() for row in results[0]] if results else []
+
+
+def cvtsrcpf_library(lib: str, tolower: bool, default_ccsid: str = None, text: bool = False,
+                     save_path: Path = Path.cwd(), jobs: int = 1, sync: bool = False) -> int:
+    """Converts every source physical file in the library, each into a directory of its name under save_path
+
+    Returns:
+        int: the number of members converted
+    """
+    # pylint: disable=too-many-arguments
+    pool = IBMJobPool(max_size=jobs + 1, job_factory=IBMJob)
+    try:
+        with pool.job() as job:
+            srcfiles = get_srcfiles(job, lib)
+        print(f"{len(srcfiles)} source files found in {lib.upper()}.")
+        cvt_count = 0
+        for srcfile in srcfiles:
+            dirname = srcfile.lower() if tolower else srcfile
+            print(f"Converting {lib.upper()}/{srcfile} into {dirname}")
+            (save_path / dirname).mkdir(exist_ok=True)
+            cvtsrcpf = CvtSrcPf(srcfile, lib, tolower, default_ccsid, text, save_path / dirname, pool, jobs, sync)
+            try:
+                cvt_count += cvtsrcpf.run()
+            finally:
+                cvtsrcpf.close()
+        return cvt_count
+    finally:
+        pool.close()
+
+
 def _get_attr(filepath: str, defaultCcsid: str):
     stream = os.popen(f'/QOpenSys/usr/bin/attr {filepath}')
     output = stream.read().strip()
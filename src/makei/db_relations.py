@@ -0,0 +1,152 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+""" The files depending on the physical files of the object libraries, read once for a whole build
+
+crtfrmstmf deletes the logical files, views and indexes over a physical file before creating it again, and used
+to find them with DSPDBR to an outfile and a query for every physical file. Before make runs, makei now reads the
+dependents of every physical file of the object libraries with one query per library, and writes them to
+dbrelations.json in the temporary directory of the build. The recipes pass the file to crtfrmstmf, which looks the
+physical file up there first.
+
+The objects the build creates again change the relations: crtfrmstmf appends what it deleted and created to
+dbrelations.jsonl next to the file, with one write per line so that concurrent recipes do not overwrite each
+other, and the relations are read back with these changes applied.
+"""
+
+import json
+import os
+from contextlib import closing
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import ibm_db_dbi
+
+from makei.ibm_job import IBMJob
+from makei.utils import atomic_write
+
+DB_RELATIONS_FILE = "dbrelations.json"
+
+# The views and logical files, then the indexes, over the files of a library, as DSPDBR lists them
+DEPENDENTS_QUERY = "SELECT SYSTEM_TABLE_NAME, SYSTEM_VIEW_NAME, SYSTEM_VIEW_SCHEMA FROM QSYS2.SYSVIEWDEP " \
+                   "WHERE SYSTEM_TABLE_SCHEMA = ? AND SYSTEM_TABLE_NAME IS NOT NULL " \
+                   "UNION SELECT SYSTEM_TABLE_NAME, SYSTEM_INDEX_NAME, SYSTEM_INDEX_SCHEMA FROM QSYS2.SYSINDEXES " \
+                   "WHERE SYSTEM_TABLE_SCHEMA = ?"
+BASED_ON_QUERY = "SELECT SYSTEM_TABLE_NAME, SYSTEM_TABLE_SCHEMA FROM QSYS2.SYSVIEWDEP " \
+                 "WHERE SYSTEM_VIEW_SCHEMA = '{lib}' AND SYSTEM_VIEW_NAME = '{obj}' AND SYSTEM_TABLE_NAME IS NOT NULL"
+
+
+def _key(obj: str, lib: str) -> str:
+    return f"{lib.strip().upper()}/{obj.strip().upper()}"
+
+
+def query_dependents(libraries: List[str]) -> Optional[Dict[str, List[List[str]]]]:
+    """ Returns the dependent (file, library) pairs of the files of the libraries keyed by LIB/FILE, None when the
+    query cannot be run"""
+    try:
+        connection = ibm_db_dbi.connect()
+    # pylint: disable=broad-except
+    except Exception:
+        return None
+    dependents: Dict[str, List[List[str]]] = {}
+    with closing(connection), closing(connection.cursor()) as cursor:
+        for library in libraries:
+            try:
+                cursor.execute(DEPENDENTS_QUERY, (library, library))
+                for file, dependent, dependent_lib in cursor.fetchall():
+                    dependents.setdefault(_key(file, library), []).append([dependent.strip(), dependent_lib.strip()])
+            # pylint: disable=broad-except
+            except Exception:
+                return None
+    return dependents
+
+
+class DbRelations:
+    """ The dependents of the files in the libraries read at the start of the build, with the changes of the build"""
+    path: Path
+    libraries: List[str]
+    _dependents: Dict[str, List[List[str]]]
+
+    def __init__(self, path: Path):
+        self.path = path
+        try:
+            with path.open(encoding="utf-8") as file:
+                content = json.load(file)
+            self.libraries = content["libraries"]
+            self._dependents = content["dependents"]
+        except (OSError, ValueError, KeyError, TypeError):
+            self.libraries = []
+            self._dependents = {}
+            return
+        try:
+            with self.journal_path.open(encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        self._apply(json.loads(line))
+                    except (ValueError, KeyError, TypeError):
+                        # A line cut short by a recipe that was killed
+                        continue
+        except OSError:
+            pass
+
+    @property
+    def journal_path(self) -> Path:
+        return self.path.with_suffix(".jsonl")
+
+    @staticmethod
+    def create(path: Path, libraries: Iterable[str],
+               query: Callable[[List[str]], Optional[Dict[str, List[List[str]]]]] = query_dependents) -> bool:
+        """ Reads the relations of the libraries and writes them to path, returns whether they could be read"""
+        libraries = sorted({library.upper() for library in libraries})
+        dependents = query(libraries) if libraries else None
+        if dependents is None:
+            return False
+        try:
+            atomic_write(path, json.dumps({"libraries": libraries, "dependents": dependents}))
+            path.with_suffix(".jsonl").unlink(missing_ok=True)
+        except OSError:
+            return False
+        return True
+
+    def dependents(self, obj: str, lib: str) -> Optional[List[Tuple[str, str]]]:
+        """ Returns the (file, library) pairs depending on the file, None when its library was not read"""
+        if lib.upper() not in self.libraries:
+            return None
+        return [(dependent, dependent_lib) for dependent, dependent_lib in self._dependents.get(_key(obj, lib), [])]
+
+    def record(self, deleted: Sequence[Tuple[str, str]], created: Optional[Tuple[str, str]] = None,
+               based_on: Sequence[Tuple[str, str]] = ()):
+        """ Records the files the build deleted, and the file it created over the based_on files"""
+        change = {"deleted": [list(pair) for pair in deleted]}
+        if created is not None:
+            change.update(created=list(created), based_on=[list(pair) for pair in based_on])
+        self._apply(change)
+        data = (json.dumps(change) + "\n").encode("utf-8")
+        try:
+            fd = os.open(self.journal_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        except OSError:
+            return
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def _apply(self, change: Dict):
+        deleted = {_key(obj, lib) for obj, lib in change["deleted"]}
+        for key in deleted:
+            # A deleted physical file has no dependents left
+            self._dependents.pop(key, None)
+        for key, dependents in self._dependents.items():
+            self._dependents[key] = [pair for pair in dependents if _key(*pair) not in deleted]
+        if "created" in change:
+            obj, lib = change["created"]
+            for based_on in change["based_on"]:
+                dependents = self._dependents.setdefault(_key(*based_on), [])
+                if _key(obj, lib) not in {_key(*pair) for pair in dependents}:
+                    dependents.append([obj, lib])
+
+
+def based_on_files(job: IBMJob, obj: str, lib: str) -> List[Tuple[str, str]]:
+    """ Returns the (file, library) pairs a logical file or view is created over"""
+    rows, _ = job.run_sql(BASED_ON_QUERY.format(lib=lib.upper(), obj=obj.upper()))
+    return [(file.strip(), file_lib.strip()) for file, file_lib in rows]
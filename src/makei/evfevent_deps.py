@@ -0,0 +1,194 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+""" Dependency files generated from the EVFEVENT records of the compiles
+
+The recipes download the EVFEVENT member of every object into `.evfevent/`. Its FILEID records list the
+source files read by the compiler, i.e. the main source and every /COPY, /INCLUDE or #include member.
+After a build the included files are mapped back to the project sources and written to
+`.deps/<TARGET>.d`, which the Makefile includes, so that changing a copybook rebuilds the objects using it.
+"""
+
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from makei.project_index import ProjectIndex
+from makei.utils import write_if_changed
+
+DEP_DIR = ".deps"
+EVENT_DIR = ".evfevent"
+DEP_SUFFIX = ".d"
+
+# Files of the compiler or the system, see cleanRPGDeps in def_rules.mk
+_IGNORED_FILE_PATTERN = re.compile(r"^QTEMP/|QSYS|EVFTEMPF0[12]|^/QIBM/", re.IGNORECASE)
+_MEMBER_PATTERN = re.compile(r"^(?:(\w+)/)?([\w$#@]+)\(([\w$#@]+)\)$")
+
+
+def parse_file_ids(content: str) -> List[str]:
+    """ Returns the names of the FILEID records of an events file, in order
+
+    >>> parse_file_ids("FILEID 0 001 000000 028 /home/proj/QRPGLESRC/A.RPGLE 20240101120000 0\\n"
+    ...                "FILEID 0 002 000004 020 LIB/QPROTOSRC(PROTO) 20240101120000 0\\n")
+    ['/home/proj/QRPGLESRC/A.RPGLE', 'LIB/QPROTOSRC(PROTO)']
+    """
+    names = []
+    for line in content.splitlines():
+        if line.startswith("FILEID "):
+            parts = line.split(" ", 5)
+            if len(parts) < 6:
+                continue
+            try:
+                length = int(parts[4])
+            except ValueError:
+                continue
+            # The name is preceded by its length, so it may contain blanks
+            names.append(parts[5][:length])
+        elif line.startswith("FILEIDCONT ") and names:
+            parts = line.split(" ", 5)
+            if len(parts) == 6:
+                try:
+                    names[-1] += parts[5][:int(parts[4])]
+                except ValueError:
+                    continue
+    return names
+
+
+class SourceResolver:
+    """ Maps the file names found in events files back to the source files of the project"""
+
+    src_dir: Path
+    _members: Optional[Dict[str, List[Path]]]
+
+    def __init__(self, src_dir: Path, index: Optional[ProjectIndex] = None):
+        self.src_dir = src_dir.resolve()
+        self.index = index
+        self._members = None
+
+    def _member_index(self) -> Dict[str, List[Path]]:
+        # Source member name (the file name without extensions) to the project files with that name
+        if self._members is None:
+            self._members = {}
+            if self.index is not None:
+                for directory, entries in self.index.walk():
+                    for entry in entries.values():
+                        if not entry.is_dir:
+                            self._members.setdefault(entry.name.split(".")[0].upper(), []).append(
+                                self.src_dir / directory / entry.name)
+                return self._members
+            for root, dirs, files in os.walk(self.src_dir):
+                dirs[:] = [name for name in dirs if not name.startswith(".")]
+                for name in files:
+                    self._members.setdefault(name.split(".")[0].upper(), []).append(Path(root) / name)
+        return self._members
+
+    def resolve(self, name: str) -> Optional[Path]:
+        """ Returns the project file for a FILEID name, None if it is not a project file"""
+        if _IGNORED_FILE_PATTERN.search(name):
+            return None
+        member = _MEMBER_PATTERN.match(name)
+        if member:
+            _, source_file, member_name = member.groups()
+            candidates = self._member_index().get(member_name.upper(), [])
+            in_source_file = [path for path in candidates if path.parent.name.upper() == source_file.upper()]
+            if len(in_source_file) == 1:
+                return in_source_file[0]
+            return candidates[0] if len(candidates) == 1 else None
+        path = Path(name) if name.startswith("/") else self.src_dir / name
+        try:
+            path = path.resolve()
+            path.relative_to(self.src_dir)
+        except (OSError, ValueError):
+            return None
+        return path if path.is_file() else None
+
+
+def event_file_candidates(target: str, source_file: Optional[str], targets: Iterable[str]) -> List[str]:
+    """ Returns the names the recipes give to the events file of a target, see EVFEVENT_DOWNLOAD
+
+    >>> event_file_candidates("HELLO.PGM", "hello.pgm.rpgle", ["HELLO.PGM"])
+    ['HELLO.PGM.evfevent', 'hello.pgm.rpgle.evfevent', 'HELLO.evfevent']
+    >>> event_file_candidates("HELLO.PGM", None, ["HELLO.MODULE", "HELLO.PGM"])
+    ['HELLO.PGM.evfevent']
+    """
+    name, _, object_type = target.rpartition(".")
+    candidates = []
+    if object_type == "PGM":
+        candidates.append(f"{target}.evfevent")
+    if source_file:
+        candidates.append(f"{Path(source_file).name}.evfevent")
+    # A program created from a module of the same name would pick up the events file of the module
+    if object_type != "PGM" or f"{name}.MODULE" not in targets:
+        candidates.append(f"{name}.evfevent")
+    return candidates
+
+
+def _escape(path: Path) -> str:
+    return str(path).replace("$", "$$")
+
+
+def write_dep_file(dep_dir: Path, target: str, dependencies: List[Path], suffix: str = DEP_SUFFIX,
+                   origin: str = "the events file"):
+    """ Writes the dependency file of a target in one go, or removes it if there are no dependencies
+
+    Every dependency also gets an empty rule, so that deleting a copybook does not break the next build.
+    The file is left untouched if its content does not change.
+    """
+    dep_path = dep_dir / f"{target}{suffix}"
+    if not dependencies:
+        dep_path.unlink(missing_ok=True)
+        return
+    lines = [f"# Generated by makei from {origin} of {target}, DO NOT EDIT.",
+             f"{target}: {' '.join(map(_escape, dependencies))}", ""]
+    lines.extend(f"{_escape(dependency)}:" for dependency in dependencies)
+    dep_dir.mkdir(parents=True, exist_ok=True)
+    write_if_changed(dep_path, "\n".join(lines) + "\n")
+
+
+def read_dep_file(dep_dir: Path, target: str, suffix: str = DEP_SUFFIX) -> List[str]:
+    """ Returns the dependencies recorded for a target"""
+    try:
+        content = (dep_dir / f"{target}{suffix}").read_text(encoding="utf-8")
+    except OSError:
+        return []
+    dependencies = []
+    for line in content.splitlines():
+        if line.startswith(f"{target}:"):
+            dependencies.extend(dep.replace("$$", "$") for dep in line.split(":", 1)[1].split())
+    return dependencies
+
+
+def update_dep_files(src_dir: Path, targets: Iterable[str], target_sources: Dict[str, Optional[str]],
+                     since: float, index: Optional[ProjectIndex] = None) -> int:
+    """ Writes the dependency files of the targets from their events files downloaded after `since`
+
+    target_sources maps all the targets of the project to their source files.
+    Returns the number of events files processed.
+    """
+    event_dir = src_dir / EVENT_DIR
+    dep_dir = src_dir / DEP_DIR
+    resolver = SourceResolver(src_dir, index)
+    written = 0
+    for target in targets:
+        source_file = target_sources.get(target)
+        for candidate in event_file_candidates(target, source_file, target_sources):
+            event_path = event_dir / candidate
+            try:
+                if event_path.stat().st_mtime < since:
+                    continue
+                content = event_path.read_text(encoding="utf-8", errors="replace")
+            except OSError:
+                continue
+            names = parse_file_ids(content)
+            # The first record is the source compiled
+            main_source = resolver.resolve(names[0]) if names else None
+            dependencies = []
+            for name in names[1:]:
+                path = resolver.resolve(name)
+                if path is not None and path != main_source and path not in dependencies and " " not in str(path):
+                    dependencies.append(path)
+            write_dep_file(dep_dir, target, dependencies)
+            written += 1
+            break
+    return written
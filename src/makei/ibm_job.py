@@ -3,20 +3,88 @@
 
 import json
 import sys
-from contextlib import closing
-from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional, Tuple
+import threading
+import time
+from contextlib import closing, contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
 
 import ibm_db_dbi
 
+from makei.joblog_store import append_entry
 from makei.utils import format_datetime
 
 
+class JobEnv():
+    """Library list settings and environment commands applied to a job"""
+    curlib: str
+    pre_usr_libl: Tuple[str, ...]
+    post_usr_libl: Tuple[str, ...]
+    env_cmds: Tuple[str, ...]
+
+    def __init__(self, curlib: str = "", pre_usr_libl: Tuple[str, ...] = (), post_usr_libl: Tuple[str, ...] = (),
+                 env_cmds: Tuple[str, ...] = ()):
+        self.curlib = curlib
+        self.pre_usr_libl = tuple(pre_usr_libl)
+        self.post_usr_libl = tuple(post_usr_libl)
+        self.env_cmds = tuple(env_cmds)
+
+    @staticmethod
+    def from_settings(env_settings: Optional[Dict[str, str]]) -> "JobEnv":
+        """Build from the curlib, preUsrlibl, postUsrlibl and IBMiEnvCmd settings passed down by make
+
+        >>> JobEnv.from_settings({"curlib": "MYLIB", "preUsrlibl": "LIB1 LIB2"})
+        JobEnv('MYLIB', ('LIB1', 'LIB2'), (), ())
+        """
+        env_settings = env_settings or {}
+        return JobEnv(env_settings.get("curlib") or "",
+                      tuple((env_settings.get("preUsrlibl") or "").split()),
+                      tuple((env_settings.get("postUsrlibl") or "").split()),
+                      tuple(cmd for cmd in (env_settings.get("IBMiEnvCmd") or "").split("\\n") if cmd))
+
+    def to_settings(self) -> Dict[str, str]:
+        return {"curlib": self.curlib,
+                "preUsrlibl": " ".join(self.pre_usr_libl),
+                "postUsrlibl": " ".join(self.post_usr_libl),
+                "IBMiEnvCmd": "\\n".join(self.env_cmds)}
+
+    def fingerprint(self) -> Tuple:
+        return (self.curlib, self.pre_usr_libl, self.post_usr_libl, self.env_cmds)
+
+    def can_reset_to(self, other: "JobEnv") -> bool:
+        """Environment commands cannot be undone, so a job they ran in can only be reset to the same commands"""
+        return not self.env_cmds or self.env_cmds == other.env_cmds
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, JobEnv) and self.fingerprint() == other.fingerprint()
+
+    def __hash__(self) -> int:
+        return hash(self.fingerprint())
+
+    def __repr__(self) -> str:
+        return f"JobEnv{self.fingerprint()!r}"
+
+
 class IBMJob():
     job_id: str
     conn: ibm_db_dbi.Connection
+    env: JobEnv
+    added_libs: Set[str]
+    # Temporary source files created in the job by crtfrmstmf, with their record length and CCSID
+    tmp_src_files: Dict[str, Tuple[int, str]]
+    # The current library of the job before apply_env changed it, *CRTDFT when it had none
+    initial_curlib: Optional[str]
+    # Set when commands the pool cannot undo and does not track ran in the job (precmd, postcmd): overrides, job
+    # attributes or library list entries would leak into the next request, so the pool discards the job.
+    # The environment commands are part of the env, jobs are only reused for the same ones.
+    untracked_changes: bool
 
     def __init__(self):
+        self.env = JobEnv()
+        self.added_libs = set()
+        self.tmp_src_files = {}
+        self.initial_curlib = None
+        self.untracked_changes = False
         try:
             self.conn = ibm_db_dbi.connect()
             # https://kadler.io/2018/09/20/using-python-ibm-db-with-un-journaled-files.html#
@@ -29,7 +97,67 @@ class IBMJob():
             sys.exit(1)
 
     def __del__(self):
-        self.conn.close()
+        self.close()
+
+    def close(self):
+        conn = getattr(self, "conn", None)
+        if conn is not None:
+            self.conn = None
+            conn.close()
+
+    def apply_env(self, env_settings: Optional[Dict[str, str]]) -> int:
+        """Change the job to the given library list settings, only touching the parts that differ
+
+        Returns:
+            int: the number of CL commands run
+        """
+        target = JobEnv.from_settings(env_settings)
+        current = self.env
+        if target == current:
+            return 0
+        if not current.can_reset_to(target):
+            raise ValueError(f"Cannot undo the environment commands of job {self.job_id}")
+        count = 0
+        if target.curlib != current.curlib:
+            if self.initial_curlib is None:
+                self.initial_curlib = self.current_library() or "*CRTDFT"
+            self.run_cl(f"CHGCURLIB CURLIB({target.curlib or self.initial_curlib})", log=True)
+            count += 1
+        if target.pre_usr_libl != current.pre_usr_libl:
+            count += self._remove_libs(current.pre_usr_libl)
+            for lib in reversed(target.pre_usr_libl):
+                count += self._add_lib(lib, "*FIRST")
+        if target.post_usr_libl != current.post_usr_libl:
+            count += self._remove_libs(current.post_usr_libl)
+            for lib in target.post_usr_libl:
+                count += self._add_lib(lib, "*LAST")
+        if target.env_cmds != current.env_cmds:
+            for cmd in target.env_cmds:
+                self.run_cl(cmd, log=True)
+                count += 1
+        self.env = target
+        return count
+
+    def current_library(self) -> Optional[str]:
+        """Returns the current library of the job, None when it has none"""
+        records, _ = self.run_sql(
+            "SELECT SYSTEM_SCHEMA_NAME FROM QSYS2.LIBRARY_LIST_INFO WHERE TYPE='CURRENT'")
+        return records[0][0].strip() if records else None
+
+    def _add_lib(self, lib: str, position: str) -> int:
+        # Libraries that already were on the library list must not be removed when the job is reset
+        if self.run_cl(f"ADDLIBLE LIB({lib}) POSITION({position})", ignore_errors=True, log=True):
+            self.added_libs.add(lib)
+        return 1
+
+    def _remove_libs(self, libs: Tuple[str, ...]) -> int:
+        count = 0
+        for lib in libs:
+            if lib in self.added_libs:
+                self.run_cl(f"RMVLIBLE LIB({lib})", ignore_errors=True)
+                self.added_libs.discard(lib)
+                count += 1
+        return count
 
     def run_cl(self, cmd: str, ignore_errors: bool = False, log: bool = False):
         if log:
@@ -43,9 +171,7 @@ class IBMJob():
                 if not ignore_errors:
                     print(f"[FAILED]  {cmd}")
                     raise
-                    return False
-                else:
-                    return True
+                return False
 
     def run_sql(self, sql, ignore_errors=False, log: bool = False):
         with closing(self.conn.cursor()) as cursor:
@@ -67,6 +193,28 @@ class IBMJob():
                     raise
                 return None
 
+    def iter_sql(self, sql: str, batch_size: int = 1000) -> Iterator[Tuple]:
+        """Yield the rows of a query, fetching batch_size rows at a time instead of the whole result"""
+        with closing(self.conn.cursor()) as cursor:
+            cursor.execute(sql)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield from rows
+
+    def insert_rows(self, table: str, columns: Sequence[str], rows: Sequence[Sequence[Any]],
+                    batch_size: int = 500) -> int:
+        """Insert the rows with multi-row INSERT statements of up to batch_size rows, return the number inserted"""
+        row_markers = f"({', '.join('?' * len(columns))})"
+        insert = f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+        with closing(self.conn.cursor()) as cursor:
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                cursor.execute(insert + ", ".join([row_markers] * len(batch)),
+                               [value for row in batch for value in row])
+        return len(rows)
+
     def dump_results_to_dict(self, results: Tuple[List[str], List[List[Any]]]):
         record_dicts = []
         records, column_names = results
@@ -78,8 +226,150 @@ class IBMJob():
         return get_joblog_for_job(self.job_id)
 
 
-def get_joblog_for_job(job_id: str) -> List[Dict[str, Any]]:
-    query_job = IBMJob()
+class IBMJobPool():
+    """Leases IBMJobs keyed by the environment (library list settings) applied to them
+
+    A job that is leased again for the same environment is handed out as is. Otherwise an idle job is reset to
+    the requested environment, which only runs the commands for the parts that differ; jobs the environment
+    commands (IBMiEnvCmd) ran in are only reset to environments with the same commands. The pool never holds
+    more than `max_size` jobs, leased or idle, and closes jobs that have been idle for `idle_timeout` seconds.
+    """
+    # pylint: disable=too-many-instance-attributes
+
+    max_size: int
+    idle_timeout: float
+    counters: Dict[str, int]
+
+    def __init__(self, max_size: int = 8, idle_timeout: float = 600,
+                 job_factory: Callable[[], IBMJob] = IBMJob):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._job_factory = job_factory
+        self._cond = threading.Condition()
+        self._idle: List[Tuple[IBMJob, float]] = []
+        self._size = 0
+        self.counters = {"leases": 0, "connects": 0, "reuse_hits": 0, "resets": 0, "evictions": 0}
+
+    def lease(self, env_settings: Optional[Dict[str, str]] = None) -> IBMJob:
+        """Lease a job with `env_settings` applied. If env_settings is None, any job will do."""
+        return self.lease_many([env_settings])[0]
+
+    def lease_many(self, env_settings_list: List[Optional[Dict[str, str]]]) -> List[IBMJob]:
+        """Lease several jobs at once, so that concurrent callers cannot deadlock waiting on each other"""
+        if len(env_settings_list) > self.max_size:
+            raise ValueError(f"Cannot lease {len(env_settings_list)} jobs from a pool of {self.max_size}")
+        targets = [JobEnv.from_settings(env) if env is not None else None for env in env_settings_list]
+        with self._cond:
+            self._evict_expired()
+            while len(self._idle) + self.max_size - self._size < len(targets):
+                self._cond.wait()
+                self._evict_expired()
+            picked = [self._pick(target) for target in targets]
+            self.counters["leases"] += len(targets)
+
+        jobs = []
+        try:
+            for job, target in zip(picked, targets):
+                reused = job is not None
+                if job is None:
+                    job = self._job_factory()
+                    with self._cond:
+                        self.counters["connects"] += 1
+                if target is not None and job.apply_env(target.to_settings()) > 0 and reused:
+                    with self._cond:
+                        self.counters["resets"] += 1
+                jobs.append(job)
+        except BaseException:
+            for job in jobs:
+                self.release(job, discard=True)
+            with self._cond:
+                self._size -= len(picked) - len(jobs)
+                self._cond.notify_all()
+            raise
+        return jobs
+
+    def _pick(self, target: Optional[JobEnv]) -> Optional[IBMJob]:
+        """Take the best idle job for target; None means a new job has to be connected. Called with the lock held."""
+        candidates = [index for index, (job, _) in enumerate(self._idle)
+                      if target is None or job.env.can_reset_to(target)]
+        exact = [index for index in candidates if target is None or self._idle[index][0].env == target]
+        if exact:
+            self.counters["reuse_hits"] += 1
+            return self._idle.pop(exact[-1])[0]
+        if candidates:
+            return self._idle.pop(candidates[-1])[0]
+        if self._size >= self.max_size:
+            # Make room by closing an idle job whose environment cannot be reset
+            self._idle.pop(0)[0].close()
+            self.counters["evictions"] += 1
+            self._size -= 1
+        self._size += 1
+        return None
+
+    def release(self, job: IBMJob, discard: bool = False):
+        """Return a leased job; discard it if its state is unknown (e.g. a request failed half-way) or was changed
+        by commands that cannot be undone"""
+        with self._cond:
+            if discard or job.untracked_changes:
+                self._size -= 1
+                job.close()
+            else:
+                self._idle.append((job, time.monotonic()))
+            self._evict_expired()
+            self._cond.notify_all()
+
+    @contextmanager
+    def job(self, env_settings: Optional[Dict[str, str]] = None) -> Iterator[IBMJob]:
+        job = self.lease(env_settings)
+        try:
+            yield job
+        except BaseException:
+            self.release(job, discard=True)
+            raise
+        self.release(job)
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        expired = [job for job, released in self._idle if now - released >= self.idle_timeout]
+        if expired:
+            self._idle = [(job, released) for job, released in self._idle if now - released < self.idle_timeout]
+            for job in expired:
+                job.close()
+            self._size -= len(expired)
+            self.counters["evictions"] += len(expired)
+
+    def close(self):
+        with self._cond:
+            for job, _ in self._idle:
+                job.close()
+            self._size -= len(self._idle)
+            self._idle = []
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return dict(self.counters, size=self._size, idle=len(self._idle))
+
+    def summary(self) -> str:
+        stats = self.stats()
+        return f"{stats['leases']} job lease(s) served by {stats['connects']} connection(s): " \
+               f"{stats['reuse_hits']} reuse hit(s), {stats['resets']} reset(s), {stats['evictions']} eviction(s)"
+
+
+def get_joblog_for_job(job_id: str, query_job: Optional[IBMJob] = None,
+                       since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Retrieve the joblog messages of a job
+
+    Args:
+        job_id (str): qualified job name, e.g. 123456/USER/QSQSRVR
+        query_job (IBMJob, optional): job used to run the query. If none is set, a new job will be created.
+        since (datetime, optional): only return messages sent at or after this time. Long-lived jobs
+            (e.g. the ones kept by the compile server) need this to leave out earlier requests.
+    """
+    if query_job is None:
+        query_job = IBMJob()
     sql = "SELECT MESSAGE_ID," + \
           "MESSAGE_TEXT," + \
           "MESSAGE_SECOND_LEVEL_TEXT," + \
@@ -98,6 +388,8 @@ def get_joblog_for_job(job_id: str) -> List[Dict[str, Any]]:
           "FROM TABLE(" + \
           f"QSYS2.JOBLOG_INFO('{job_id}')" + \
           ") A"
+    if since is not None:
+        sql += f" WHERE MESSAGE_TIMESTAMP >= '{since.strftime('%Y-%m-%d-%H.%M.%S.%f')}'"
     results = query_job.run_sql(sql)
     joblog_dict = query_job.dump_results_to_dict(results)
     return joblog_dict
@@ -110,8 +402,11 @@ def default_filter_func(record: Dict[str, Any]) -> bool:
 
 def save_joblog_json(cmd: str, cmd_time: str, jobid: str, build_object: str, source: str, output: str,
                      failed: bool, joblog_json: Optional[str],
-                     filter_func: Callable[[Dict[str, Any]], bool] = default_filter_func):
-    records = get_joblog_for_job(jobid)
+                     filter_func: Callable[[Dict[str, Any]], bool] = default_filter_func,
+                     query_job: Optional[IBMJob] = None, since: Optional[datetime] = None,
+                     rcdlen: Optional[int] = None, backup: Optional[Dict[str, Any]] = None):
+    # pylint: disable=too-many-arguments
+    records = get_joblog_for_job(jobid, query_job, since)
     messages = []
     for record in records:
         if not filter_func(record):
@@ -142,17 +437,15 @@ def save_joblog_json(cmd: str, cmd_time: str, jobid: str, build_object: str, sou
         "output": output,
         "failed": failed
     }
+    if rcdlen is not None:
+        # Record length of the temporary source file the object was compiled from
+        dumped_joblog["rcdlen"] = rcdlen
+    if backup is not None:
+        # Strategy used to keep the existing objects and the seconds each of its steps took
+        dumped_joblog["backup"] = backup
 
     if joblog_json is not None:
-        joblog_json_path = Path(joblog_json)
-        if joblog_json_path.is_file():
-            with joblog_json_path.open(encoding="utf-8") as json_file:
-                data = json.load(json_file)
-                data.append(dumped_joblog)
-        else:
-            data = [dumped_joblog]
-
-        with joblog_json_path.open('w', encoding="utf-8") as json_file:
-            json.dump(data, json_file, indent=4)
+        # Merged into joblog_json by BuildEnv once make has finished, see makei.joblog_store
+        append_entry(joblog_json, dumped_joblog)
     else:
         print(json.dumps([dumped_joblog], indent=4))
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+""" Static scanner for the includes of the sources, used before anything has been compiled
+
+The dependencies found in the events files (see evfevent_deps) are only known after a successful compile.
+The scanner reads the include directives of the sources instead:
+- RPG `/COPY` and `/INCLUDE`, fixed or free form
+- embedded SQL `EXEC SQL INCLUDE`
+- CL `INCLUDE SRCMBR() SRCFILE()` and `INCLUDE SRCSTMF()`
+- COBOL `COPY member OF file`
+- C and C++ `#include`
+and resolves them against the directory of the source, the project root and the includePath of iproj.json.
+The directives of every file are cached in .makei/cache/includes.json, keyed on mtime and size.
+"""
+
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from makei.project_index import ProjectIndex
+from makei.utils import atomic_write
+
+CACHE_PATH = Path(".makei") / "cache" / "includes.json"
+STATIC_DEP_SUFFIX = ".static.d"
+
+_QUOTED_OPERAND = r"(?:'([^']+)'|\"([^\"]+)\"|([^\s;'\"]+))"
+
+_RPG_PATTERNS = [
+    # Columns 1-5 are the sequence number and column 6 the specification type in fixed form
+    re.compile(r"^(?:.{5}.?)?\s*/(?:COPY|INCLUDE)\s+" + _QUOTED_OPERAND, re.IGNORECASE),
+    re.compile(r"\bEXEC\s+SQL\s+INCLUDE\s+" + _QUOTED_OPERAND, re.IGNORECASE),
+]
+_CL_MEMBER_PATTERN = re.compile(r"\bINCLUDE\s+SRCMBR\(\s*([\w$#@]+)\s*\)(?:\s+SRCFILE\(\s*([\w$#@/]+)\s*\))?",
+                                re.IGNORECASE)
+_CL_STMF_PATTERN = re.compile(r"\bINCLUDE\s+SRCSTMF\(\s*'([^']+)'\s*\)", re.IGNORECASE)
+_COBOL_PATTERN = re.compile(r"\bCOPY\s+" + _QUOTED_OPERAND + r"(?:\s+(?:OF|IN)\s+([\w$#@/]+))?", re.IGNORECASE)
+_C_PATTERN = re.compile(r"^\s*#\s*include\s*[<\"]([^>\"]+)[>\"]")
+_SQL_INCLUDE_PATTERN = re.compile(r"\bEXEC\s+SQL\s+INCLUDE\s+" + _QUOTED_OPERAND, re.IGNORECASE)
+
+# Language of a source by its (last) extension and the extensions tried for includes without one
+_RPG_EXTENSIONS = ["rpgle", "sqlrpgle", "rpgleinc", "rpginc", "rpg", "sqlrpg"]
+_CL_EXTENSIONS = ["clle", "clp", "clinc", "cl"]
+_COBOL_EXTENSIONS = ["cblle", "sqlcblle", "cbl", "cblinc", "cpy"]
+_C_EXTENSIONS = ["c", "cpp", "h", "hpp", "sqlc", "sqlcpp"]
+_LANGUAGES = {ext: language for language, extensions in (("rpg", _RPG_EXTENSIONS), ("cl", _CL_EXTENSIONS),
+                                                         ("cobol", _COBOL_EXTENSIONS), ("c", _C_EXTENSIONS))
+              for ext in extensions}
+_INCLUDE_EXTENSIONS = {
+    "rpg": ["rpgleinc", "rpginc", "rpgle", "sqlrpgle"],
+    "cl": ["clinc", "clle"],
+    "cobol": ["cblinc", "cpy", "cblle"],
+    "c": [],
+}
+_DEFAULT_SOURCE_FILES = {"rpg": "QRPGLESRC", "cl": "QCLSRC", "cobol": "QCBLLESRC", "c": "H"}
+
+# (kind, name, source file) with kind "path" for stream files and "member" for source members
+Directive = Tuple[str, str, Optional[str]]
+
+
+def _operand(match: "re.Match", start: int = 1) -> Tuple[str, bool]:
+    """ Returns the operand of a directive and whether it was quoted"""
+    quoted = match.group(start) or match.group(start + 1)
+    if quoted:
+        return quoted, True
+    return match.group(start + 2), False
+
+
+def _directive(operand: str, quoted: bool, source_file: Optional[str] = None) -> Directive:
+    """
+    >>> _directive("QPROTOSRC,PROTO", False)
+    ('member', 'PROTO', 'QPROTOSRC')
+    >>> _directive("MYLIB/QPROTOSRC,PROTO", False)
+    ('member', 'PROTO', 'QPROTOSRC')
+    >>> _directive("qprotosrc/proto.rpgleinc", False)
+    ('path', 'qprotosrc/proto.rpgleinc', None)
+    >>> _directive("PROTO", False)
+    ('member', 'PROTO', None)
+    """
+    operand = operand.rstrip(".;")
+    if quoted:
+        return "path", operand, None
+    if "," in operand:
+        source_file, member = operand.split(",", 1)
+        return "member", member.strip(), source_file.split("/")[-1].strip()
+    if "/" in operand or "." in operand:
+        return "path", operand, None
+    return "member", operand, source_file.split("/")[-1] if source_file else None
+
+
+def parse_directives(content: str, language: str) -> List[Directive]:
+    """ Returns the include directives of a source, in order"""
+    directives = []
+    for line in content.splitlines():
+        if language == "rpg":
+            # Comment lines in fixed form
+            if len(line) > 6 and line[6] == "*":
+                continue
+            for pattern in _RPG_PATTERNS:
+                match = pattern.search(line)
+                if match:
+                    directives.append(_directive(*_operand(match)))
+                    break
+        elif language == "cl":
+            match = _CL_MEMBER_PATTERN.search(line)
+            if match:
+                directives.append(("member", match.group(1), (match.group(2) or "").split("/")[-1] or None))
+            match = _CL_STMF_PATTERN.search(line)
+            if match:
+                directives.append(("path", match.group(1), None))
+        elif language == "cobol":
+            # Column 7 is the indicator area, * and / are comments
+            if len(line) > 6 and line[6] in "*/":
+                continue
+            match = _SQL_INCLUDE_PATTERN.search(line) or _COBOL_PATTERN.search(line)
+            if match:
+                source_file = match.group(4) if match.re is _COBOL_PATTERN else None
+                directives.append(_directive(*_operand(match), source_file))
+        elif language == "c":
+            match = _C_PATTERN.match(line) or _SQL_INCLUDE_PATTERN.search(line)
+            if match:
+                if match.re is _C_PATTERN:
+                    directives.append(("path", match.group(1), None))
+                else:
+                    directives.append(_directive(*_operand(match)))
+    return directives
+
+
+def language_of(path: Path) -> Optional[str]:
+    """
+    >>> language_of(Path("QRPGLESRC/HELLO.PGM.SQLRPGLE"))
+    'rpg'
+    >>> language_of(Path("README.md")) is None
+    True
+    """
+    return _LANGUAGES.get(path.suffix[1:].lower())
+
+
+class IncludeScanner:
+    """ Resolves the includes of the sources of a project"""
+
+    src_dir: Path
+    include_dirs: List[Path]
+
+    def __init__(self, src_dir: Path, include_dirs: Iterable[Path] = (), cache_path: Optional[Path] = None,
+                 index: Optional[ProjectIndex] = None):
+        self.src_dir = src_dir
+        self.include_dirs = [src_dir / include_dir for include_dir in include_dirs]
+        self.index = index
+        self.cache_path = cache_path if cache_path is not None else src_dir / CACHE_PATH
+        self._cache: Dict[str, list] = self._load_cache()
+        self._cache_changed = False
+        self._listings: Dict[Path, Dict[str, List[str]]] = {}
+        self._includes: Dict[Path, List[Path]] = {}
+        # Sources of the same directory and language resolve a directive to the same file
+        self._resolved: Dict[Tuple[Path, Optional[str], Directive], Optional[Path]] = {}
+
+    def _load_cache(self) -> Dict[str, list]:
+        try:
+            with self.cache_path.open(encoding="utf-8") as file:
+                cache = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        return cache if isinstance(cache, dict) else {}
+
+    def save(self):
+        """ Writes the cache if any file was scanned"""
+        if not self._cache_changed:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(self.cache_path, json.dumps(self._cache))
+        self._cache_changed = False
+
+    def directives(self, path: Path) -> List[Directive]:
+        """ Returns the include directives of a file, from the cache if it has not changed"""
+        language = language_of(path)
+        if language is None:
+            return []
+        if self.index is not None:
+            # The index listed the project with the mtime and size of every file already
+            entry = self.index.stat(path)
+            if entry is None or entry.is_dir:
+                return []
+            mtime_ns, size = entry.mtime_ns, entry.size
+        else:
+            try:
+                stat = path.stat()
+            except OSError:
+                return []
+            mtime_ns, size = stat.st_mtime_ns, stat.st_size
+        key = str(path)
+        cached = self._cache.get(key)
+        if cached and cached[0] == mtime_ns and cached[1] == size:
+            return [tuple(directive) for directive in cached[2]]
+        try:
+            content = path.read_text(encoding="utf-8", errors="replace")
+        except OSError:
+            return []
+        directives = parse_directives(content, language)
+        self._cache[key] = [mtime_ns, size, directives]
+        self._cache_changed = True
+        return directives
+
+    def _listing(self, directory: Path) -> Dict[str, List[str]]:
+        """ Maps the upper-cased names and member names (name before the first dot) of a directory to its files"""
+        if directory not in self._listings:
+            listing: Dict[str, List[str]] = {}
+            indexed = self.index.entries(directory) if self.index is not None else None
+            if indexed is not None:
+                files = [(entry.name, not entry.is_dir) for entry in indexed.values()]
+            else:
+                files = []
+                try:
+                    with os.scandir(directory) as entries:
+                        files = [(entry.name, entry.is_file()) for entry in entries]
+                except OSError:
+                    pass
+            for name, is_file in files:
+                listing.setdefault(name.upper(), []).append(name)
+                if is_file:
+                    listing.setdefault("MEMBER:" + name.split(".")[0].upper(), []).append(name)
+            self._listings[directory] = listing
+        return self._listings[directory]
+
+    def _find(self, directory: Path, relative: str) -> Optional[Path]:
+        """ Looks up a relative path case-insensitively"""
+        current = directory
+        for part in Path(relative).parts:
+            names = self._listing(current).get(part.upper())
+            if not names:
+                return None
+            current = current / names[0]
+        is_file = self.index.is_file(current) if self.index is not None else current.is_file()
+        return current if is_file else None
+
+    def _search_dirs(self, path: Path) -> List[Path]:
+        dirs = [path.parent, self.src_dir] + self.include_dirs
+        return list(dict.fromkeys(dirs))
+
+    def resolve(self, directive: Directive, path: Path) -> Optional[Path]:
+        """ Returns the file included by a directive of `path`, None if it cannot be found"""
+        key = (path.parent, language_of(path), directive)
+        if key not in self._resolved:
+            self._resolved[key] = self._resolve(directive, path, key[1])
+        return self._resolved[key]
+
+    def _resolve(self, directive: Directive, path: Path, language: Optional[str]) -> Optional[Path]:
+        kind, name, source_file = directive
+        if kind == "path":
+            if name.startswith("/"):
+                return Path(name) if os.path.isfile(name) else None
+            candidates = [name] + [f"{name}.{ext}" for ext in _INCLUDE_EXTENSIONS.get(language, [])
+                                   if not Path(name).suffix]
+            for directory in self._search_dirs(path):
+                for candidate in candidates:
+                    found = self._find(directory, candidate)
+                    if found is not None:
+                        return found
+            return None
+        source_file = source_file or _DEFAULT_SOURCE_FILES.get(language)
+        directories = []
+        for directory in self._search_dirs(path):
+            for source_dir in self._listing(directory).get((source_file or "").upper(), []):
+                directories.append(directory / source_dir)
+        # Members of the default source file may also sit next to the source or in an include directory
+        directories.extend(self._search_dirs(path))
+        for directory in directories:
+            names = self._listing(directory).get("MEMBER:" + name.upper())
+            if names:
+                return directory / names[0]
+        return None
+
+    def includes(self, path: Path) -> List[Path]:
+        """ Returns the files included by a file directly"""
+        if path not in self._includes:
+            result = []
+            for directive in self.directives(path):
+                found = self.resolve(directive, path)
+                if found is not None and found != path and found not in result:
+                    result.append(found)
+            self._includes[path] = result
+        return self._includes[path]
+
+    def all_includes(self, path: Path) -> List[Path]:
+        """ Returns the files included by a file directly or through other includes"""
+        result: List[Path] = []
+        pending = list(reversed(self.includes(path)))
+        while pending:
+            include = pending.pop()
+            if include in result or include == path:
+                continue
+            result.append(include)
+            pending.extend(reversed(self.includes(include)))
+        return result
+
+    def graph(self, sources: Dict[str, Path]) -> Dict[str, List[Path]]:
+        """ Returns the includes of every target given the path of its source"""
+        return {target: self.all_includes(source) for target, source in sources.items()}
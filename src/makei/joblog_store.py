@@ -0,0 +1,181 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+""" Append-only storage for the joblog entries written while building
+
+Every compile appends its joblog entry as one JSON line to a segment named after the build object, in a
+directory next to joblog.json (`.logs/joblog.segments/`). The line is written with a single write on a file
+opened with O_APPEND, so concurrent recipes never overwrite each other's entries. After make has finished,
+`merge_segments()` turns the segments into the joblog.json array read by the IDE tooling. A compile run on its own,
+outside of a build, merges its entry right away with `merge_if_standalone()`.
+"""
+
+import heapq
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Union
+
+from makei.const import BUILD_ENV_VAR
+
+SEGMENT_SUFFIX = ".jsonl"
+
+_READ_CHUNK_SIZE = 64 * 1024
+
+
+def segment_dir(joblog_json: Union[str, Path]) -> Path:
+    """ Returns the directory holding the segments of a joblog.json file
+
+    >>> str(segment_dir("/a/b/.logs/joblog.json"))
+    '/a/b/.logs/joblog.segments'
+    """
+    joblog_json = Path(joblog_json)
+    return joblog_json.with_name(f"{joblog_json.stem}.segments")
+
+
+def _segment_name(build_object: str) -> str:
+    """
+    >>> _segment_name("HELLO.PGM")
+    'HELLO.PGM.jsonl'
+    >>> _segment_name("")
+    'joblog.jsonl'
+    >>> _segment_name("/QSYS.LIB/A.LIB/B.FILE")
+    '_QSYS.LIB_A.LIB_B.FILE.jsonl'
+    """
+    name = re.sub(r"[^\w.$#@-]", "_", build_object) if build_object else "joblog"
+    return name + SEGMENT_SUFFIX
+
+
+def append_entry(joblog_json: Union[str, Path], entry: Dict[str, Any]):
+    """ Appends one joblog entry to the segment of its build object"""
+    directory = segment_dir(joblog_json)
+    directory.mkdir(parents=True, exist_ok=True)
+    data = (json.dumps(entry) + "\n").encode("utf-8")
+    fd = os.open(directory / _segment_name(entry.get("object", "")), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        written = os.write(fd, data)
+        # Regular files are written in one go, this only guards against short writes on odd file systems
+        while written < len(data):
+            written += os.write(fd, data[written:])
+    finally:
+        os.close(fd)
+
+
+def _iter_segment(segment: Path) -> Iterator[Dict[str, Any]]:
+    with segment.open(encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def iter_joblog(joblog_json: Union[str, Path]) -> Iterator[Dict[str, Any]]:
+    """ Yields the entries of a joblog.json array one by one, without loading the whole file
+
+    Works on any formatting of the array, including the indented files written by earlier versions.
+    """
+    path = Path(joblog_json)
+    if not path.is_file():
+        return
+    decoder = json.JSONDecoder()
+    with path.open(encoding="utf-8") as file:
+        buffer = ""
+        started = False
+        eof = False
+        while True:
+            buffer = buffer.lstrip()
+            if not started:
+                if buffer.startswith("["):
+                    buffer = buffer[1:]
+                    started = True
+                    continue
+            elif buffer.startswith(","):
+                buffer = buffer[1:]
+                continue
+            elif buffer.startswith("]"):
+                return
+            elif buffer:
+                try:
+                    entry, end = decoder.raw_decode(buffer)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    # A value that reaches the end of the buffer may be truncated, e.g. a number
+                    if end < len(buffer) or eof:
+                        yield entry
+                        buffer = buffer[end:]
+                        continue
+            if eof:
+                if buffer or not started:
+                    raise ValueError(f"{path} is not a JSON array")
+                return
+            chunk = file.read(_READ_CHUNK_SIZE)
+            if chunk:
+                buffer += chunk
+            else:
+                eof = True
+
+
+def write_joblog(joblog_json: Union[str, Path], entries: Iterator[Dict[str, Any]]) -> int:
+    """ Writes the entries as a joblog.json array with one entry per line, returns the number of entries"""
+    path = Path(joblog_json)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    count = 0
+    with tmp_path.open("w", encoding="utf-8") as file:
+        file.write("[")
+        for entry in entries:
+            file.write(",\n" if count else "\n")
+            file.write(json.dumps(entry))
+            count += 1
+        file.write("\n]\n")
+    os.replace(tmp_path, path)
+    return count
+
+
+def merge_segments(joblog_json: Union[str, Path]) -> int:
+    """ Merges the segments into joblog.json, after the entries it already holds, ordered by command time
+
+    The segments are removed afterwards. Returns the number of entries merged.
+    """
+    directory = segment_dir(joblog_json)
+    segments: List[Path] = sorted(directory.glob(f"*{SEGMENT_SUFFIX}")) if directory.is_dir() else []
+    if not segments:
+        return 0
+    merged_count = 0
+
+    def entries():
+        nonlocal merged_count
+        yield from iter_joblog(joblog_json)
+        # Each segment is in execution order already, so they only have to be interleaved
+        for entry in heapq.merge(*(_iter_segment(segment) for segment in segments),
+                                 key=lambda entry: entry.get("cmd_time") or ""):
+            merged_count += 1
+            yield entry
+
+    write_joblog(joblog_json, entries())
+    for segment in segments:
+        segment.unlink()
+    try:
+        directory.rmdir()
+    except OSError:
+        pass
+    return merged_count
+
+
+def merge_if_standalone(joblog_json: Union[str, Path, None], environ: Mapping[str, str]):
+    """ Merges the segments into joblog.json unless the environment of the compile shows a makei build, which
+    merges them once at its end"""
+    if joblog_json and BUILD_ENV_VAR not in environ:
+        merge_segments(joblog_json)
+
+
+def clear(joblog_json: Union[str, Path]):
+    """ Removes joblog.json and any segments left over from an interrupted build"""
+    path = Path(joblog_json)
+    path.unlink(missing_ok=True)
+    directory = segment_dir(path)
+    if directory.is_dir():
+        for segment in directory.glob(f"*{SEGMENT_SUFFIX}"):
+            segment.unlink()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+""" Builds a project without the recursive make, used by `makei build --engine native`
+
+make reads the rules of every directory and the .d file of every object before it starts the first recipe,
+even when a single object is asked for. The native engine orders the targets from the Rules.mk
+files makei already parsed, and runs make through src/mk/target.mk with only the rules of the targets whose
+dependencies are built. Each make run reads env.mk, skel.mk and def_rules.mk again, so the targets ready at the
+same time are built by one make run, up to MAX_BATCH_SIZE of them. The recipes stay the ones of def_rules.mk, and
+so does their output.
+"""
+
+import re
+import subprocess
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from makei.const import MK_PATH
+from makei.rules_mk import MKRule, RulesMk
+
+if TYPE_CHECKING:
+    from makei.build import BuildEnv
+
+TARGET_MAKEFILE = MK_PATH / "target.mk"
+# Targets built by one make run, more of them delay the targets depending on the first ones
+MAX_BATCH_SIZE = 32
+# make -k reports a failed recipe with `make: *** [target.mk:12: HELLO.PGM] Error 2`, and a target with a missing
+# prerequisite with `make: Target 'HELLO.PGM' not remade because of errors.`
+FAILED_TARGET_PATTERNS = [re.compile(r"\*\*\* \[(?:[^\]]*: )?([^\]\s]+)\]"),
+                          re.compile(r"Target [`']([^']+)' not remade because of errors"),
+                          re.compile(r"Failed to create (\S+?)!")]
+
+
+class NativeTarget(NamedTuple):
+    name: str
+    # The directory of the Rules.mk, relative to the project
+    directory: Path
+    rule: MKRule
+    # The targets of the project this one depends on
+    dependencies: List[str]
+
+
+def build_graph(rules_mks: Iterable[RulesMk]) -> Dict[str, NativeTarget]:
+    """ Returns the targets of the project by name, with the targets of the project each one depends on
+
+    Like make, a target defined twice keeps the last rule.
+    """
+    rules = {}
+    for rules_mk in rules_mks:
+        for rule in rules_mk.rules:
+            rules[rule.target] = (rules_mk.containing_dir, rule)
+    graph = {}
+    for name, (directory, rule) in rules.items():
+        dependencies = []
+        # Without a source file among its dependencies, the first dependency of a rule is kept as its source
+        for dependency in ([rule.source_file] if rule.source_file else []) + rule.dependencies:
+            dependency = dependency.upper()
+            if dependency in rules and dependency != name and dependency not in dependencies:
+                dependencies.append(dependency)
+        graph[name] = NativeTarget(name, directory, rule, dependencies)
+    return graph
+
+
+def _directory_targets(rules_mks: List[RulesMk], directory: Path) -> List[str]:
+    """ Returns the targets built by dir_<directory>, the ones of the subdirectories when it has none itself"""
+    for rules_mk in rules_mks:
+        if rules_mk.containing_dir == directory:
+            targets = [rule.target for rule in rules_mk.rules]
+            if targets:
+                return targets
+            return [target for subdir in rules_mk.subdirs
+                    for target in _directory_targets(rules_mks, directory / subdir)]
+    return []
+
+
+def resolve_goals(goals: List[str], rules_mks: List[RulesMk],
+                  graph: Dict[str, NativeTarget]) -> Tuple[List[str], List[str]]:
+    """ Returns the targets asked for by the make goals, and the goals that are not known
+
+    The goals are the ones passed to make: all, dir_<directory with / replaced by _> or a target name.
+    """
+    directories = {str(rules_mk.containing_dir).replace("/", "_"): rules_mk.containing_dir for rules_mk in rules_mks}
+    targets = []
+    unknown = []
+    for goal in goals:
+        if goal == "all":
+            found = list(graph)
+        elif goal.startswith("dir_") and goal[len("dir_"):] in directories:
+            found = _directory_targets(rules_mks, directories[goal[len("dir_"):]])
+        elif goal.upper() in graph:
+            found = [goal.upper()]
+        else:
+            unknown.append(goal)
+            found = []
+        targets.extend(target for target in found if target not in targets)
+    return targets, unknown
+
+
+def plan(graph: Dict[str, NativeTarget], goals: List[str]) -> List[str]:
+    """ Returns the goals and the targets they depend on, each one after its dependencies
+
+    A circular dependency is dropped, as make does.
+    """
+    order = []
+    done: Set[str] = set()
+    visiting: Set[str] = set()
+
+    def visit(name: str):
+        if name in done or name in visiting:
+            return
+        visiting.add(name)
+        for dependency in graph[name].dependencies:
+            visit(dependency)
+        visiting.discard(name)
+        done.add(name)
+        order.append(name)
+
+    for goal in goals:
+        visit(goal)
+    return order
+
+
+def batch_makefile(targets: List[NativeTarget], graph: Dict[str, NativeTarget], stale: Iterable[str] = ()) -> str:
+    """ Returns the makefile included by target.mk to build the targets
+
+    It holds the rules of the targets as written in .makei/build.mk, and an empty rule for each target of the
+    project they depend on, which was built before, so that make only compares their modification times.
+    """
+    stale = set(stale)
+    lines = ["# This file is generated by makei, DO NOT EDIT.",
+             f"MAKEI_TARGETS := {' '.join(target.name for target in targets)}"]
+    lines += [target.rule.flat_str(target.directory.absolute(), stale=target.name in stale) for target in targets]
+    built = []
+    for name in (name for target in targets for name in target.dependencies):
+        if name in built:
+            continue
+        built.append(name)
+        dependency_directory = graph[name].directory.absolute()
+        lines += [f"vpath {name} $(OBJPATH_{dependency_directory})",
+                  f"{name}_d := {dependency_directory}",
+                  f"{name}: ;"]
+    return "\n".join(lines) + "\n"
+
+
+def failed_targets(names: List[str], exit_code: int, output: bytes) -> List[str]:
+    """ Returns the targets of a make run that failed, all of them when the output does not tell which ones"""
+    if exit_code == 0:
+        return []
+    text = output.decode(errors="replace")
+    reported = {match.group(1) for pattern in FAILED_TARGET_PATTERNS for match in pattern.finditer(text)}
+    failed = [name for name in names if name in reported]
+    return failed if failed else list(names)
+
+
+class NativeEngine:
+    """ Runs the recipes of the targets in the order of the dependency graph, up to `jobs` make runs at a time
+
+    The targets whose dependencies are built are split between the free make runs. Like make -k, a failed target
+    does not stop the build, only the targets depending on it are not built.
+    """
+    build_env: "BuildEnv"
+    graph: Dict[str, NativeTarget]
+
+    def __init__(self, build_env: "BuildEnv",
+                 run_targets: Optional[Callable[[List[NativeTarget]], Tuple[int, bytes]]] = None):
+        self.build_env = build_env
+        self.graph = build_graph(build_env.rules_mks)
+        self.run_targets = run_targets if run_targets is not None else self._run_make
+
+    def run(self, handle_output: Callable[[bytes], None]):
+        """ Builds the targets of the build environment, handle_output gets the output of each make run in one piece
+        """
+        goals, unknown = resolve_goals(self.build_env.targets, self.build_env.rules_mks, self.graph)
+        for goal in unknown:
+            handle_output(f"make: *** No rule to make target '{goal}'.\n".encode())
+            handle_output(f"make: Target '{goal}' not remade because of errors.\n".encode())
+        up_to_date = set(self.build_env.up_to_date_targets)
+        order = plan(self.graph, goals)
+        position = {name: i for i, name in enumerate(order)}
+        # A dependency planned after the target is a circular one, which was dropped
+        dependencies = {name: [dependency for dependency in self.graph[name].dependencies
+                               if position.get(dependency, -1) < position[name]] for name in order}
+        pending = [name for name in order if name not in up_to_date]
+
+        finished: Set[str] = set(self.graph) - set(pending)
+        failed: Set[str] = set()
+        output_lock = threading.Lock()
+        running: Dict[Future, List[str]] = {}
+
+        def emit(output: bytes):
+            with output_lock:
+                for line in output.splitlines(keepends=True):
+                    handle_output(line)
+
+        with ThreadPoolExecutor(max_workers=self.build_env.jobs) as executor:
+            while pending or running:
+                for name in list(pending):
+                    if any(dependency in failed for dependency in dependencies[name]):
+                        pending.remove(name)
+                        failed.add(name)
+                        emit(f"make: Target '{name}' not remade because of errors.\n".encode())
+                ready = [name for name in pending if all(dependency in finished for dependency in dependencies[name])]
+                slots = self.build_env.jobs - len(running)
+                if ready and slots > 0:
+                    size = min(MAX_BATCH_SIZE, -(-len(ready) // slots))
+                    for start in range(0, min(len(ready), slots * size), size):
+                        batch = ready[start:start + size]
+                        for name in batch:
+                            pending.remove(name)
+                        running[executor.submit(self.run_targets, [self.graph[name] for name in batch])] = batch
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch = running.pop(future)
+                    exit_code, output = future.result()
+                    emit(output)
+                    for name in failed_targets(batch, exit_code, output):
+                        failed.add(name)
+                        if name not in self.build_env.failed_targets:
+                            emit(f"make: Target '{name}' not remade because of errors.\n".encode())
+                    finished.update(batch)
+
+    def _make_cmd(self, target_mk_path: Path, targets: List[str]) -> str:
+        cmd = self.build_env.generate_make_cmd(TARGET_MAKEFILE, targets, jobs=1)
+        cmd = f'{cmd} TARGETMKPATH="{target_mk_path}"'
+        return cmd
+
+    def _run_make(self, targets: List[NativeTarget]) -> Tuple[int, bytes]:
+        # A target is built by one make run only, its name is unique among the makefiles of the build
+        target_mk_path = self.build_env.build_tmp_dir / f"{targets[0].name}.mk"
+        target_mk_path.write_text(batch_makefile(targets, self.graph, self.build_env.stale_targets),
+                                  encoding="utf-8")
+        result = subprocess.run(["bash", "-c", self._make_cmd(target_mk_path, [target.name for target in targets])],
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, check=False)
+        return result.returncode, result.stdout
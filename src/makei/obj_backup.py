@@ -0,0 +1,175 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+""" Strategies keeping the existing objects while crtfrmstmf recreates them
+
+Before an existing object is compiled again, it and, for a physical file, its dependent logical files are taken
+out of the way, and put back when the compile fails:
+
+- savf: saved to a save file in QTEMP with SAVOBJ and deleted, restored with RSTOBJ. Keeps everything the save
+  keeps, but saving the access paths of a file with many logical files is slow.
+- move: moved to QTEMP with MOVOBJ, moved back on failure.
+- rename: renamed in their library with RNMOBJ, renamed back on failure.
+- none: deleted, nothing is put back.
+
+The seconds each step took are kept in `timings`, crtfrmstmf writes them into the joblog entry of the object.
+"""
+
+import secrets
+import time
+from typing import Dict, List, Tuple, Type
+
+from makei.ibm_job import IBMJob
+
+DEFAULT_BACKUP_STRATEGY = "savf"
+
+
+class ObjectBackup():
+    """ Deletes the objects without keeping them, the base of the other strategies"""
+    name = "none"
+    # Whether restore() puts the objects back
+    restores = False
+    job: IBMJob
+    tmp_lib: str
+    objects: List[Tuple[str, str, str]]  # List of (obj, lib, obj_type) tuples
+    timings: Dict[str, float]
+
+    def __init__(self, job: IBMJob, objects: List[Tuple[str, str, str]], tmp_lib: str = "QTEMP"):
+        self.job = job
+        self.objects = objects
+        self.tmp_lib = tmp_lib
+        self.timings = {}
+
+    def backup(self):
+        """ Takes the objects out of the way of the compile"""
+        self._timed("backup", self._backup)
+
+    def restore(self):
+        """ Puts the objects back after a failed compile"""
+        self._timed("restore", self._restore)
+
+    def discard(self):
+        """ Drops the backup once the objects were recreated"""
+        self._timed("discard", self._discard)
+
+    def _timed(self, step: str, func):
+        if not self.objects:
+            return
+        start = time.perf_counter()
+        try:
+            func()
+        finally:
+            self.timings[step] = round(time.perf_counter() - start, 3)
+
+    def _backup(self):
+        self._delete(self.objects)
+
+    def _restore(self):
+        print(f"Nothing to restore, the {len(self.objects)} object(s) were deleted without a backup.")
+
+    def _discard(self):
+        pass
+
+    def _delete(self, objects: List[Tuple[str, str, str]], ignore_errors: bool = False):
+        for obj, lib, obj_type in objects:
+            self.job.run_cl(f"DLTOBJ OBJ({lib}/{obj}) OBJTYPE(*{obj_type})", ignore_errors)
+
+    def _by_lib(self) -> Dict[str, List[Tuple[str, str]]]:
+        obj_list_by_lib: Dict[str, List[Tuple[str, str]]] = {}
+        for obj, lib, obj_type in self.objects:
+            obj_list_by_lib.setdefault(lib, []).append((obj, obj_type))
+        return obj_list_by_lib
+
+    def to_dict(self) -> Dict:
+        """ Returns the strategy, the number of objects and the timings for the joblog entry"""
+        return {"strategy": self.name, "objects": len(self.objects), **self.timings}
+
+
+class SavfBackup(ObjectBackup):
+    """ Saves the objects of each library to a save file named after the library"""
+    name = "savf"
+    restores = True
+
+    def _backup(self):
+        print(f"Backing up {len(self.objects)} object(s)...")
+        for lib, obj_tuples in self._by_lib().items():
+            obj_name_list, obj_type_list = list(zip(*obj_tuples))
+            # A job compiling several objects may still have the save file of an earlier one
+            self.job.run_cl(f"DLTF FILE({self.tmp_lib}/{lib})", True)
+            self.job.run_cl(f"CRTSAVF FILE({self.tmp_lib}/{lib})")
+            self.job.run_cl(
+                f"SAVOBJ OBJ({' '.join(set(obj_name_list))}) LIB({lib}) DEV(*SAVF)"
+                f" OBJTYPE({' '.join(map(lambda obj_type: f'*{obj_type}', set(obj_type_list)))})"
+                f" SAVF({self.tmp_lib}/{lib}) SPLFDTA(*ALL) ACCPTH(*YES) QDTA(*DTAQ)")
+        self._delete(self.objects)
+
+    def _restore(self):
+        print(f"Restoring {len(self.objects)} object(s)...")
+        for lib, obj_tuples in self._by_lib().items():
+            obj_name_list, obj_type_list = list(zip(*obj_tuples))
+            self.job.run_cl(
+                f"RSTOBJ OBJ({' '.join(set(obj_name_list))}) SAVLIB({lib}) DEV(*SAVF)"
+                f" OBJTYPE({' '.join(map(lambda obj_type: f'*{obj_type}', set(obj_type_list)))})"
+                f" SAVF({self.tmp_lib}/{lib})")
+        self._discard()
+        print("done.")
+
+    def _discard(self):
+        for lib in self._by_lib():
+            self.job.run_cl(f"DLTF FILE({self.tmp_lib}/{lib})", True)
+
+
+class MoveBackup(ObjectBackup):
+    """ Moves the objects to the temporary library, like src/scripts/checkObjectAlreadyExists"""
+    name = "move"
+    restores = True
+
+    def _backup(self):
+        print(f"Moving {len(self.objects)} object(s) to {self.tmp_lib}...")
+        # Left over by an earlier compile of the job
+        self._delete([(obj, self.tmp_lib, obj_type) for obj, _, obj_type in self.objects], True)
+        for obj, lib, obj_type in self.objects:
+            self.job.run_cl(f"MOVOBJ OBJ({lib}/{obj}) OBJTYPE(*{obj_type}) TOLIB({self.tmp_lib})")
+
+    def _restore(self):
+        print(f"Restoring {len(self.objects)} object(s)...")
+        # Physical files first, their logical files cannot be created before them
+        for obj, lib, obj_type in reversed(self.objects):
+            self.job.run_cl(f"DLTOBJ OBJ({lib}/{obj}) OBJTYPE(*{obj_type})", True)
+            self.job.run_cl(f"MOVOBJ OBJ({self.tmp_lib}/{obj}) OBJTYPE(*{obj_type}) TOLIB({lib})")
+        print("done.")
+
+    def _discard(self):
+        self._delete([(obj, self.tmp_lib, obj_type) for obj, _, obj_type in self.objects], True)
+
+
+class RenameBackup(ObjectBackup):
+    """ Renames the objects in their library to a generated name"""
+    name = "rename"
+    restores = True
+    backup_names: List[str]
+
+    def __init__(self, job: IBMJob, objects: List[Tuple[str, str, str]], tmp_lib: str = "QTEMP"):
+        super().__init__(job, objects, tmp_lib)
+        prefix = "#" + secrets.token_hex(3).upper()
+        self.backup_names = [f"{prefix}{index:03}" for index in range(len(objects))]
+
+    def _backup(self):
+        print(f"Renaming {len(self.objects)} object(s)...")
+        for (obj, lib, obj_type), backup_name in zip(self.objects, self.backup_names):
+            self.job.run_cl(f"RNMOBJ OBJ({lib}/{obj}) OBJTYPE(*{obj_type}) NEWOBJ({backup_name})")
+
+    def _restore(self):
+        print(f"Restoring {len(self.objects)} object(s)...")
+        for (obj, lib, obj_type), backup_name in reversed(list(zip(self.objects, self.backup_names))):
+            self.job.run_cl(f"DLTOBJ OBJ({lib}/{obj}) OBJTYPE(*{obj_type})", True)
+            self.job.run_cl(f"RNMOBJ OBJ({lib}/{backup_name}) OBJTYPE(*{obj_type}) NEWOBJ({obj})")
+        print("done.")
+
+    def _discard(self):
+        self._delete([(backup_name, lib, obj_type)
+                      for (_, lib, obj_type), backup_name in zip(self.objects, self.backup_names)], True)
+
+
+BACKUP_STRATEGIES: Dict[str, Type[ObjectBackup]] = {strategy.name: strategy for strategy in
+                                                    (SavfBackup, MoveBackup, RenameBackup, ObjectBackup)}
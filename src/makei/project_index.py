@@ -0,0 +1,186 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+""" In-memory index of the files of a project, built once per invocation
+
+Parsing the Rules.mk files, resolving dependencies and scanning includes all ask the file system the same
+questions: what is in this directory, does this file exist, which file matches this name case-insensitively.
+The index walks the project once with os.scandir and answers them from memory. Paths outside of the project
+are answered by the file system, as are the paths below a symbolic link to a directory: like Path.rglob, the walk
+does not follow them, a link back up the tree would make it loop.
+"""
+
+import fnmatch
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from makei.const import DEFAULT_INDEX_IGNORE
+
+PathLike = Union[str, Path]
+
+
+class IndexEntry(NamedTuple):
+    name: str
+    is_dir: bool
+    mtime_ns: int
+    size: int
+
+
+class ProjectIndex:
+    """ Directory listings of a project, keyed by their path relative to the project directory"""
+
+    root: Path
+    ignore_patterns: List[str]
+
+    def __init__(self, root: Path, ignore_patterns: Sequence[str] = DEFAULT_INDEX_IGNORE):
+        self.root = root.absolute()
+        self._root_prefix = str(self.root) + os.sep
+        self.ignore_patterns = list(ignore_patterns)
+        self._dirs: Dict[str, Dict[str, IndexEntry]] = {}
+        self._upper: Dict[str, Dict[str, str]] = {}
+        self._by_extension: Optional[Dict[str, List[str]]] = None
+        # Directories reached through a symbolic link, listed in their parent but not walked
+        self._links: List[str] = []
+        self._scan()
+
+    def _ignored(self, name: str, relative: str) -> bool:
+        return any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(relative, pattern)
+                   for pattern in self.ignore_patterns)
+
+    def _scan(self):
+        pending = ["."]
+        while pending:
+            relative_dir = pending.pop()
+            entries: Dict[str, IndexEntry] = {}
+            try:
+                with os.scandir(self.root / relative_dir) as iterator:
+                    for entry in iterator:
+                        relative = entry.name if relative_dir == "." else f"{relative_dir}/{entry.name}"
+                        if self._ignored(entry.name, relative):
+                            continue
+                        try:
+                            is_dir = entry.is_dir()
+                            stat = entry.stat()
+                        except OSError:
+                            continue
+                        entries[entry.name] = IndexEntry(entry.name, is_dir, stat.st_mtime_ns, stat.st_size)
+                        if is_dir and entry.is_symlink():
+                            self._links.append(relative)
+                        elif is_dir:
+                            pending.append(relative)
+            except OSError:
+                continue
+            self._dirs[relative_dir] = entries
+
+    def _key(self, path: PathLike) -> Optional[str]:
+        """ Returns the key of a path in the index, None if it is outside of the project or below a symbolic
+        link"""
+        path = os.path.normpath(str(path))
+        if os.path.isabs(path):
+            if path == str(self.root):
+                return "."
+            if not path.startswith(self._root_prefix):
+                return None
+            path = path[len(self._root_prefix):]
+        if path == ".." or path.startswith(".." + os.sep):
+            return None
+        key = path.replace(os.sep, "/")
+        if self._links and any(key.startswith(link + "/") for link in self._links):
+            return None
+        return key
+
+    def _split(self, path: PathLike) -> Tuple[Optional[str], str]:
+        key = self._key(path)
+        if key is None or key == ".":
+            return None, ""
+        directory, _, name = key.rpartition("/")
+        return directory or ".", name
+
+    def entries(self, directory: PathLike) -> Optional[Dict[str, IndexEntry]]:
+        """ Returns the entries of a directory of the project, None if it is not indexed"""
+        key = self._key(directory)
+        return self._dirs.get(key) if key is not None else None
+
+    def listdir(self, directory: PathLike) -> List[str]:
+        """ Same as os.listdir"""
+        entries = self.entries(directory)
+        if entries is None:
+            key = self._key(directory)
+            if key is not None and key not in self._links:
+                raise FileNotFoundError(directory)
+            return os.listdir(directory)
+        return list(entries)
+
+    def _entry(self, path: PathLike) -> Tuple[bool, Optional[IndexEntry]]:
+        """ Returns whether the path is in the project and its entry"""
+        key = self._key(path)
+        if key is None:
+            return False, None
+        if key == ".":
+            return True, IndexEntry(".", True, 0, 0)
+        directory, _, name = key.rpartition("/")
+        entries = self._dirs.get(directory or ".")
+        return True, entries.get(name) if entries is not None else None
+
+    def stat(self, path: PathLike) -> Optional[IndexEntry]:
+        """ Returns the entry of a file or directory, None if it does not exist"""
+        indexed, entry = self._entry(path)
+        if indexed:
+            return entry
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return IndexEntry(os.path.basename(path), os.path.isdir(path), stat.st_mtime_ns, stat.st_size)
+
+    def exists(self, path: PathLike) -> bool:
+        indexed, entry = self._entry(path)
+        return entry is not None if indexed else os.path.exists(path)
+
+    def is_file(self, path: PathLike) -> bool:
+        indexed, entry = self._entry(path)
+        return entry is not None and not entry.is_dir if indexed else os.path.isfile(path)
+
+    def is_dir(self, path: PathLike) -> bool:
+        indexed, entry = self._entry(path)
+        return entry is not None and entry.is_dir if indexed else os.path.isdir(path)
+
+    def find(self, directory: PathLike, name: str) -> Optional[str]:
+        """ Returns the name of the entry of a directory matching `name` case-insensitively"""
+        key = self._key(directory)
+        if key is None or key not in self._dirs:
+            try:
+                names = os.listdir(directory)
+            except OSError:
+                return None
+            return next((candidate for candidate in names if candidate.upper() == name.upper()), None)
+        if key not in self._upper:
+            self._upper[key] = {}
+            for candidate in sorted(self._dirs[key]):
+                self._upper[key].setdefault(candidate.upper(), candidate)
+        return self._upper[key].get(name.upper())
+
+    def walk(self) -> Iterator[Tuple[str, Dict[str, IndexEntry]]]:
+        """ Yields the relative path and the entries of every directory of the project"""
+        yield from self._dirs.items()
+
+    def files_named(self, name: str) -> List[Path]:
+        """ Returns the relative paths of the files with the given name, e.g. Rules.mk"""
+        result = []
+        for directory, entries in sorted(self._dirs.items()):
+            entry = entries.get(name)
+            if entry is not None and not entry.is_dir:
+                result.append(Path(directory) / name)
+        return result
+
+    def files_with_extension(self, extension: str) -> List[Path]:
+        """ Returns the relative paths of the files with the given (last) extension, case-insensitively"""
+        if self._by_extension is None:
+            self._by_extension = {}
+            for directory, entries in self._dirs.items():
+                for entry in entries.values():
+                    if not entry.is_dir and "." in entry.name:
+                        self._by_extension.setdefault(entry.name.rsplit(".", 1)[1].lower(), []).append(
+                            entry.name if directory == "." else f"{directory}/{entry.name}")
+        return [Path(path) for path in self._by_extension.get(extension.lower().lstrip("."), [])]
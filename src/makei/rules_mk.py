@@ -7,12 +7,21 @@ import sys
 from pathlib import Path
 from typing import Callable, Dict, List, Optional, TYPE_CHECKING
 
-from makei.const import (FILE_TARGETGROUPS_MAPPING, TARGET_GROUPS, TARGET_TARGETGROUPS_MAPPING, MEMBER_TEXT_LINES,
-                         METADATA_HEADER, TEXT_HEADER)
-from makei.utils import decompose_filename, is_source_file, check_keyword_in_file, get_line, get_style_dict
+from makei.const import FILE_TARGETGROUPS_MAPPING, TARGET_GROUPS, TARGET_TARGETGROUPS_MAPPING
+from makei.source_header import read_source_header
+from makei.utils import decompose_filename, is_source_file
 
 if TYPE_CHECKING:
     from makei.build import BuildEnv
+    from makei.project_index import ProjectIndex
+
+_RULE_PATTERN = re.compile(
+    r"^(?P<target>\S+)[ \t]*:(?!=)[ \t]*(?P<dependencies>(?:[^\n]*)*)\n" +
+    r"(?P<cmds>(?:[^\S\r\n]+?\S[^\n]*\n?|\s*\n)*)$")
+# Match strings that start with any sequence of characters (except ':'),
+# followed by either ':=' or '=', and then any characters afterwards
+_VARIABLE_PATTERN = re.compile(r'^[^:]*(:=|=).*')
+_RECIPE_LINE_PATTERN = re.compile(r'\s')
 
 
 class MKRule:
@@ -26,9 +35,10 @@ class MKRule:
 
     is_source_file: bool
     source_file: Optional[str] = None
+    index: Optional["ProjectIndex"] = None
 
     def __init__(self, target: str, dependencies: List[str], commands: List[str], variables: List[str],
-                 containing_dir: Path, include_dirs: List[Path]):
+                 containing_dir: Path, include_dirs: List[Path], index: Optional["ProjectIndex"] = None):
         # pylint: disable=too-many-arguments
 
         self.target = target.upper()
@@ -37,12 +47,13 @@ class MKRule:
         self.variables = variables
         self.containing_dir = containing_dir
         self.include_dirs = include_dirs
+        self.index = index
         self.is_source_file = False
 
         if len(self.commands) == 0:
             for dependency in self.dependencies:
                 if is_source_file(dependency) and decompose_filename(dependency)[-1] == "":
-                    if (self.containing_dir / dependency).exists():
+                    if self._exists(self.containing_dir / dependency):
                         self.is_source_file = True
                         self.source_file = '$(d)/' + dependency
                         self.dependencies.remove(dependency)
@@ -64,36 +75,73 @@ class MKRule:
                 ''.join(
                     ['\t' + cmd + '\n' for cmd in self.commands]) + variable_assignment
         try:
-            target_type = self.target.split(".")[-1].upper()
-            source_file = decompose_filename(self.source_file)[2].upper()
-            if target_type in ("SQL", "MSGF"):
-                recipe_name = f"{target_type}_RECIPE"
-            elif target_type in ("PGM") and source_file in ("RPGLE", "SQLRPGLE"):
-                recipe_name = target_type + '.' + source_file + '_TO_' + self.target.split(".")[
-                    -1].upper() + '_RECIPE'
-            else:
-                recipe_name = decompose_filename(self.source_file)[2].upper() + '_TO_' + self.target.split(".")[
-                    -1].upper() + '_RECIPE'
             return f"{self.target}_SRC={self.source_file}" + '\n' + f"{self.target}_DEP" \
                                                                     f"={' '.join(self.dependencies)}" + '\n' + \
-                f"{self.target}_RECIPE={recipe_name}" + '\n' + variable_assignment
+                f"{self.target}_RECIPE={self.recipe_name}" + '\n' + variable_assignment
         except AttributeError:
             print(f"No source file found for {self.target}")
             sys.exit(1)
 
+    @property
+    def recipe_name(self) -> str:
+        """The def_rules.mk recipe creating the target from its source file"""
+        target_type = self.target.split(".")[-1].upper()
+        source_file = decompose_filename(self.source_file)[2].upper()
+        if target_type in ("SQL", "MSGF"):
+            return f"{target_type}_RECIPE"
+        if target_type in ("PGM") and source_file in ("RPGLE", "SQLRPGLE"):
+            return target_type + '.' + source_file + '_TO_' + target_type + '_RECIPE'
+        return source_file + '_TO_' + target_type + '_RECIPE'
+
+    def flat_str(self, directory: Path, up_to_date: bool = False, stale: bool = False) -> str:
+        """Returns the rule as written in .makei/build.mk, with $(d) replaced by the absolute directory
+
+        This is what footer.mk used to generate with $(eval) for each target. A target whose content fingerprint
+        is unchanged gets an empty rule, a stale one always runs its recipe.
+        """
+        directory = str(directory)
+        variable_assignment = ''.join(f"{self.target}: {variable}\n" for variable in self.variables)
+        rule_str = f"vpath {self.target} $(OBJPATH_{directory})\n{self.target}_d := {directory}\n"
+        if len(self.commands) > 0:
+            dependencies = ' '.join(dependency.replace("$(d)", directory) for dependency in self._parse_dependencies())
+            return rule_str + f"{self.target} : {dependencies}\n" + \
+                ''.join('\t' + cmd + '\n' for cmd in self.commands) + variable_assignment
+        if up_to_date:
+            return rule_str + f"{self.target}: ;\n" + variable_assignment
+        try:
+            recipe_name = self.recipe_name
+        except AttributeError:
+            print(f"No source file found for {self.target}")
+            sys.exit(1)
+        source_file = self.source_file.replace("$(d)", directory)
+        prerequisites = ' '.join([source_file] + self.dependencies)
+        force = " MAKEI_FORCE" if stale else ""
+        stem = self.target.rsplit(".", 1)[0]
+        return rule_str + f"{self.target}: {prerequisites}{force} ; $(eval @={self.target})$(eval <={source_file})" \
+                          f"$(eval tgt={stem})$(eval ^={prerequisites})${{{recipe_name}}}\n" + variable_assignment
+
     def __repr__(self):
         return str(self)
 
+    def __getstate__(self):
+        # The index belongs to the invocation, it is not part of a cached rule
+        state = self.__dict__.copy()
+        state.pop("index", None)
+        return state
+
+    def _exists(self, path: Path) -> bool:
+        return self.index.exists(path) if self.index is not None else path.exists()
+
     def _parse_dependencies(self) -> List[str]:
         """Parses the dependencies of a rule"""
         result = []
         for dependency in self.dependencies:
             if is_source_file(dependency) and decompose_filename(dependency)[-1] == "":
-                if (self.containing_dir / dependency).exists():
+                if self._exists(self.containing_dir / dependency):
                     result.append('$(d)/' + dependency)
                 else:
                     for include_dir in self.include_dirs:
-                        if (include_dir / dependency).exists():
+                        if self._exists(include_dir / dependency):
                             result.append(str(include_dir / dependency))
                             break
                     result.append(dependency)
@@ -110,7 +158,8 @@ class MKRule:
         return False
 
     @staticmethod
-    def from_str(rule_str: str, containing_dir: Path, include_dirs: List[Path]) -> "MKRule":
+    def from_str(rule_str: str, containing_dir: Path, include_dirs: List[Path],
+                 index: Optional["ProjectIndex"] = None) -> "MKRule":
         r"""Creates a MKRule object from a string
 
         >>> rule_str = "target : dependency1 dependency2\n\tcommand1 param1 param2\n\tcommand2 param3 param4\n"
@@ -124,10 +173,7 @@ class MKRule:
         >>> str(rule)
         'target : dependency1 dependency2\n\tcommand1 param1 param2\n\tcommand2 param3 param4\n'
         """
-        rule_regex = re.compile(
-            r"^(?P<target>\S+)[ \t]*:(?!=)[ \t]*(?P<dependencies>(?:[^\n]*)*)\n" +
-            r"(?P<cmds>(?:[^\S\r\n]+?\S[^\n]*\n?|\s*\n)*)$")
-        target_match = rule_regex.match(rule_str)
+        target_match = _RULE_PATTERN.match(rule_str)
         if target_match:
             target = target_match.group("target")
             dependencies = target_match.group("dependencies").split()
@@ -136,7 +182,7 @@ class MKRule:
         else:
             raise ValueError(f"Invalid rule string '{rule_str}'")
 
-        return MKRule(target, dependencies, commands, [], containing_dir, include_dirs)
+        return MKRule(target, dependencies, commands, [], containing_dir, include_dirs, index)
 
 
 class RulesMk:
@@ -149,7 +195,8 @@ class RulesMk:
     build_context: Optional['BuildEnv'] = None
     src_obj_mapping: Dict[str, str]
 
-    def __init__(self, subdirs: List[str], rules: List[MKRule], containing_dir: Path) -> None:
+    def __init__(self, subdirs: List[str], rules: List[MKRule], containing_dir: Path,
+                 index: Optional["ProjectIndex"] = None) -> None:
         self.targets = {tgt_group + 's': [] for tgt_group in TARGET_GROUPS}
         self.src_obj_mapping = {}
         for rule in rules:
@@ -180,7 +227,7 @@ class RulesMk:
                 self.targets[tgt_group + 's'].append(rule.target)
 
         if len(subdirs) > 0:
-            nestedDirs = os.listdir(containing_dir)
+            nestedDirs = index.listdir(containing_dir) if index is not None else os.listdir(containing_dir)
 
             # Mapping from lowercase of directory name to the actual directory name
             # Assumes that we can't have two mixed case directory names
@@ -197,16 +244,18 @@ class RulesMk:
 
     # Read makefile and create a RulesMk object
     @classmethod
-    def from_file(cls, rules_mk_path: Path, src_dir: str, include_dirs=None) -> "RulesMk":
+    def from_file(cls, rules_mk_path: Path, src_dir: str, include_dirs=None,
+                  index: Optional["ProjectIndex"] = None) -> "RulesMk":
         if include_dirs is None:
             include_dirs = []
         with rules_mk_path.open("r") as f:
             rules_mk_str = f.read()
-        rules_mk = RulesMk.from_str(rules_mk_str, rules_mk_path.parent, src_dir, include_dirs)
+        rules_mk = RulesMk.from_str(rules_mk_str, rules_mk_path.parent, src_dir, include_dirs, index)
         return rules_mk
 
     @classmethod
-    def from_str(cls, rules_mk_str: str, containing_dir: Path, src_dir: Path, include_dirs=None) -> "RulesMk":
+    def from_str(cls, rules_mk_str: str, containing_dir: Path, src_dir: Path, include_dirs=None,
+                 index: Optional["ProjectIndex"] = None) -> "RulesMk":
         """Creates a RulesMk object from a string
 
         >>> rules_mk_str = "subdir1 subdir2\n\n\ttarget1 target2\n\n\ttarget3 target4\n\n\ttarget5 target6\n"
@@ -228,7 +277,8 @@ class RulesMk:
         variables = {}
         wildcard_variables = {}
         subdir = []
-        targets = []
+        # Ordered set of the targets declared so far
+        targets: Dict[str, None] = {}
         wildcard_targets = []
 
         recipe_env = False
@@ -254,12 +304,12 @@ class RulesMk:
 
         for line in lines:
             if recipe_env:
-                if re.match(r'\s', line):
+                if _RECIPE_LINE_PATTERN.match(line):
                     recipe_str += line + '\n'
                     continue
 
-                targets.append(recipe_str.split(":")[0].upper())
-                rules.append(MKRule.from_str(recipe_str, containing_dir, include_dirs))
+                targets[recipe_str.split(":")[0].upper()] = None
+                rules.append(MKRule.from_str(recipe_str, containing_dir, include_dirs, index))
                 recipe_env = False
                 recipe_str = ""
 
@@ -268,14 +318,11 @@ class RulesMk:
                 continue
 
             # pylint: disable=no-else-continue
-            # Match strings that start with any sequence of characters (except ':'),
-            # followed by either ':=' or '=', and then any characters afterwards
-            pattern = re.compile(r'^[^:]*(:=|=).*')
             if line.strip().startswith('SUBDIRS'):
                 # Subdir definition
                 subdir = line.strip().split('=')[1].split()
                 continue
-            elif pattern.match(line):
+            elif _VARIABLE_PATTERN.match(line):
                 # rules_mk variable definition (ie. var := value)
                 line_split_by_equal = line.strip().split('=')
                 if len(line_split_by_equal) == 2:
@@ -326,8 +373,8 @@ class RulesMk:
                 continue
 
         if recipe_env:
-            targets.append(recipe_str.split(":")[0].upper())
-            rules.append(MKRule.from_str(recipe_str, containing_dir, include_dirs))
+            targets[recipe_str.split(":")[0].upper()] = None
+            rules.append(MKRule.from_str(recipe_str, containing_dir, include_dirs, index))
 
         # Create all the rules for the wildcard rule declaration
         for target_ext, source_ext, dependencies in wildcard_targets:
@@ -336,7 +383,7 @@ class RulesMk:
             for var_name, var_value in rules_mk_variables.items():
                 expanded_deps = expanded_deps.replace(f"$({var_name})", var_value)
             # target specific variable assignmnet(expansion)
-            for filename in os.listdir(dir_path):
+            for filename in (index.listdir(dir_path) if index is not None else os.listdir(dir_path)):
                 recipe_str = ''
                 filename_split = filename.split('.', 1)
 
@@ -346,14 +393,22 @@ class RulesMk:
                         recipe_str = (
                             target_object + ": " + filename_split[0] + "." + source_ext + " " + expanded_deps
                         ).strip() + '\n'
-                        rules.append(MKRule.from_str(recipe_str, containing_dir, include_dirs))
-                        targets.append(target_object)
-
-        # Updates variables with wildcard values
+                        rules.append(MKRule.from_str(recipe_str, containing_dir, include_dirs, index))
+                        targets[target_object] = None
+
+        # Updates variables with wildcard values, a target takes the values of the first wildcard matching it
+        targets_by_extension: Dict[str, List[str]] = {}
+        targets_by_type: Dict[str, List[str]] = {}
+        for target in targets:
+            targets_by_extension.setdefault(target.rsplit(".", 1)[-1], []).append(target)
+            if "." in target:
+                targets_by_type.setdefault(target.split(".")[1], []).append(target)
         for wildcard, var in wildcard_variables.items():
             stripped_wildcard = wildcard.strip("%.").upper()
-            matched_targets = [target for target in targets if target.endswith(f".{stripped_wildcard}")]
-            targets = list(filter(lambda target: target.split(".")[1] != stripped_wildcard, targets))
+            matched_targets = [target for target in targets_by_extension.get(stripped_wildcard.rsplit(".", 1)[-1], [])
+                               if target in targets and target.endswith(f".{stripped_wildcard}")]
+            for target in targets_by_type.get(stripped_wildcard, []):
+                targets.pop(target, None)
 
             for target in matched_targets:
                 if target not in variables:
@@ -361,45 +416,29 @@ class RulesMk:
                 variables[target] = var + variables[target]
 
         # Defines variables declared in Rules.mk
+        rules_by_target: Dict[str, List[MKRule]] = {}
+        for rule in rules:
+            rules_by_target.setdefault(rule.target.upper(), []).append(rule)
         for target, variableList in variables.items():
-            matched_rules = filter(lambda rule: rule.target.upper() == target, rules)
-            for rule in matched_rules:
+            for rule in rules_by_target.get(target, []):
                 rule.variables = variableList
 
         for rule in rules:
             if rule.is_source_file:
                 source_location = dir_path.joinpath(rule.source_file.rsplit("/", 1)[-1])
-                is_text_defined = RulesMk._find_source_member_text(source_location)
+                is_text_defined = RulesMk._find_source_member_text(source_location, index)
 
                 # Overrides member text defined in Rules.mk if comment at top of source
                 if is_text_defined is not None:
                     rule.variables.append('TEXT = ' + is_text_defined)
 
-        return RulesMk(subdir, rules, containing_dir)
+        return RulesMk(subdir, rules, containing_dir, index)
 
+    # Will Return the member text if it exists, otherwise None
     @classmethod
-    def _remove_comment_identifier(cls, text: str, file_path: Path) -> str:
-        style_dict = get_style_dict(file_path)
-        if style_dict is not None:
-            start_comment = style_dict["start_comment"]
-            end_comment = style_dict["end_comment"]
-            text = text.strip(" " + start_comment).strip(end_comment).strip(TEXT_HEADER).strip()
-        return text
-
-    # Will Return the member text if it exists, otherwise
-    @classmethod
-    def _find_source_member_text(cls, file_path: Path) -> str:
-        metadata_comment_exists = check_keyword_in_file(file_path, METADATA_HEADER, MEMBER_TEXT_LINES)
-        if metadata_comment_exists:
-            text_comment_exists = check_keyword_in_file(file_path, TEXT_HEADER, MEMBER_TEXT_LINES,
-                                                        metadata_comment_exists)
-            if text_comment_exists and text_comment_exists > metadata_comment_exists:
-                text_line = get_line(file_path, text_comment_exists)
-                if text_line is not None:
-                    text = RulesMk._remove_comment_identifier(text_line, file_path)
-                    return text
-
-        return None
+    def _find_source_member_text(cls, file_path: Path, index: Optional["ProjectIndex"] = None) -> Optional[str]:
+        header = read_source_header(file_path, index)
+        return header.member_text if header is not None else None
 
     def __str__(self, rules_middleware: Callable[[MKRule], MKRule] = lambda rule: rule) -> str:
         """Returns a string representation of the RulesMk object
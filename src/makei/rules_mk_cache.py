@@ -0,0 +1,117 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+""" Cache of the parsed Rules.mk files, stored in .makei/cache/rules_mk
+
+Parsing a Rules.mk depends on its content, on the files of its directory (wildcard rules, member text
+read from the sources, case of the subdirectories) and on the include path. An entry is reused as long as
+none of these changed, together with the .ibmi.json files that apply to the directory.
+"""
+
+import hashlib
+import os
+import pickle
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from makei import __version__
+from makei.project_index import ProjectIndex
+from makei.rules_mk import RulesMk
+from makei.utils import atomic_write
+
+CACHE_DIR = Path(".makei") / "cache" / "rules_mk"
+
+# Bump when the parsed objects change shape
+CACHE_FORMAT = 1
+
+
+def _listing_signature(directory: Path, index: Optional[ProjectIndex] = None) -> List[str]:
+    indexed = index.entries(directory) if index is not None else None
+    if indexed is not None:
+        return sorted(f"{entry.name}:{entry.mtime_ns}:{entry.size}:{entry.is_dir}" for entry in indexed.values())
+    entries = []
+    try:
+        with os.scandir(directory) as iterator:
+            for entry in iterator:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append(f"{entry.name}:{stat.st_mtime_ns}:{stat.st_size}:{entry.is_dir()}")
+    except OSError:
+        return []
+    return sorted(entries)
+
+
+class RulesMkCache:
+    """ Loads the RulesMk of a directory from the cache or parses it"""
+
+    src_dir: Path
+    cache_dir: Path
+    hits: int
+    misses: int
+
+    def __init__(self, src_dir: Path, include_dirs: Iterable[Path] = (), cache_dir: Optional[Path] = None,
+                 index: Optional[ProjectIndex] = None):
+        self.src_dir = src_dir
+        self.include_dirs = list(include_dirs)
+        self.index = index
+        self.cache_dir = cache_dir if cache_dir is not None else src_dir / CACHE_DIR
+        self.hits = 0
+        self.misses = 0
+        include_signature = [str(include_dir) for include_dir in self.include_dirs]
+        for include_dir in self.include_dirs:
+            include_signature.extend(_listing_signature(src_dir / include_dir, index))
+        self._common_key = "\n".join([__version__, str(CACHE_FORMAT), str(src_dir.resolve())] + include_signature)
+
+    def key(self, rules_mk_path: Path, rules_mk_content: bytes) -> str:
+        """ Returns the cache key of a Rules.mk"""
+        sha = hashlib.sha256(self._common_key.encode("utf-8"))
+        sha.update(rules_mk_content)
+        directory = rules_mk_path.parent
+        sha.update("\n".join(_listing_signature(self.src_dir / directory, self.index)).encode("utf-8"))
+        # The .ibmi.json files of the directory and of its parents
+        for parent in [directory] + list(directory.parents):
+            ibmi_json = self.src_dir / parent / ".ibmi.json"
+            try:
+                sha.update(ibmi_json.read_bytes())
+            except OSError:
+                sha.update(b"-")
+        return sha.hexdigest()
+
+    def _entry_path(self, rules_mk_path: Path) -> Path:
+        name = hashlib.sha1(str(rules_mk_path).encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{name}.pickle"
+
+    def load(self, rules_mk_path: Path) -> RulesMk:
+        """ Returns the parsed Rules.mk, rules_mk_path is relative to the project directory"""
+        content = (self.src_dir / rules_mk_path).read_bytes()
+        key = self.key(rules_mk_path, content)
+        entry_path = self._entry_path(rules_mk_path)
+        try:
+            with entry_path.open("rb") as file:
+                entry = pickle.load(file)
+            if entry["key"] == key:
+                self.hits += 1
+                rules_mk = entry["rules_mk"]
+                for rule in rules_mk.rules:
+                    rule.index = self.index
+                return rules_mk
+        # pylint: disable=broad-except
+        except Exception:
+            # Missing, truncated or written by another version
+            pass
+
+        self.misses += 1
+        rules_mk = RulesMk.from_str(content.decode("utf-8"), rules_mk_path.parent, self.src_dir,
+                                    list(self.include_dirs), self.index)
+        self._store(entry_path, {"key": key, "rules_mk": rules_mk})
+        return rules_mk
+
+    def _store(self, entry_path: Path, entry):
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            atomic_write(entry_path, pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL))
+        except OSError:
+            # The cache is an optimisation only
+            pass
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+""" Reads the header of a source file: the %METADATA/%TEXT member text and the comment style
+
+Only the first lines of the file are read, once, and the result is kept for as long as the file keeps its
+modification time and size.
+"""
+
+from itertools import islice
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Tuple, TYPE_CHECKING
+
+from makei.const import MEMBER_TEXT_LINES, METADATA_HEADER, TEXT_HEADER
+from makei.utils import get_comment_style, get_file_extension
+
+if TYPE_CHECKING:
+    from makei.project_index import ProjectIndex
+
+# %TEXT is looked up in the MEMBER_TEXT_LINES lines starting at %METADATA, itself in the first MEMBER_TEXT_LINES
+HEADER_LINES = 2 * MEMBER_TEXT_LINES - 1
+
+
+class SourceHeader(NamedTuple):
+    member_text: Optional[str]
+    free_form: bool
+    # Shared between the callers, do not modify
+    style_dict: Optional[dict]
+
+
+_headers: Dict[Tuple[str, int, int], SourceHeader] = {}
+
+
+def _find_line(lines, keyword: str, start: int = 0) -> int:
+    """ Returns the index of the first of MEMBER_TEXT_LINES lines from `start` containing the keyword, -1 if none"""
+    for line_index in range(start, min(start + MEMBER_TEXT_LINES, len(lines))):
+        if keyword.lower() in lines[line_index].lower():
+            return line_index
+    return -1
+
+
+def parse_source_header(lines, source_extension: str) -> SourceHeader:
+    """ Returns the header of a source given its first lines
+
+    >>> parse_source_header(["**FREE", "// %METADATA *", "// %TEXT Hello world *", "// %EMETADATA *"], "RPGLE")
+    SourceHeader(member_text='Hello world', free_form=True, style_dict={'style_type': 'COBOL', \
+'start_comment': '//', 'end_comment': '*', 'start_column': 7, 'end_column': 72, 'write_on_line': 1})
+    >>> parse_source_header(["/* %TEXT Not in metadata */"], "CLLE").member_text is None
+    True
+    """
+    free_form = bool(lines) and "free" in lines[0].lower()
+    style_dict = get_comment_style(source_extension, free_form)
+
+    member_text = None
+    metadata_line = _find_line(lines, METADATA_HEADER)
+    if metadata_line >= 0:
+        text_line = _find_line(lines, TEXT_HEADER, metadata_line)
+        if text_line > metadata_line:
+            member_text = lines[text_line]
+            if style_dict is not None:
+                member_text = member_text.strip(" " + style_dict["start_comment"]).strip(style_dict["end_comment"]) \
+                    .strip(TEXT_HEADER).strip()
+    return SourceHeader(member_text, free_form, style_dict)
+
+
+def read_source_header(file_path: Path, index: Optional["ProjectIndex"] = None) -> Optional[SourceHeader]:
+    """ Returns the header of a source file, None if it cannot be read"""
+    try:
+        if index is not None:
+            entry = index.stat(file_path)
+            if entry is None:
+                return None
+            key = (str(file_path), entry.mtime_ns, entry.size)
+        else:
+            stat = file_path.stat()
+            key = (str(file_path), stat.st_mtime_ns, stat.st_size)
+        if key not in _headers:
+            with open(file_path, "r", errors="replace") as file:
+                lines = [line.rstrip("\n") for line in islice(file, HEADER_LINES)]
+            _headers[key] = parse_source_header(lines, get_file_extension(file_path))
+        return _headers[key]
+    except OSError:
+        return None
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+""" CCSIDs of the source stream files, read for all the sources of a build at once
+
+crtfrmstmf needs the CCSID of its source when no target CCSID is set, and used to start `attr` for it in every
+recipe. Before make runs, makei reads the CCSIDs of the sources to build with QSYS2.IFS_OBJECT_STATISTICS, one
+query per directory over a single connection, and keeps them in .makei/cache/ccsids.json for as long as the file
+keeps its modification time and size. crtfrmstmf looks the source up there first.
+"""
+
+import json
+from collections import defaultdict
+from contextlib import closing
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+import ibm_db_dbi
+
+from makei.utils import atomic_write
+
+CACHE_PATH = Path(".makei") / "cache" / "ccsids.json"
+
+# The recipes of def_rules.mk creating the object with crtfrmstmf
+CRTFRMSTMF_RECIPES = {"CBL_TO_PGM_RECIPE", "CLLE_TO_MODULE_RECIPE", "CLP_TO_PGM_RECIPE", "DSPF_TO_FILE_RECIPE",
+                      "LF_TO_FILE_RECIPE", "MENUSRC_TO_MENU_RECIPE", "PF_TO_FILE_RECIPE", "PGM.CLLE_TO_PGM_RECIPE",
+                      "PNLGRPSRC_TO_PNLGRP_RECIPE", "PRTF_TO_FILE_RECIPE", "RPG_TO_PGM_RECIPE", "SQL_TO_QMQRY_RECIPE",
+                      "WSCSTSRC_TO_WSCST_RECIPE"}
+
+CCSID_QUERY = "SELECT PATH_NAME, CCSID FROM TABLE(QSYS2.IFS_OBJECT_STATISTICS(START_PATH_NAME => ?, " \
+              "SUBTREE_DIRECTORIES => 'NO', OBJECT_TYPE_LIST => '*STMF')) X"
+
+
+def query_ccsids(directories: List[Path]) -> Optional[Dict[str, str]]:
+    """ Returns the CCSID of the stream files in the directories by path, None when the query cannot be run"""
+    try:
+        connection = ibm_db_dbi.connect()
+    # pylint: disable=broad-except
+    except Exception:
+        return None
+    ccsids = {}
+    with closing(connection), closing(connection.cursor()) as cursor:
+        for directory in directories:
+            try:
+                cursor.execute(CCSID_QUERY, (str(directory),))
+                ccsids.update((path, str(ccsid)) for path, ccsid in cursor.fetchall())
+            # pylint: disable=broad-except
+            except Exception:
+                return None
+    return ccsids
+
+
+def _signature(path: Path) -> Optional[List[int]]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class CcsidCache:
+    """ The CCSIDs of the sources read before, keyed by path and checked against the modification time and size"""
+    cache_path: Path
+
+    def __init__(self, src_dir: Path, cache_path: Optional[Path] = None):
+        self.cache_path = cache_path if cache_path is not None else src_dir / CACHE_PATH
+        self._changed = False
+        try:
+            with self.cache_path.open(encoding="utf-8") as file:
+                cache = json.load(file)
+        except (OSError, ValueError):
+            cache = {}
+        self._cache: Dict[str, list] = cache if isinstance(cache, dict) else {}
+
+    def get(self, path: Path) -> Optional[str]:
+        """ Returns the CCSID of the file if it is cached and unchanged"""
+        entry = self._cache.get(str(path))
+        if entry is None or entry[:2] != _signature(path):
+            return None
+        return entry[2]
+
+    def prefetch(self, paths: Iterable[Path],
+                 query: Callable[[List[Path]], Optional[Dict[str, str]]] = query_ccsids) -> int:
+        """ Reads the CCSIDs of the files not cached yet in one pass, returns the number of files read"""
+        missing = defaultdict(list)
+        for path in paths:
+            path = path.absolute()
+            if self.get(path) is None:
+                missing[path.parent].append(path)
+        if not missing:
+            return 0
+        ccsids = query(sorted(missing))
+        if ccsids is None:
+            return 0
+        read = 0
+        for directory_paths in missing.values():
+            for path in directory_paths:
+                signature = _signature(path)
+                if str(path) in ccsids and signature is not None:
+                    self._cache[str(path)] = signature + [ccsids[str(path)]]
+                    self._changed = True
+                    read += 1
+        return read
+
+    def save(self):
+        """ Writes the cache if any CCSID was read, the cache is an optimisation only"""
+        if not self._changed:
+            return
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write(self.cache_path, json.dumps(self._cache))
+            self._changed = False
+        except OSError:
+            pass
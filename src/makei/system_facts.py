@@ -0,0 +1,125 @@
+#!/usr/bin/env python3.9
+# -*- coding: utf-8 -*-
+
+""" Facts about the partition that rarely change, cached in ~/.cache/makei/system_facts.json
+
+Reading the release starts `cl` and checking a CCSID starts `attr`. makei asks once per build, writes the
+answers into the build variables for make, and keeps them for SYSTEM_FACTS_TTL seconds so that the next
+builds and the recipes running crtfrmstmf do not ask again. Only positive answers are kept: a library created
+or a CCSID installed afterwards is seen by the next build.
+"""
+
+import json
+import shutil
+import subprocess
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from makei.const import MAKEI_CACHE_PATH
+from makei.utils import atomic_write, objlib_to_path, validate_ccsid
+
+SYSTEM_FACTS_PATH = MAKEI_CACHE_PATH / "system_facts.json"
+SYSTEM_FACTS_TTL = 24 * 60 * 60
+# Bump when the meaning of a fact changes
+SYSTEM_FACTS_FORMAT = 1
+
+RELEASE_CMD = "cl 'dspdtaara qgpl/qss1MRI' | /QOpenSys/pkgs/bin/grep 'V[[:digit:]]R[[:digit:]]M[[:digit:]]' -wo" \
+              " | /QOpenSys/pkgs/bin/sed 's/[^0-9]*//g'"
+
+
+def _probe_release() -> Optional[str]:
+    """ Returns the release of the partition as read by src/mk/env.mk, e.g. 750, None when it cannot be read"""
+    if shutil.which("cl") is None:
+        return None
+    try:
+        result = subprocess.run(["bash", "-c", RELEASE_CMD], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                check=False)
+    except OSError:
+        return None
+    release = result.stdout.decode().strip()
+    return release if release.isdigit() else None
+
+
+class SystemFacts:
+    """ The cached facts, each one is probed again once older than the TTL"""
+    path: Path
+    ttl: float
+    facts: Dict[str, List[Any]]
+
+    def __init__(self, path: Path = SYSTEM_FACTS_PATH, ttl: float = SYSTEM_FACTS_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.facts = {}
+        self._changed = False
+        try:
+            with self.path.open(encoding="utf-8") as file:
+                content = json.load(file)
+            if content.get("format") == SYSTEM_FACTS_FORMAT:
+                self.facts = content["facts"]
+        # pylint: disable=broad-except
+        except Exception:
+            # Missing, truncated or written by another version
+            pass
+
+    def _get(self, key: str, probe: Callable[[], Any]) -> Any:
+        entry = self.facts.get(key)
+        now = time.time()
+        if entry is not None and now - entry[1] < self.ttl:
+            return entry[0]
+        value = probe()
+        if value:
+            self.facts[key] = [value, now]
+            self._changed = True
+        return value
+
+    def ibmi_release(self) -> Optional[str]:
+        """ Returns the release of the partition, e.g. 750, None when it cannot be read"""
+        return self._get("release", _probe_release)
+
+    def is_valid_ccsid(self, ccsid: str) -> bool:
+        """ Returns whether the CCSID can be used, see utils.validate_ccsid"""
+        return self._get(f"ccsid:{ccsid}", lambda: validate_ccsid(ccsid))
+
+    def missing_libraries(self, libraries: Iterable[str]) -> List[str]:
+        """ Returns the libraries that do not exist, special values such as *CURLIB are left out
+
+        Nothing is reported when not running on IBM i.
+        """
+        if not Path("/QSYS.LIB").is_dir():
+            return []
+        missing = []
+        for library in libraries:
+            library = library.upper()
+            if not library or library.startswith(("*", "&", "$")) or library in missing:
+                continue
+            if not self._get(f"library:{library}", lambda name=library: Path(objlib_to_path(name)).is_dir()):
+                missing.append(library)
+        return missing
+
+    def save(self):
+        """ Writes the facts probed by this process, the cache is an optimisation only"""
+        if not self._changed:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write(self.path, json.dumps({"format": SYSTEM_FACTS_FORMAT, "facts": self.facts}))
+            self._changed = False
+        except OSError:
+            pass
+
+
+def is_valid_ccsid(ccsid: str) -> bool:
+    """ Returns whether the CCSID can be used, from the cache when it was validated before"""
+    facts = SystemFacts()
+    valid = facts.is_valid_ccsid(ccsid)
+    facts.save()
+    return valid
+
+
+def ibmi_release() -> Optional[str]:
+    """ Returns the release of the partition, from the cache when it was read before"""
+    facts = SystemFacts()
+    release = facts.ibmi_release()
+    facts.save()
+    return release
@@ -6,9 +6,10 @@ import json
 import os
 import subprocess
 import sys
-import copy
+import threading
 from datetime import datetime
 from enum import Enum
+from functools import lru_cache
 from pathlib import Path
 from shutil import move, copymode
 from tempfile import mkstemp, gettempdir
@@ -16,6 +17,11 @@ from typing import Callable, Optional, Tuple, Union
 
 from makei.const import FILE_MAX_EXT_LENGTH, FILE_TARGET_MAPPING, COMMENT_STYLES
 
+# Number of dotted parts of the source extensions, longest first, e.g. [2, 1] for PGM.RPGLE and RPGLE
+_EXTENSION_LENGTHS = sorted({len(ext.split(".")) for ext in FILE_TARGET_MAPPING}, reverse=True)
+# Bound of the cache of decomposed file names
+DECOMPOSE_CACHE_SIZE = 65536
+
 
 class Colors(str, Enum):
     """ An enum of colors to be used for output"""
@@ -233,23 +239,45 @@ def decompose_filename(filename: str) -> Tuple[str, Optional[str], str, str]:
     """
     if not filename:
         raise ValueError()
+    decomposed = _decompose_filename(filename)
+    if decomposed is None:
+        ext = os.path.basename(filename).rsplit(".", 1)[-1].upper()
+        raise ValueError(f"Cannot decompose filename: {filename} as {ext} is not a recognized file extension")
+    return decomposed
 
-    parts = os.path.basename(filename).split(".")
 
-    ext_len = FILE_MAX_EXT_LENGTH
-    while ext_len > 0:
-        base, ext = '.'.join(parts[:-ext_len]), '.'.join(parts[-ext_len:]).upper()
+@lru_cache(maxsize=DECOMPOSE_CACHE_SIZE)
+def _decompose_filename(filename: str) -> Optional[Tuple[str, Optional[str], str, str]]:
+    """Returns the decomposed file name, None if it has no known extension
+
+    The same names are decomposed over and over while parsing the Rules.mk files, hence the cache.
+    """
+    basename = os.path.basename(filename)
+    # Positions of the last FILE_MAX_EXT_LENGTH dots, from the right
+    dots = []
+    end = len(basename)
+    while len(dots) < FILE_MAX_EXT_LENGTH:
+        end = basename.rfind(".", 0, end)
+        if end < 0:
+            break
+        dots.append(end)
+
+    # Longest extension first, e.g. PGM.RPGLE before RPGLE
+    for ext_len in _EXTENSION_LENGTHS:
+        if ext_len <= len(dots):
+            base, ext = basename[:dots[ext_len - 1]], basename[dots[ext_len - 1] + 1:].upper()
+        else:
+            # Fewer parts than the extension has, the whole name is the extension
+            base, ext = "", basename.upper()
         if ext in FILE_TARGET_MAPPING:
             # Split the object name and text attributes
-            if len(base.split("-")) == 2:
+            if base.count("-") == 1:
                 name, text_attribute = base.split("-")
             else:
                 name = base
                 text_attribute = None
             return name, text_attribute, ext, os.path.dirname(filename)
-        ext_len -= 1
-    if ext_len == 0:
-        raise ValueError(f"Cannot decompose filename: {filename} as {ext} is not a recognized file extension")
+    return None
 
 
 def is_source_file(filename: str) -> bool:
@@ -267,11 +295,7 @@ def is_source_file(filename: str) -> bool:
     >>> is_source_file("Test.PGM")
     False
     """
-    try:
-        _, _, ext, _ = decompose_filename(filename)
-        return ext in FILE_TARGET_MAPPING
-    except ValueError:
-        return False
+    return bool(filename) and _decompose_filename(filename) is not None
 
 
 def format_datetime(d: datetime) -> str:
@@ -294,6 +318,33 @@ def replace_file_content(file_path: Path, replace: Callable[[str], str]):
     move(abs_path, file_path)
 
 
+def atomic_write(path: Path, data: Union[str, bytes]):
+    """ Writes a file through a temporary file next to it, so that readers, e.g. concurrent recipes, never see it
+    half written. A str is written as UTF-8.
+    """
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        if isinstance(data, bytes):
+            tmp_path.write_bytes(data)
+        else:
+            tmp_path.write_text(data, encoding="utf-8")
+        os.replace(tmp_path, path)
+    except OSError:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def write_if_changed(path: Path, content: str) -> bool:
+    """ Writes a file unless it already has the content, returns whether it was written"""
+    try:
+        if path.read_text(encoding="utf-8") == content:
+            return False
+    except (OSError, UnicodeDecodeError):
+        pass
+    atomic_write(path, content)
+    return True
+
+
 def make_include_dirs_absolute(job_log_path: str, parameters: str):
     """
     Return modified parameters with absolute dirs if it includes INCDIR
@@ -411,16 +462,22 @@ def get_file_extension(file_path: Path) -> str:
 
 def get_style_dict(file_path: Path) -> dict:
     source_extension = get_file_extension(file_path)
+    style_dict = get_comment_style(source_extension)
+    # Handling free form RPG
+    if style_dict is not None and style_dict["style_type"] == "COBOL" and check_keyword_in_file(file_path, 'FREE', 1):
+        style_dict = get_comment_style(source_extension, free_form=True)
+    return style_dict
+
 
+# Returns the comment style of a source extension, free_form is whether the first line has **FREE
+def get_comment_style(source_extension: str, free_form: bool = False) -> Optional[dict]:
     for style_set, style_dict in COMMENT_STYLES:
         if source_extension.upper() in style_set:
-            return_dict = copy.deepcopy(style_dict)
-            # Handling free form RPG
-            if return_dict["style_type"] == "COBOL":
-                if check_keyword_in_file(file_path, 'FREE', 1):
-                    return_dict["start_comment"] = "//"
-                    return_dict["end_comment"] = "*"
-                    return_dict["write_on_line"] = 1
+            return_dict = dict(style_dict)
+            if return_dict["style_type"] == "COBOL" and free_form:
+                return_dict["start_comment"] = "//"
+                return_dict["end_comment"] = "*"
+                return_dict["write_on_line"] = 1
             return return_dict
 
     return None
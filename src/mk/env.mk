@@ -0,0 +1,39 @@
+# Shell, paths, build variables and release settings shared by Makefile and target.mk
+SHELL:=/QOpenSys/pkgs/bin/bash
+TOBI_PATH:=/QOpenSys/pkgs/lib/tobi
+MAKEFLAGS += --no-builtin-rules
+MAKEFLAGS += --no-builtin-variables
+MK := $(TOBI_PATH)/src/mk
+SCRIPTSPATH := $(TOBI_PATH)/src/scripts
+COLOR_TTY :=
+BUILDVARSMKPATH :=
+
+ifndef BUILDVARSMKPATH
+    $(error BUILDVARSMKPATH is not set)
+endif
+
+# makei writes the release, from its cache of the system facts, into the build variables
+include $(BUILDVARSMKPATH)
+
+ifndef IBMiRelease
+IBMiRelease := $(shell cl 'dspdtaara qgpl/qss1MRI' | /QOpenSys/pkgs/bin/grep 'V[[:digit:]]R[[:digit:]]M[[:digit:]]' -wo | /QOpenSys/pkgs/bin/sed 's/[^0-9]$*//g')
+endif
+
+ifndef COMPATIBILITYMODE
+COMPATIBILITYMODE := false
+ifeq ($(shell test $(IBMiRelease) -lt 750; echo $$?), 0)
+# Older than V7R5M0
+COMPATIBILITYMODE := true
+endif
+endif
+
+RUNDIR := $(CURDIR)
+ifndef TOP
+TOP := $(shell \
+       top=$(RUNDIR); \
+       while [ ! -r "$$top/iproj.json" ] && [ "$$top" != "" ]; do \
+           top=$${top%/*}; \
+       done; \
+       echo $$top)
+endif
+
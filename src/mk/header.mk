@@ -1,27 +0,0 @@
-# Clear vars used by this make system
-define HEADER
-CLEAN :=
-TARGETS = $(TRGs) $(DTAARAs) $(DTAQs) $(SQLs) $(BNDDs) $(PFs) $(LFs) $(DSPFs) $(PRTFs) $(CMDs) $(MODULEs) $(SRVPGMs) $(PGMs) $(MENUs) $(PNLGRPs) $(QMQRYs) $(WSCSTs) $(MSGs)
-SUBDIRS :=
-
-TRGs :=
-DTAARAs :=
-DTAQs :=
-SQLs :=
-BNDDs :=
-PFs :=
-LFs :=
-DSPFs :=
-PRTFs :=
-CMDs :=
-SQLs :=
-MODULEs :=
-SRVPGMs :=
-PGMs :=
-MENUs :=
-PNLGRPs :=
-QMQRYs :=
-WSCSTs :=
-MSGs :=
-
-endef
@@ -59,17 +59,6 @@ SRCS_VPATH := src
 parent_dir = $(patsubst %/,%,$(dir $(d)))
 
 
-define include_subdir_rules
-dir_stack := $(d) $(dir_stack)
-d := $(d)/$(1)
-$$(eval $$(value HEADER))
-include $(addsuffix /.Rules.mk.build,$$(d))
-$$(eval $$(value FOOTER))
-d := $$(firstword $$(dir_stack))
-dir_stack := $$(wordlist 2,$$(words $$(dir_stack)),$$(dir_stack))
-endef
-
-
 define tgt_rule
 abs_deps := $$(foreach dep,$$(DEPS_$(1)),$$(if $$(or $$(filter /%,$$(dep)),$$(filter $$$$%,$$(dep))),$$(dep),$$(addprefix $(OBJPATH)/,$$(dep))))
 -include $$(addsuffix .d,$$(basename $$(abs_deps)))
@@ -88,15 +77,9 @@ define get_subtree
 $($(1)_$(2)) $(foreach sd,$(SUBDIRS_$(2)),$(call get_subtree,$(1),$(sd)))
 endef
 
-# target_name := $1
-# source_name := $2
-# dependencies := $3
-# recipe_name := $4
-define generate_rule
-ifndef ${1}_CUSTOM_RECIPE
-${1}: ${2} ${3} ; $$(eval @=$1)$$(eval <=$2)$$(eval tgt=$(basename $1))$$(eval ^=$2 $3)$${$4}
-endif
-endef
+# Prerequisite of the targets whose content fingerprint changed, see MKRule.flat_str
+.PHONY: MAKEI_FORCE
+MAKEI_FORCE: ;
 
 
 # if we are using out of project build tree then there is no need to
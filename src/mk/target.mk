@@ -0,0 +1,20 @@
+# Builds the targets given as goals for `makei build --engine native`.
+#
+# makei orders the targets itself and writes the rules of the targets ready to be built, together with the
+# targets they depend on, to TARGETMKPATH. Unlike Makefile, the rules of the other targets in .makei/build.mk are not read, the
+# recipes are the same ones from def_rules.mk.
+include $(dir $(lastword $(MAKEFILE_LIST)))env.mk
+
+ifndef TARGETMKPATH
+    $(error TARGETMKPATH is not set)
+endif
+
+d := $(TOP)
+
+include $(MK)/skel.mk
+
+.SECONDEXPANSION:
+include $(TARGETMKPATH)
+
+# MAKEI_TARGETS is set by the file at TARGETMKPATH
+-include $(foreach target,$(MAKEI_TARGETS),$(DEPDIR)/$(target).d $(DEPDIR)/$(target).static.d)
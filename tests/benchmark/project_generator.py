@@ -0,0 +1,133 @@
+""" Generates synthetic makei projects for the benchmarks
+
+A project has an iproj.json, a root Rules.mk and `dirs` source directories holding `members_per_dir`
+RPGLE members each. The source directories sit under `ibmi_json_depth` nested directories, each with its
+own .ibmi.json and Rules.mk. A share of the members is built by a `%.MODULE: %.rpgle` wildcard rule,
+the others by explicit rules, and a share of the members starts with a %METADATA header.
+"""
+
+import json
+import random
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import List
+
+INCLUDE_DIR = "QPROTOSRC"
+
+
+@dataclass
+class ProjectSpec:
+    dirs: int = 10
+    members_per_dir: int = 100
+    # Share of the members built by the wildcard rule, the rest has explicit rules
+    wildcard_ratio: float = 0.5
+    ibmi_json_depth: int = 1
+    # Share of the members starting with a %METADATA header
+    metadata_ratio: float = 0.5
+    includes: int = 10
+
+    def to_dict(self):
+        return asdict(self)
+
+
+@dataclass
+class GeneratedProject:
+    root: Path
+    spec: ProjectSpec
+    source_dirs: List[Path]
+    # Sources built by explicit rules, relative to the root, e.g. for read_and_filter_rules_mk
+    explicit_sources: List[Path]
+    file_names: List[str]
+
+
+def _write_json(path: Path, content):
+    path.write_text(json.dumps(content, indent=2) + "\n", encoding="utf-8")
+
+
+def _member_source(name: str, with_metadata: bool, include: str) -> str:
+    lines = ["**FREE"]
+    if with_metadata:
+        lines += ["// %METADATA                                                      *",
+                  f"// %TEXT Generated member {name}                                *",
+                  "// %EMETADATA                                                     *"]
+    lines += [f"/copy {INCLUDE_DIR.lower()}/{include}",
+              f"dcl-proc {name} export;",
+              "end-proc;"]
+    return "\n".join(lines) + "\n"
+
+
+def generate_project(root: Path, spec: ProjectSpec) -> GeneratedProject:
+    """ Writes a project described by spec into root, which must be empty or missing"""
+    root.mkdir(parents=True, exist_ok=True)
+    _write_json(root / "iproj.json", {
+        "description": "Synthetic project for the makei benchmarks",
+        "objlib": "BENCH",
+        "curlib": "BENCH",
+        "includePath": [INCLUDE_DIR],
+        "preUsrlibl": [],
+        "postUsrlibl": [],
+        "setIBMiEnvCmd": [],
+    })
+
+    include_dir = root / INCLUDE_DIR
+    include_dir.mkdir(exist_ok=True)
+    includes = [f"proto{i:03}.rpgleinc" for i in range(max(spec.includes, 1))]
+    for include in includes:
+        (include_dir / include).write_text("dcl-pr proto extproc(*dclcase);\nend-pr;\n", encoding="utf-8")
+
+    # Nested directories, each level with its .ibmi.json
+    chain = [root]
+    for level in range(spec.ibmi_json_depth):
+        level_dir = chain[-1] / f"LEVEL{level}"
+        level_dir.mkdir(exist_ok=True)
+        _write_json(level_dir / ".ibmi.json", {"version": "0.0.1", "build": {"tgtCcsid": "37", "objlib": "BENCH"}})
+        chain.append(level_dir)
+    for directory, subdir in zip(chain, chain[1:]):
+        (directory / "Rules.mk").write_text(f"SUBDIRS = {subdir.name}\n", encoding="utf-8")
+    parent = chain[-1]
+    source_dir_names = [f"QSRC{d:04}" for d in range(spec.dirs)]
+    (parent / "Rules.mk").write_text(f"SUBDIRS = {' '.join(source_dir_names)}\n", encoding="utf-8")
+
+    wildcard_members = round(spec.members_per_dir * spec.wildcard_ratio)
+    metadata_every = round(1 / spec.metadata_ratio) if spec.metadata_ratio > 0 else 0
+    source_dirs = []
+    explicit_sources = []
+    file_names = []
+    for d, dir_name in enumerate(source_dir_names):
+        source_dir = parent / dir_name
+        source_dir.mkdir(exist_ok=True)
+        source_dirs.append(source_dir)
+        rules = ["%.MODULE: %.rpgle"] if wildcard_members else []
+        for m in range(spec.members_per_dir):
+            wildcard = m < wildcard_members
+            name = f"{'W' if wildcard else 'E'}{d:03}{m:05}"
+            file_name = f"{name.lower()}.rpgle" if wildcard else f"{name.lower()}.pgm.rpgle"
+            include = includes[m % len(includes)]
+            with_metadata = metadata_every > 0 and m % metadata_every == 0
+            (source_dir / file_name).write_text(_member_source(name, with_metadata, include), encoding="utf-8")
+            file_names.append(file_name)
+            if not wildcard:
+                rules.append(f"{name}.PGM: {file_name}")
+                explicit_sources.append((source_dir / file_name).relative_to(root))
+        (source_dir / "Rules.mk").write_text("\n".join(rules) + "\n", encoding="utf-8")
+
+    return GeneratedProject(root, spec, source_dirs, explicit_sources, file_names)
+
+
+def file_name_workload(count: int, unique: int, seed: int = 0) -> List[str]:
+    """ Returns `count` file names drawn from `unique` distinct names, like the dependencies of Rules.mk files
+
+    One name in five is an object, e.g. a dependency on HELLO.PGM, the others are sources.
+    """
+    extensions = ["rpgle", "pgm.rpgle", "sqlrpgle", "pgm.sqlrpgle", "clle", "pgm.clle", "pf", "dspf", "sql",
+                  "table", "cmdsrc", "bnd"]
+    objects = ["PGM", "MODULE", "SRVPGM", "FILE", "BNDDIR"]
+    names = []
+    for i in range(unique):
+        if i % 5 == 0:
+            names.append(f"OBJ{i:06}.{objects[i % len(objects)]}")
+        else:
+            text = f"-Text_{i}" if i % 3 == 0 else ""
+            names.append(f"src{i:06}{text}.{extensions[i % len(extensions)]}")
+    generator = random.Random(seed)
+    return [generator.choice(names) for _ in range(count)]
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3.9
+""" Times the parsing and build preparation of makei on synthetic projects
+
+Runs on any machine, no IBM i is needed: make is never started. Usage:
+
+    PYTHONPATH=src:. python -m tests.benchmark.run_benchmarks --dirs 20 --members-per-dir 500 \\
+        --output benchmark.json
+
+The results are written as JSON together with the commit and the Python version, so that runs of
+different commits can be compared.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List
+
+from tests.benchmark.project_generator import INCLUDE_DIR, GeneratedProject, ProjectSpec, file_name_workload, \
+    generate_project
+
+try:
+    import ibm_db_dbi  # noqa: F401 pylint: disable=unused-import
+except ImportError:
+    # makei.cli imports the IBM i database driver; none of the functions timed here use it,
+    # the local unit tests do the same in tests/unit/local/conftest.py
+    sys.modules["ibm_db_dbi"] = types.ModuleType("ibm_db_dbi")
+    # Used in annotations at import time
+    sys.modules["ibm_db_dbi"].Connection = object
+
+# pylint: disable=wrong-import-position
+from makei.build import BuildEnv  # noqa: E402
+from makei.cli.makei_entry import read_and_filter_rules_mk  # noqa: E402
+from makei.include_scanner import CACHE_PATH, IncludeScanner  # noqa: E402
+from makei.project_index import ProjectIndex  # noqa: E402
+from makei.rules_mk import RulesMk  # noqa: E402
+from makei import utils  # noqa: E402
+from makei.utils import decompose_filename, is_source_file  # noqa: E402
+
+
+@contextmanager
+def _chdir(path: Path) -> Iterator[None]:
+    original_cwd = Path.cwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(original_cwd)
+
+
+def _time(func: Callable[[], object], repeat: int, setup: Callable[[], object] = lambda: None) -> Dict[str, float]:
+    """ Returns the min, median and max seconds of `repeat` calls of func, setup runs untimed before each"""
+    timings = []
+    for _ in range(repeat):
+        setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {"min": min(timings), "median": statistics.median(timings), "max": max(timings), "runs": repeat}
+
+
+def _clear_makei_cache(root: Path):
+    shutil.rmtree(root / ".makei", ignore_errors=True)
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=Path(__file__).parent, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_name_benchmarks(count: int, unique: int, repeat: int) -> Dict[str, Dict[str, float]]:
+    """ Times decompose_filename and is_source_file on `count` names, with and without the cache filled"""
+    names = file_name_workload(count, unique)
+
+    def decompose_all():
+        for name in names:
+            try:
+                decompose_filename(name)
+            except ValueError:
+                pass
+
+    def is_source_file_all():
+        for name in names:
+            is_source_file(name)
+    results = {
+        f"decompose_filename ({count} names, empty cache)": _time(decompose_all, repeat,
+                                                                  utils._decompose_filename.cache_clear),
+        f"decompose_filename ({count} names)": _time(decompose_all, repeat),
+        f"is_source_file ({count} names)": _time(is_source_file_all, repeat),
+    }
+    for result in results.values():
+        result["calls"] = count
+    return results
+
+
+def run_benchmarks(project: GeneratedProject, repeat: int) -> Dict[str, Dict[str, float]]:
+    """ Times the parsers and the build preparation on a generated project"""
+    results = {}
+    root = project.root
+    with _chdir(root):
+        rules_mk_paths = [source_dir.relative_to(root) / "Rules.mk" for source_dir in project.source_dirs]
+
+        def parse_rules_mks():
+            for rules_mk_path in rules_mk_paths:
+                RulesMk.from_file(rules_mk_path, root)
+        results["RulesMk.from_file"] = _time(parse_rules_mks, repeat)
+
+        # BuildEnv.__init__ calls _create_build_vars, the instance is kept to time it again on its own
+        build_envs: List[BuildEnv] = []
+        results["BuildEnv (cold cache)"] = _time(lambda: build_envs.append(BuildEnv()), repeat,
+                                                 lambda: _clear_makei_cache(root))
+        results["BuildEnv (warm cache)"] = _time(lambda: build_envs.append(BuildEnv()), repeat)
+        build_env = build_envs[-1]
+        results["BuildEnv._create_build_vars (warm cache)"] = _time(build_env._create_build_vars, repeat)
+
+        names = project.file_names
+
+        def decompose_all():
+            for name in names:
+                decompose_filename(name)
+        results["decompose_filename"] = _time(decompose_all, repeat)
+
+        def is_source_file_all():
+            for name in names:
+                is_source_file(name)
+        results["is_source_file"] = _time(is_source_file_all, repeat)
+
+        sources = project.explicit_sources[:1000]
+
+        def read_and_filter_all():
+            for source in sources:
+                read_and_filter_rules_mk([str(source)])
+        results["read_and_filter_rules_mk"] = _time(read_and_filter_all, repeat)
+    for result in results.values():
+        result["calls"] = 1
+    results["decompose_filename"]["calls"] = results["is_source_file"]["calls"] = len(names)
+    results["read_and_filter_rules_mk"]["calls"] = len(sources)
+    return results
+
+
+def run_include_benchmarks(project: GeneratedProject, repeat: int) -> Dict[str, Dict[str, float]]:
+    """ Times the include scan of every source of a generated project, with an empty and a filled cache
+
+    The warm scan is the one of every build after the first, with and without the project index the build has
+    listed the project into already.
+    """
+    root = project.root
+    sources = {source_dir.name + "/" + file_name: source_dir / file_name
+               for source_dir in project.source_dirs for file_name in os.listdir(source_dir)
+               if file_name.endswith(".rpgle")}
+    count = len(sources)
+
+    def scan(index=None):
+        scanner = IncludeScanner(root, [INCLUDE_DIR], index=index)
+        scanner.graph(sources)
+        scanner.save()
+
+    results = {f"IncludeScanner.graph ({count} files, cold cache)":
+               _time(scan, repeat, lambda: (root / CACHE_PATH).unlink(missing_ok=True))}
+    scan()
+    results[f"IncludeScanner.graph ({count} files, warm cache)"] = _time(scan, repeat)
+    results[f"ProjectIndex ({count} files)"] = _time(lambda: ProjectIndex(root), repeat)
+    index = ProjectIndex(root)
+    results[f"IncludeScanner.graph ({count} files, warm cache, index)"] = _time(lambda: scan(index), repeat)
+    for result in results.values():
+        result["calls"] = count
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Times the makei parsers on a synthetic project")
+    parser.add_argument("--dirs", type=int, default=ProjectSpec.dirs)
+    parser.add_argument("--members-per-dir", type=int, default=ProjectSpec.members_per_dir)
+    parser.add_argument("--wildcard-ratio", type=float, default=ProjectSpec.wildcard_ratio)
+    parser.add_argument("--ibmi-json-depth", type=int, default=ProjectSpec.ibmi_json_depth)
+    parser.add_argument("--metadata-ratio", type=float, default=ProjectSpec.metadata_ratio)
+    parser.add_argument("--names", type=int, default=100000, help="File names for the decompose_filename workload")
+    parser.add_argument("--unique-names", type=int, default=20000)
+    parser.add_argument("--include-files", type=int, default=20000, help="Sources for the include scan workload")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", type=Path, help="JSON file for the results, printed when not set")
+    args = parser.parse_args(argv)
+
+    spec = ProjectSpec(dirs=args.dirs, members_per_dir=args.members_per_dir, wildcard_ratio=args.wildcard_ratio,
+                       ibmi_json_depth=args.ibmi_json_depth, metadata_ratio=args.metadata_ratio)
+    with tempfile.TemporaryDirectory(prefix="makei-benchmark-") as tmp_dir:
+        project = generate_project(Path(tmp_dir) / "project", spec)
+        results = run_benchmarks(project, args.repeat)
+        # A project of its own, the include scan is timed on a larger one than the build preparation
+        include_spec = ProjectSpec(dirs=max(1, args.include_files // 1000),
+                                   members_per_dir=min(args.include_files, 1000))
+        results.update(run_include_benchmarks(generate_project(Path(tmp_dir) / "includes", include_spec),
+                                              args.repeat))
+    results.update(run_name_benchmarks(args.names, args.unique_names, args.repeat))
+    for result in results.values():
+        result["per_call_us"] = result["median"] / result["calls"] * 1e6
+
+    report = {
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "project": spec.to_dict(),
+        "results": results,
+    }
+    for name, result in results.items():
+        print(f"{name:50} {result['median'] * 1000:10.1f} ms  {result['per_call_us']:10.2f} us/call",
+              file=sys.stderr)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
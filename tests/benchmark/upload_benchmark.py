@@ -0,0 +1,91 @@
+#!/usr/bin/env python3.9
+""" Times copying a source stream file into a QTEMP member with CPYFRMSTMF and with multi-row INSERTs
+
+Unlike run_benchmarks, this one runs on IBM i: both engines of `crtfrmstmf --upload` are timed on a generated
+DDS source over one job, the way crtfrmstmf uses them. Usage:
+
+    PYTHONPATH=src:. python -m tests.benchmark.upload_benchmark --lines 5000 --repeat 5 --output upload.json
+"""
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict
+
+from makei.crtfrmstmf import INSERT_BATCH_ROWS, insert_records, source_records, source_rcdlen
+from makei.ibm_job import IBMJob
+from tests.benchmark.run_benchmarks import _commit, _time
+
+TMP_SRC = "MAKEIBENCH"
+MBR = "UPLOAD"
+
+
+def generate_dds(path: Path, lines: int):
+    """ Writes a physical file source with one field per line"""
+    with path.open("w", encoding="utf-8") as file:
+        file.write("     A          R BENCHREC                  TEXT('Upload benchmark')\n")
+        for number in range(1, lines):
+            file.write(f"     A            FLD{number:06}     30A         COLHDG('Field {number}')\n")
+
+
+def run_upload_benchmarks(job: IBMJob, srcstmf: Path, repeat: int, batch_size: int) -> Dict[str, Dict[str, float]]:
+    """ Times both engines, the member is cleared untimed before each run"""
+    rcdlen = source_rcdlen(str(srcstmf), "CRTPF")
+    job.run_cl(f"DLTF FILE(QTEMP/{TMP_SRC})", True)
+    job.run_cl(f"CRTSRCPF FILE(QTEMP/{TMP_SRC}) RCDLEN({rcdlen}) MBR({MBR})")
+
+    def clear():
+        job.run_cl(f"CLRPFM FILE(QTEMP/{TMP_SRC}) MBR({MBR})")
+
+    def cpyfrmstmf():
+        job.run_cl(f'CPYFRMSTMF FROMSTMF("{srcstmf}") TOMBR("/QSYS.LIB/QTEMP.LIB/{TMP_SRC}.FILE/{MBR}.MBR") '
+                   'MBROPT(*REPLACE)')
+
+    def insert():
+        insert_records(job, source_records(str(srcstmf)), "QTEMP", TMP_SRC, MBR, batch_size)
+
+    results = {"CPYFRMSTMF": _time(cpyfrmstmf, repeat, clear),
+               "INSERT": _time(insert, repeat, clear),
+               "source_records": _time(lambda: source_records(str(srcstmf)), repeat)}
+    job.run_cl(f"DLTF FILE(QTEMP/{TMP_SRC})", True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Times the source upload engines of crtfrmstmf on IBM i")
+    parser.add_argument("--lines", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=INSERT_BATCH_ROWS, help="Rows per INSERT statement")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="JSON file for the results, printed when not set")
+    args = parser.parse_args(argv)
+
+    job = IBMJob()
+    with tempfile.TemporaryDirectory(prefix="makei-upload-") as tmp_dir:
+        srcstmf = Path(tmp_dir) / "bench.pf"
+        generate_dds(srcstmf, args.lines)
+        results = run_upload_benchmarks(job, srcstmf, args.repeat, args.batch_size)
+    job.close()
+    for result in results.values():
+        result["per_line_us"] = result["median"] / args.lines * 1e6
+
+    report = {
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "lines": args.lines,
+        "batch_size": args.batch_size,
+        "results": results,
+    }
+    for name, result in results.items():
+        print(f"{name:20} {result['median'] * 1000:10.1f} ms  {result['per_line_us']:10.2f} us/line", file=sys.stderr)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+CUST.FILE: cust.pf
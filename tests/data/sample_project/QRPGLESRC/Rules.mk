@@ -0,0 +1,8 @@
+MAIN.MODULE: main.rpgle CUST.FILE
+MAIN.MODULE: TEXT=Main
+UTIL.MODULE: util.rpgle
+APP.PGM: MAIN.MODULE UTIL.MODULE
+OTHER.PGM: other.pgm.rpgle
+LIST.FILE: main.rpgle
+	system "CRTPF $@"
+%.MODULE: %.clle
@@ -0,0 +1 @@
+SUBDIRS = QDDSSRC QRPGLESRC
@@ -5,9 +5,14 @@ This file provides mocks for IBM i-specific modules that are not available
 on non-IBM i systems (macOS, Linux, Windows).
 """
 
+import shutil
 import sys
+from pathlib import Path
+
 import pytest
 
+from tests.lib.const import DATA_PATH
+
 
 # Mock ibm_db_dbi module before any imports
 # This must happen before any test modules import makei modules
@@ -163,6 +168,25 @@ TEST.PGM: test.RPGLE
 """
 
 
+@pytest.fixture
+def sample_project(tmp_path, monkeypatch):
+    """Copy of tests/data/sample_project in tmp_path, which becomes the working directory
+
+    QDDSSRC and QRPGLESRC are listed in the SUBDIRS of the root Rules.mk, QPROTOSRC holds the includes.
+    """
+    shutil.copytree(DATA_PATH / "sample_project", tmp_path, dirs_exist_ok=True)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def sample_rules_mks(sample_project):
+    """The parsed Rules.mk files of sample_project, the root one first"""
+    from makei.rules_mk import RulesMk  # pylint: disable=import-outside-toplevel
+    return [RulesMk.from_file(path, sample_project)
+            for path in (Path("Rules.mk"), Path("QDDSSRC") / "Rules.mk", Path("QRPGLESRC") / "Rules.mk")]
+
+
 @pytest.fixture
 def mock_joblog_data():
     """Provide sample joblog data"""
@@ -0,0 +1,37 @@
+from tests.benchmark.project_generator import ProjectSpec, generate_project
+from tests.benchmark.run_benchmarks import run_benchmarks, run_include_benchmarks, run_name_benchmarks
+
+
+def test_generated_project_and_benchmarks(tmp_path):
+    spec = ProjectSpec(dirs=2, members_per_dir=4, wildcard_ratio=0.5, ibmi_json_depth=2, metadata_ratio=0.5)
+    project = generate_project(tmp_path / "project", spec)
+
+    assert (tmp_path / "project" / "LEVEL0" / "LEVEL1" / ".ibmi.json").exists()
+    assert len(project.file_names) == 8
+    assert len(project.explicit_sources) == 4
+    assert "%METADATA" in (project.source_dirs[0] / project.file_names[0]).read_text()
+
+    results = run_benchmarks(project, repeat=1)
+
+    assert set(results) == {"RulesMk.from_file", "BuildEnv (cold cache)", "BuildEnv (warm cache)",
+                            "BuildEnv._create_build_vars (warm cache)", "decompose_filename", "is_source_file",
+                            "read_and_filter_rules_mk"}
+    assert results["decompose_filename"]["calls"] == 8
+    assert all(result["min"] >= 0 for result in results.values())
+
+
+def test_name_benchmarks():
+    results = run_name_benchmarks(1000, 100, repeat=1)
+
+    assert results["decompose_filename (1000 names)"]["calls"] == 1000
+    assert len(results) == 3
+
+
+def test_include_benchmarks(tmp_path):
+    project = generate_project(tmp_path / "project", ProjectSpec(dirs=2, members_per_dir=4))
+
+    results = run_include_benchmarks(project, repeat=1)
+
+    assert set(results) == {"IncludeScanner.graph (8 files, cold cache)", "IncludeScanner.graph (8 files, warm cache)",
+                            "ProjectIndex (8 files)", "IncludeScanner.graph (8 files, warm cache, index)"}
+    assert all(result["calls"] == 8 for result in results.values())
@@ -81,3 +81,39 @@ def test_build_env_with_targets_and_options(set_test_directory):
     finally:
         if build_env:
             build_env._post_make()
+
+
+@pytest.mark.parametrize("set_test_directory", ["sample_project1"], indirect=True)
+def test_build_env_with_jobs(set_test_directory):
+    try:
+        build_env = BuildEnv(jobs=4)
+        assert " -j4 -Otarget" in build_env.generate_make_cmd()
+        assert "-j" not in BuildEnv().generate_make_cmd()
+    finally:
+        if build_env:
+            build_env._post_make()
+
+
+@pytest.mark.parametrize("set_test_directory", ["sample_project1"], indirect=True)
+def test_build_env_counts_each_target_once(set_test_directory):
+    try:
+        build_env = BuildEnv(jobs=4)
+        output = [
+            "\x1b[32m✓ QRPGLESRC/A.MODULE was created successfully!\x1b[0m",
+            "✗ Failed to create QRPGLESRC/B.MODULE!",
+            "✓ QRPGLESRC/A.MODULE was created successfully!",
+            # Lines of parallel recipes may run into each other
+            "✓ QRPGLESRC/C.PGM was created successfully!✗ Failed to create QRPGLESRC/D.PGM!",
+            # Goals whose prerequisites failed, only the rule targets are objects
+            "make: Target 'TEST2.PGM' not remade because of errors.",
+            "make: Target 'all' not remade because of errors.",
+            "make: Target `dir_innerdir1' not remade because of errors.",
+        ]
+        for line in output:
+            build_env.handle_make_output_line(line)
+
+        assert build_env.success_targets == ["QRPGLESRC/A.MODULE", "QRPGLESRC/C.PGM"]
+        assert build_env.failed_targets == ["QRPGLESRC/B.MODULE", "QRPGLESRC/D.PGM", "TEST2.PGM"]
+    finally:
+        if build_env:
+            build_env._post_make()
@@ -0,0 +1,61 @@
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from makei.build_makefile import generate_build_makefile, remove_rules_mk_build
+from makei.rules_mk import RulesMk
+
+
+def _rules_mks(sample_project, sample_rules_mks):
+    (sample_project / "UNUSED").mkdir()
+    return sample_rules_mks + [RulesMk.from_str("UNUSED.FILE: unused.pf\n", Path("UNUSED"), sample_project)]
+
+
+def test_build_makefile_has_explicit_rules(sample_project, sample_rules_mks):
+    rules_mks = _rules_mks(sample_project, sample_rules_mks)
+    qrpglesrc = sample_project / "QRPGLESRC"
+    qddssrc = sample_project / "QDDSSRC"
+
+    makefile = generate_build_makefile(rules_mks, up_to_date=["CUST.FILE"], stale=["MAIN.MODULE"])
+
+    assert f"vpath MAIN.MODULE $(OBJPATH_{qrpglesrc})\nMAIN.MODULE_d := {qrpglesrc}\n" in makefile
+    assert f"MAIN.MODULE: {qrpglesrc}/main.rpgle CUST.FILE MAKEI_FORCE ; $(eval @=MAIN.MODULE)" \
+           f"$(eval <={qrpglesrc}/main.rpgle)$(eval tgt=MAIN)$(eval ^={qrpglesrc}/main.rpgle CUST.FILE)" \
+           "${RPGLE_TO_MODULE_RECIPE}\nMAIN.MODULE: TEXT=Main\n" in makefile
+    assert f"CUST.FILE_d := {qddssrc}\nCUST.FILE: ;\n" in makefile
+    assert "LIST.FILE : " in makefile and '\tsystem "CRTPF $@"\n' in makefile
+    assert f"TARGETS_{sample_project} := CUST.FILE LIST.FILE MAIN.MODULE UTIL.MODULE APP.PGM OTHER.PGM\n" in makefile
+    assert f"tree_{sample_project} : tree_{qddssrc} tree_{qrpglesrc}\n" in makefile
+    assert f"dir_{qrpglesrc} : LIST.FILE MAIN.MODULE UTIL.MODULE APP.PGM OTHER.PGM\n" in makefile
+    assert "$(eval $(call" not in makefile
+    assert ".SECONDARY: $(OBJPATH)\n" in makefile
+    # Not listed in any SUBDIRS, as with the recursive include
+    assert "UNUSED.FILE" not in makefile
+
+
+def test_old_rules_mk_build_files_are_removed(tmp_path):
+    (tmp_path / "QRPGLESRC").mkdir()
+    (tmp_path / "QRPGLESRC" / ".Rules.mk.build").write_text("")
+
+    remove_rules_mk_build(tmp_path, [Path("QRPGLESRC") / "Rules.mk", Path("Rules.mk")])
+
+    assert not (tmp_path / "QRPGLESRC" / ".Rules.mk.build").exists()
+
+
+@pytest.mark.skipif(shutil.which("make") is None, reason="GNU make is not installed")
+def test_build_makefile_keeps_clean_targets(sample_project, sample_rules_mks):
+    rules_mks = _rules_mks(sample_project, sample_rules_mks)
+    (sample_project / "build.mk").write_text(generate_build_makefile(rules_mks))
+    # Stand-ins for the variables of skel.mk
+    (sample_project / "Makefile").write_text("CLEAN_DIR = $(subst clean_,,$@)/obj\n"
+                                             "DIST_CLEAN_DIR = $(subst dist_clean_,,$@)/obj\n"
+                                             ".SECONDEXPANSION:\ninclude build.mk\n")
+
+    result = subprocess.run(["make", "-n", "clean_all", "dist_clean"], cwd=sample_project, capture_output=True,
+                            text=True, check=True)
+
+    for directory in (sample_project, sample_project / "QDDSSRC", sample_project / "QRPGLESRC"):
+        assert f"cleaning {directory}/obj\n" in result.stdout
+        assert f"rm -rf {directory}/obj\n" in result.stdout
@@ -0,0 +1,66 @@
+from pathlib import Path
+
+from makei.build_state import BuildState
+from makei.rules_mk import RulesMk
+
+RULES_MK = """PGMs := HELLO.PGM
+HELLO.MODULE: hello.rpgle
+HELLO.PGM: HELLO.MODULE
+HELLO.PGM: TGTRLS := V7R4M0
+"""
+
+
+def _build_state(src_dir: Path, rules_mk_str: str = RULES_MK, object_dir: Path = None) -> BuildState:
+    rules_mk = RulesMk.from_str(rules_mk_str, Path("."), src_dir)
+    build_state = BuildState(src_dir)
+    build_state.set_common_settings(["curlib=CURLIB"])
+    build_state.add_rules(rules_mk, "*JOB /QSYS.LIB/OBJLIB.LIB", str(object_dir or src_dir / "objects"))
+    return build_state
+
+
+def _record_all(src_dir: Path, object_dir: Path):
+    build_state = _build_state(src_dir, object_dir=object_dir)
+    build_state.update(["HELLO.MODULE", "HELLO.PGM"], [])
+    build_state.save()
+
+
+def test_untracked_targets_are_left_to_make(tmp_path):
+    (tmp_path / "hello.rpgle").write_text("dcl-s x int(10);\n")
+
+    assert _build_state(tmp_path).classify() == ([], [])
+
+
+def test_unchanged_targets_are_up_to_date(tmp_path):
+    (tmp_path / "hello.rpgle").write_text("dcl-s x int(10);\n")
+    object_dir = tmp_path / "objects"
+    object_dir.mkdir()
+    (object_dir / "HELLO.MODULE").touch()
+    _record_all(tmp_path, object_dir)
+
+    # HELLO.PGM was deleted outside of the build
+    assert _build_state(tmp_path, object_dir=object_dir).classify() == (["HELLO.MODULE"], [])
+
+
+def test_source_change_makes_dependents_stale(tmp_path):
+    (tmp_path / "hello.rpgle").write_text("dcl-s x int(10);\n")
+    _record_all(tmp_path, tmp_path)
+    (tmp_path / "hello.rpgle").write_text("dcl-s x int(20);\n")
+
+    assert _build_state(tmp_path).classify() == ([], ["HELLO.MODULE", "HELLO.PGM"])
+
+
+def test_target_variable_change_makes_target_stale(tmp_path):
+    (tmp_path / "hello.rpgle").write_text("dcl-s x int(10);\n")
+    _record_all(tmp_path, tmp_path)
+    build_state = _build_state(tmp_path, RULES_MK.replace("V7R4M0", "V7R5M0"))
+
+    assert build_state.classify()[1] == ["HELLO.PGM"]
+
+
+def test_failed_targets_are_forgotten(tmp_path):
+    (tmp_path / "hello.rpgle").write_text("dcl-s x int(10);\n")
+    _record_all(tmp_path, tmp_path)
+    build_state = _build_state(tmp_path)
+    build_state.update([], ["HELLO.PGM"])
+
+    assert list(build_state.recorded) == ["HELLO.MODULE"]
@@ -0,0 +1,53 @@
+import threading
+from unittest.mock import Mock, patch
+
+import pytest
+
+from makei.cli.compile_client import send_request
+from makei.compile_server import CompileServer, launch_env_settings
+from makei.const import SERVER_UNAVAILABLE_EXIT_CODE
+
+
+def test_launch_env_settings_with_tmp_curlib():
+    """tmpCurlib becomes the current library and the current library moves to the user library list"""
+    settings = launch_env_settings({"curlib": "MYLIB", "preUsrlibl": "LIB1", "tmpCurlib": "TMPLIB"})
+
+    assert settings == {"curlib": "TMPLIB", "preUsrlibl": "MYLIB LIB1"}
+
+
+def test_send_request_without_server(tmp_path):
+    """The client reports the server as unavailable so the scripts can fall back"""
+    assert send_request({"kind": "stats"}, tmp_path / "missing.sock") == SERVER_UNAVAILABLE_EXIT_CODE
+
+
+@pytest.fixture
+def server(tmp_path):
+    with patch("makei.ibm_job.IBMJob"):
+        compile_server = CompileServer(tmp_path / "server.sock")
+        thread = threading.Thread(target=compile_server.serve_forever, daemon=True)
+        thread.start()
+        yield compile_server
+        compile_server.shutdown()
+        compile_server.server_close()
+        thread.join()
+
+
+def test_server_streams_output_and_exit_code(server):
+    """Output printed while handling the request is streamed back to the client"""
+    def fake_run_request(kind, request):
+        print(f"compiling {request['argv'][0]}")
+        return 1
+
+    output = Mock()
+    with patch.object(server, "run_request", side_effect=fake_run_request):
+        exit_code = send_request({"kind": "crtfrmstmf", "argv": ["TESTOBJ"]}, server.socket_path, output)
+
+    assert exit_code == 1
+    written = "".join(call.args[0] for call in output.write.call_args_list)
+    assert "compiling TESTOBJ" in written
+
+
+def test_server_refuses_second_instance(server):
+    """A second server cannot take over a socket that is in use"""
+    with pytest.raises(OSError):
+        CompileServer(server.socket_path)
@@ -0,0 +1,51 @@
+from makei.db_relations import DbRelations
+
+
+def _relations(tmp_path):
+    queries = []
+
+    def query(libraries):
+        queries.append(libraries)
+        return {"APPLIB/CUST": [["CUSTL1", "APPLIB"], ["CUSTJ1", "RPTLIB"]],
+                "APPLIB/ORDERS": [["CUSTJ1", "RPTLIB"]]}
+
+    path = tmp_path / "dbrelations.json"
+    assert DbRelations.create(path, ["applib", "APPLIB"], query)
+    assert queries == [["APPLIB"]]
+    return path
+
+
+def test_dependents_of_the_libraries_read(tmp_path):
+    relations = DbRelations(_relations(tmp_path))
+    assert relations.dependents("CUST", "applib") == [("CUSTL1", "APPLIB"), ("CUSTJ1", "RPTLIB")]
+    assert relations.dependents("ITEM", "APPLIB") == []
+    # DSPDBR is still needed for the other libraries
+    assert relations.dependents("CUST", "OTHERLIB") is None
+    assert DbRelations(tmp_path / "missing.json").dependents("CUST", "APPLIB") is None
+
+
+def test_changes_of_the_build_are_read_back(tmp_path):
+    path = _relations(tmp_path)
+    relations = DbRelations(path)
+    # CUST created again, with the files over it deleted
+    relations.record([("CUSTL1", "APPLIB"), ("CUSTJ1", "RPTLIB"), ("CUST", "APPLIB")])
+    assert relations.dependents("CUST", "APPLIB") == []
+    assert relations.dependents("ORDERS", "APPLIB") == []
+
+    # Another recipe creates the join logical file again
+    DbRelations(path).record([], ("CUSTJ1", "RPTLIB"), [("CUST", "APPLIB"), ("ORDERS", "APPLIB")])
+
+    relations = DbRelations(path)
+    assert relations.dependents("CUST", "APPLIB") == [("CUSTJ1", "RPTLIB")]
+    assert relations.dependents("ORDERS", "APPLIB") == [("CUSTJ1", "RPTLIB")]
+
+    # A new build starts from a new snapshot
+    _relations(tmp_path)
+    assert DbRelations(path).dependents("CUST", "APPLIB") == [("CUSTL1", "APPLIB"), ("CUSTJ1", "RPTLIB")]
+
+
+def test_failed_query_writes_nothing(tmp_path):
+    path = tmp_path / "dbrelations.json"
+    assert not DbRelations.create(path, ["APPLIB"], lambda libraries: None)
+    assert not DbRelations.create(path, [], lambda libraries: {})
+    assert not path.exists()
@@ -0,0 +1,49 @@
+import os
+import time
+
+from makei.evfevent_deps import read_dep_file, update_dep_files, write_dep_file
+
+
+def _fileid(file_id: int, name: str) -> str:
+    return f"FILEID 0 {file_id:03} 000000 {len(name):03} {name} 20240101120000 0\n"
+
+
+def test_update_dep_files_maps_includes_to_project_sources(sample_project):
+    src_dir = sample_project
+    (src_dir / ".evfevent").mkdir()
+    start_time = time.time() - 1
+    (src_dir / ".evfevent" / "MAIN.evfevent").write_text(
+        _fileid(1, f"{src_dir}/QRPGLESRC/main.rpgle") +
+        _fileid(2, f"{src_dir}/QPROTOSRC/Proto.RPGLEINC") +
+        _fileid(3, "MYLIB/QPROTOSRC(MEMBER)") +
+        _fileid(4, "QSYSINC/QRPGLESRC(SYSTEM)") +
+        _fileid(5, "QTEMP/QSQLTEMP1(MAIN)"))
+
+    assert update_dep_files(src_dir, ["MAIN.MODULE"], {"MAIN.MODULE": "main.rpgle"}, start_time) == 1
+
+    assert read_dep_file(src_dir / ".deps", "MAIN.MODULE") == [
+        str((src_dir / "QPROTOSRC" / "Proto.RPGLEINC").resolve()),
+        str((src_dir / "QPROTOSRC" / "member.rpgleinc").resolve()),
+    ]
+    # Deleted includes must not break the next build
+    assert f"{(src_dir / 'QPROTOSRC' / 'Proto.RPGLEINC').resolve()}:\n" in \
+        (src_dir / ".deps" / "MAIN.MODULE.d").read_text()
+
+
+def test_update_dep_files_ignores_events_files_of_earlier_builds(sample_project):
+    src_dir = sample_project
+    (src_dir / ".evfevent").mkdir()
+    event_file = src_dir / ".evfevent" / "MAIN.evfevent"
+    event_file.write_text(_fileid(1, f"{src_dir}/QRPGLESRC/main.rpgle") +
+                          _fileid(2, f"{src_dir}/QPROTOSRC/Proto.RPGLEINC"))
+    os.utime(event_file, (time.time() - 60, time.time() - 60))
+
+    assert update_dep_files(src_dir, ["MAIN.MODULE"], {"MAIN.MODULE": "main.rpgle"}, time.time() - 1) == 0
+    assert not (src_dir / ".deps" / "MAIN.MODULE.d").exists()
+
+
+def test_write_dep_file_without_dependencies_removes_it(tmp_path):
+    write_dep_file(tmp_path, "HELLO.MODULE", [tmp_path / "a.rpgleinc"])
+    write_dep_file(tmp_path, "HELLO.MODULE", [])
+
+    assert list(tmp_path.iterdir()) == []
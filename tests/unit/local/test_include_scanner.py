@@ -0,0 +1,82 @@
+from pathlib import Path
+
+import pytest
+
+from makei.include_scanner import IncludeScanner, parse_directives
+from makei.project_index import ProjectIndex
+
+
+def test_parse_rpg_directives():
+    content = "\n".join([
+        "**FREE",
+        "/copy qprotosrc/proto.rpgleinc",
+        "/INCLUDE QPROTOSRC,MEMBER",
+        "// /copy commented",
+        "exec sql include sqlca;",
+        "     H/COPY MYLIB/QRPGLESRC,FIXED",
+        "      * /COPY QRPGLESRC,IGNORED",
+    ])
+
+    assert parse_directives(content, "rpg") == [
+        ("path", "qprotosrc/proto.rpgleinc", None),
+        ("member", "MEMBER", "QPROTOSRC"),
+        ("member", "sqlca", None),
+        ("member", "FIXED", "QRPGLESRC"),
+    ]
+
+
+def test_parse_cl_cobol_and_c_directives():
+    assert parse_directives("INCLUDE SRCMBR(CLINC) SRCFILE(MYLIB/QCLSRC)\nINCLUDE SRCSTMF('inc/x.clinc')", "cl") == [
+        ("member", "CLINC", "QCLSRC"), ("path", "inc/x.clinc", None)]
+    assert parse_directives("       COPY CPYMBR OF QCPYSRC.\n      *COPY IGNORED.", "cobol") == [
+        ("member", "CPYMBR", "QCPYSRC")]
+    assert parse_directives('#include "qcsrc/x.h"\n#  include <stdio.h>', "c") == [
+        ("path", "qcsrc/x.h", None), ("path", "stdio.h", None)]
+
+
+def test_scanner_resolves_includes_transitively(sample_project):
+    source = sample_project / "QRPGLESRC" / "main.rpgle"
+    with source.open("a") as file:
+        file.write("/include QPROTOSRC,MEMBER\n/copy missing\n")
+    with (sample_project / "QPROTOSRC" / "Proto.RPGLEINC").open("a") as file:
+        file.write("/copy common\n")
+    (sample_project / "headers").mkdir()
+    (sample_project / "headers" / "common.rpgleinc").write_text("/copy qprotosrc/proto.rpgleinc\n")
+
+    scanner = IncludeScanner(sample_project, ["headers"])
+
+    assert scanner.all_includes(source) == [
+        sample_project / "QPROTOSRC" / "Proto.RPGLEINC",
+        sample_project / "headers" / "common.rpgleinc",
+        sample_project / "QPROTOSRC" / "member.rpgleinc",
+    ]
+
+
+def test_scanner_reuses_cached_directives(tmp_path):
+    source = tmp_path / "hello.rpgle"
+    source.write_text("/copy proto.rpgleinc\n")
+    scanner = IncludeScanner(tmp_path)
+    scanner.directives(source)
+    scanner.save()
+
+    cached = IncludeScanner(tmp_path)
+    cached._cache[str(source)][2] = [["path", "cached.rpgleinc", None]]
+    assert cached.directives(source) == [("path", "cached.rpgleinc", None)]
+
+    source.write_text("/copy changed.rpgleinc\n")
+    assert cached.directives(source) == [("path", "changed.rpgleinc", None)]
+
+
+def test_scanner_checks_cached_directives_against_the_index(tmp_path, monkeypatch):
+    source = tmp_path / "hello.rpgle"
+    source.write_text("/copy proto.rpgleinc\n")
+    scanner = IncludeScanner(tmp_path)
+    scanner.directives(source)
+    scanner.save()
+
+    index = ProjectIndex(tmp_path)
+    scanner = IncludeScanner(tmp_path, index=index)
+    scanner._cache[str(source)][2] = [["path", "cached.rpgleinc", None]]
+    monkeypatch.setattr(Path, "stat", lambda path, **kwargs: pytest.fail(f"{path} was stat'ed"))
+    assert scanner.directives(source) == [("path", "cached.rpgleinc", None)]
+    assert scanner.directives(tmp_path / "missing.rpgle") == []
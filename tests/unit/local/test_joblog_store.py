@@ -0,0 +1,109 @@
+import json
+import threading
+
+import pytest
+
+from makei.const import BUILD_ENV_VAR
+from makei.joblog_store import append_entry, clear, iter_joblog, merge_if_standalone, merge_segments, segment_dir
+
+
+def _entry(cmd, cmd_time, build_object="TEST.PGM"):
+    return {"cmd": cmd, "cmd_time": cmd_time, "msgs": [], "object": build_object, "source": "", "output": "",
+            "failed": False}
+
+
+def test_merge_segments_orders_by_cmd_time(tmp_path):
+    joblog_json = tmp_path / ".logs" / "joblog.json"
+    append_entry(joblog_json, _entry("B1", "2024-01-01-12.00.02.000000", "B.FILE"))
+    append_entry(joblog_json, _entry("A1", "2024-01-01-12.00.01.000000", "A.PGM"))
+    append_entry(joblog_json, _entry("A2", "2024-01-01-12.00.03.000000", "A.PGM"))
+
+    assert merge_segments(joblog_json) == 3
+
+    data = json.loads(joblog_json.read_text())
+    assert [entry["cmd"] for entry in data] == ["A1", "B1", "A2"]
+    assert not segment_dir(joblog_json).exists()
+
+
+def test_merge_segments_keeps_existing_entries(tmp_path):
+    joblog_json = tmp_path / "joblog.json"
+    joblog_json.write_text(json.dumps([_entry("OLD", "2025-01-01-00.00.00.000000")], indent=4))
+    append_entry(joblog_json, _entry("NEW", "2024-01-01-00.00.00.000000"))
+
+    merge_segments(joblog_json)
+
+    assert [entry["cmd"] for entry in json.loads(joblog_json.read_text())] == ["OLD", "NEW"]
+
+
+def test_merge_segments_without_segments(tmp_path):
+    joblog_json = tmp_path / "joblog.json"
+
+    assert merge_segments(joblog_json) == 0
+    assert not joblog_json.exists()
+
+
+def test_merge_if_standalone(tmp_path):
+    """A compile outside of a build writes joblog.json itself, within a build the segments are left to makei"""
+    joblog_json = tmp_path / "joblog.json"
+    append_entry(joblog_json, _entry("CMD", "2024-01-01-00.00.00.000000"))
+
+    merge_if_standalone(joblog_json, {BUILD_ENV_VAR: "1"})
+    assert not joblog_json.exists()
+
+    merge_if_standalone(joblog_json, {})
+    assert [entry["cmd"] for entry in json.loads(joblog_json.read_text())] == ["CMD"]
+    assert not segment_dir(joblog_json).exists()
+
+
+def test_concurrent_appends_are_not_lost(tmp_path):
+    joblog_json = tmp_path / "joblog.json"
+
+    def worker(index):
+        for count in range(50):
+            append_entry(joblog_json, _entry(f"{index}-{count}", f"2024-01-01-12.00.00.{count:06}", "SAME.PGM"))
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert merge_segments(joblog_json) == 400
+    assert len(list(iter_joblog(joblog_json))) == 400
+
+
+@pytest.mark.parametrize("indent", [None, 4])
+def test_iter_joblog_streams_entries(tmp_path, monkeypatch, indent):
+    monkeypatch.setattr("makei.joblog_store._READ_CHUNK_SIZE", 7)
+    joblog_json = tmp_path / "joblog.json"
+    entries = [_entry(f"CMD {index}", "2024-01-01-12.00.00.000000") for index in range(20)]
+    entries.append({"cmd": "numbers", "value": 12345})
+    joblog_json.write_text(json.dumps(entries, indent=indent))
+
+    assert list(iter_joblog(joblog_json)) == entries
+
+
+def test_iter_joblog_empty_array(tmp_path):
+    joblog_json = tmp_path / "joblog.json"
+    joblog_json.write_text("[]")
+
+    assert list(iter_joblog(joblog_json)) == []
+
+
+def test_iter_joblog_rejects_other_json(tmp_path):
+    joblog_json = tmp_path / "joblog.json"
+    joblog_json.write_text('{"cmd": "not an array"}')
+
+    with pytest.raises(ValueError):
+        list(iter_joblog(joblog_json))
+
+
+def test_clear_removes_leftover_segments(tmp_path):
+    joblog_json = tmp_path / "joblog.json"
+    joblog_json.write_text("[]")
+    append_entry(joblog_json, _entry("LEFTOVER", "2024-01-01-12.00.00.000000"))
+
+    clear(joblog_json)
+
+    assert not joblog_json.exists()
+    assert merge_segments(joblog_json) == 0
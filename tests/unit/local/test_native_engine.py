@@ -0,0 +1,96 @@
+import threading
+from types import SimpleNamespace
+
+from makei.native_engine import NativeEngine, batch_makefile, build_graph, failed_targets, plan, resolve_goals
+
+
+def _build_env(rules_mks, targets, jobs=1, up_to_date=()):
+    return SimpleNamespace(targets=targets, rules_mks=rules_mks, up_to_date_targets=list(up_to_date), jobs=jobs,
+                           failed_targets=[])
+
+
+def test_graph_goals_and_order(sample_project, sample_rules_mks):
+    graph = build_graph(sample_rules_mks)
+
+    assert graph["APP.PGM"].dependencies == ["MAIN.MODULE", "UTIL.MODULE"]
+    assert graph["MAIN.MODULE"].dependencies == ["CUST.FILE"]
+    assert resolve_goals(["dir_QDDSSRC", "other.pgm", "NOPE.PGM"], sample_rules_mks, graph) == \
+        (["CUST.FILE", "OTHER.PGM"], ["NOPE.PGM"])
+    assert sorted(resolve_goals(["dir_."], sample_rules_mks, graph)[0]) == sorted(graph)
+    order = plan(graph, ["APP.PGM"])
+    assert order == ["CUST.FILE", "MAIN.MODULE", "UTIL.MODULE", "APP.PGM"]
+
+    makefile = batch_makefile([graph["MAIN.MODULE"], graph["LIST.FILE"]], graph, ["LIST.FILE"])
+    assert "MAKEI_TARGETS := MAIN.MODULE LIST.FILE" in makefile
+    qddssrc = sample_project / "QDDSSRC"
+    assert f"vpath CUST.FILE $(OBJPATH_{qddssrc})\nCUST.FILE_d := {qddssrc}\nCUST.FILE: ;" in makefile
+    assert f"MAIN.MODULE: {sample_project / 'QRPGLESRC' / 'main.rpgle'} CUST.FILE ; $(eval @=MAIN.MODULE)" in makefile
+    assert makefile.count("CUST.FILE: ;") == 1
+
+
+def test_failed_targets_of_make_run():
+    output = b"make: *** [/QOpenSys/pkgs/lib/bob/mk/target.mk:18: APP.PGM] Error 1\n" \
+             b"make: *** No rule to make target 'nope.rpgle', needed by 'MAIN.MODULE'.\n" \
+             b"make: Target 'MAIN.MODULE' not remade because of errors.\n"
+
+    assert failed_targets(["APP.PGM", "MAIN.MODULE", "CUST.FILE"], 2, output) == ["APP.PGM", "MAIN.MODULE"]
+    assert failed_targets(["APP.PGM", "CUST.FILE"], 2, b"make: *** TARGETMKPATH is not set.  Stop.\n") == \
+        ["APP.PGM", "CUST.FILE"]
+    assert failed_targets(["APP.PGM"], 0, b"") == []
+
+
+def test_dependents_of_failed_target_are_not_built(sample_rules_mks):
+    build_env = _build_env(sample_rules_mks, ["all"], jobs=3, up_to_date=["UTIL.MODULE"])
+    started = []
+    lock = threading.Lock()
+
+    def run_targets(targets):
+        assert len(targets) == 1
+        with lock:
+            started.append(targets[0].name)
+        if targets[0].name == "CUST.FILE":
+            return 2, b"Failed to create CUST.FILE!\n"
+        return 0, f"{targets[0].name} was created successfully!\n".encode()
+
+    lines = []
+    NativeEngine(build_env, run_targets).run(lambda line: lines.append(line.decode()))
+
+    assert sorted(started) == ["CUST.FILE", "LIST.FILE", "OTHER.PGM"]
+    assert "Failed to create CUST.FILE!\n" in lines
+    assert "make: Target 'MAIN.MODULE' not remade because of errors.\n" in lines
+    assert "make: Target 'APP.PGM' not remade because of errors.\n" in lines
+    assert "OTHER.PGM was created successfully!\n" in lines
+
+
+def test_targets_wait_for_their_dependencies(sample_rules_mks):
+    build_env = _build_env(sample_rules_mks, ["APP.PGM"], jobs=4)
+    finished = []
+
+    def run_targets(targets):
+        for target in targets:
+            assert all(dependency in finished for dependency in target.dependencies)
+        finished.extend(target.name for target in targets)
+        return 0, b""
+
+    NativeEngine(build_env, run_targets).run(lambda line: None)
+
+    assert sorted(finished) == ["APP.PGM", "CUST.FILE", "MAIN.MODULE", "UTIL.MODULE"]
+    assert finished[-1] == "APP.PGM"
+
+
+def test_ready_targets_share_a_make_run(sample_rules_mks):
+    build_env = _build_env(sample_rules_mks, ["all"])
+    batches = []
+
+    def run_targets(targets):
+        batches.append([target.name for target in targets])
+        if "OTHER.PGM" in batches[-1]:
+            return 2, b"make: *** [target.mk:18: OTHER.PGM] Error 1\n"
+        return 0, b""
+
+    lines = []
+    NativeEngine(build_env, run_targets).run(lambda line: lines.append(line.decode()))
+
+    assert [sorted(batch) for batch in batches] == [["CUST.FILE", "LIST.FILE", "OTHER.PGM", "UTIL.MODULE"],
+                                                    ["MAIN.MODULE"], ["APP.PGM"]]
+    assert lines[-1] == "make: Target 'OTHER.PGM' not remade because of errors.\n"
@@ -0,0 +1,62 @@
+from pathlib import Path
+
+from makei.project_index import ProjectIndex
+from makei.rules_mk import RulesMk
+
+
+def _add_ignored_dirs(project):
+    (project / ".git").mkdir()
+    (project / ".git" / "Rules.mk").write_text("")
+    (project / ".logs").mkdir()
+    return project
+
+
+def test_index_answers_from_memory(sample_project):
+    index = ProjectIndex(_add_ignored_dirs(sample_project))
+
+    assert sorted(index.listdir(sample_project)) == ["QDDSSRC", "QPROTOSRC", "QRPGLESRC", "Rules.mk"]
+    assert index.exists(Path("QRPGLESRC") / "other.pgm.rpgle")
+    assert index.is_file(sample_project / "QRPGLESRC" / "other.pgm.rpgle")
+    assert index.is_dir("QRPGLESRC")
+    assert not index.exists(".git")
+    assert index.find(sample_project / "QPROTOSRC", "proto.rpgleinc") == "Proto.RPGLEINC"
+    assert index.files_named("Rules.mk") == [Path("Rules.mk"), Path("QDDSSRC/Rules.mk"), Path("QRPGLESRC/Rules.mk")]
+    assert sorted(index.files_with_extension("RPGLE")) == [Path("QRPGLESRC/main.rpgle"),
+                                                           Path("QRPGLESRC/other.pgm.rpgle"),
+                                                           Path("QRPGLESRC/util.rpgle")]
+
+    # Files created afterwards are not seen, the index is built once per invocation
+    (sample_project / "QRPGLESRC" / "new.rpgle").write_text("")
+    assert not index.exists(sample_project / "QRPGLESRC" / "new.rpgle")
+
+
+def test_index_ignore_patterns_and_outside_paths(sample_project, tmp_path_factory):
+    outside = tmp_path_factory.mktemp("outside") / "outside.rpgleinc"
+    outside.write_text("")
+    index = ProjectIndex(_add_ignored_dirs(sample_project), ["*.RPGLEINC", ".git"])
+
+    assert index.exists(".logs")
+    assert index.find(sample_project / "QPROTOSRC", "proto.rpgleinc") is None
+    assert index.exists(outside)
+
+
+def test_rules_mk_parsed_with_index(sample_project):
+    index = ProjectIndex(sample_project)
+    # The case of the subdirectories is corrected from the listing
+    rules_mk_str = "SUBDIRS = qddssrc qrpglesrc\n"
+
+    assert str(RulesMk.from_str(rules_mk_str, Path("."), sample_project, [], index)) == \
+        str(RulesMk.from_str(rules_mk_str, Path("."), sample_project, []))
+    assert RulesMk.from_str(rules_mk_str, Path("."), sample_project, [], index).subdirs == ["QDDSSRC", "QRPGLESRC"]
+
+
+def test_index_does_not_follow_directory_links(sample_project):
+    (sample_project / "QRPGLESRC" / "up").symlink_to("..", target_is_directory=True)
+    index = ProjectIndex(sample_project)
+
+    assert index.files_named("Rules.mk") == [Path("Rules.mk"), Path("QDDSSRC/Rules.mk"), Path("QRPGLESRC/Rules.mk")]
+    assert index.is_dir(Path("QRPGLESRC") / "up")
+    # Paths below the link are answered by the file system
+    assert index.is_file(Path("QRPGLESRC") / "up" / "Rules.mk")
+    assert "Rules.mk" in index.listdir(Path("QRPGLESRC") / "up")
+    assert index.find(sample_project / "QRPGLESRC" / "up" / "QPROTOSRC", "proto.rpgleinc") == "Proto.RPGLEINC"
@@ -1,3 +1,6 @@
+import time
+from pathlib import Path
+
 from makei.rules_mk import RulesMk, MKRule
 from tests.lib.const import DATA_PATH
 
@@ -1190,3 +1193,42 @@ ORD700A.TRG_SRC=ORD700A.SYSTRG
 ORD700A.TRG_DEP=TRGPGM.PGM MYPF1.FILE
 ORD700A.TRG_RECIPE=SYSTRG_TO_TRG_RECIPE
 """)
+
+
+class _ListingIndex:
+    """ Answers the directory listing of the wildcard rules without creating the files"""
+
+    def __init__(self, names):
+        self.names = names
+
+    def listdir(self, _directory):
+        return self.names
+
+    def exists(self, _path):
+        return False
+
+
+def _parse_seconds(rule_count: int) -> float:
+    half = rule_count // 2
+    lines = ["%.MODULE: %.rpgle", "%.MODULE: TGTRLS := *CURRENT"]
+    for i in range(half):
+        lines.append(f"EXPL{i}.MODULE: expl{i}.rpgle")
+        lines.append(f"EXPL{i}.MODULE: TEXT := Explicit {i}")
+    index = _ListingIndex([f"wild{i}.rpgle" for i in range(rule_count - half)])
+    rules_mk_str = "\n".join(lines) + "\n"
+
+    start = time.perf_counter()
+    rules_mk = RulesMk.from_str(rules_mk_str, Path("."), Path("."), [], index)
+    elapsed = time.perf_counter() - start
+
+    assert len(rules_mk.rules) == rule_count
+    assert rules_mk.rules[0].variables == ["TGTRLS := *CURRENT", "TEXT := Explicit 0"]
+    return elapsed
+
+
+def test_from_str_scales_linearly():
+    small = min(_parse_seconds(100) for _ in range(3))
+    large = _parse_seconds(50000)
+
+    # 500 times the rules, a quadratic parser takes about 250000 times as long
+    assert large / small < 500 * 10
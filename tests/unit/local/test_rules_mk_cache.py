@@ -0,0 +1,37 @@
+from pathlib import Path
+
+from makei.rules_mk_cache import RulesMkCache
+
+RULES_MK_PATH = Path("QRPGLESRC") / "Rules.mk"
+
+
+def test_unchanged_rules_mk_is_loaded_from_cache(sample_project):
+    rules_mk = RulesMkCache(sample_project).load(RULES_MK_PATH)
+
+    cache = RulesMkCache(sample_project)
+    cached = cache.load(RULES_MK_PATH)
+
+    assert (cache.hits, cache.misses) == (1, 0)
+    assert str(cached) == str(rules_mk)
+
+
+def test_directory_change_invalidates_cache(sample_project):
+    """A new source can add a target through a wildcard rule"""
+    RulesMkCache(sample_project).load(RULES_MK_PATH)
+    (sample_project / "QRPGLESRC" / "new.clle").write_text("PGM\nENDPGM\n")
+
+    cache = RulesMkCache(sample_project)
+    rules_mk = cache.load(RULES_MK_PATH)
+
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert "NEW.MODULE" in rules_mk.targets["MODULEs"]
+
+
+def test_ibmi_json_change_invalidates_cache(sample_project):
+    RulesMkCache(sample_project).load(RULES_MK_PATH)
+    (sample_project / ".ibmi.json").write_text('{"build": {"objlib": "OTHER"}}')
+
+    cache = RulesMkCache(sample_project)
+    cache.load(RULES_MK_PATH)
+
+    assert cache.misses == 1
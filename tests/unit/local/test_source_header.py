@@ -0,0 +1,41 @@
+import os
+
+from makei.source_header import read_source_header
+from makei.utils import check_keyword_in_file, get_style_dict
+
+
+def test_read_source_header_fixed_form(tmp_path):
+    source = tmp_path / "hello.pgm.rpgle"
+    source.write_text("      * %METADATA                                                      *\n"
+                      "      * %TEXT Hello world program                                      *\n"
+                      "      * %EMETADATA                                                     *\n"
+                      "     H DFTACTGRP(*NO)\n")
+
+    header = read_source_header(source)
+
+    assert header.member_text == "Hello world program"
+    assert not header.free_form
+    assert header.style_dict == get_style_dict(source)
+
+
+def test_read_source_header_free_form_and_text_too_far(tmp_path):
+    source = tmp_path / "hello.sqlrpgle"
+    source.write_text("**FREE\n// %METADATA\n" + "//\n" * 15 + "// %TEXT Too far\n")
+
+    header = read_source_header(source)
+
+    assert header.member_text is None
+    assert header.free_form
+    assert header.style_dict == get_style_dict(source)
+    assert check_keyword_in_file(source, "%TEXT", 15, 2) == 0
+
+
+def test_read_source_header_is_reread_when_the_file_changes(tmp_path):
+    source = tmp_path / "hello.clle"
+    source.write_text("/* %METADATA */\n/* %TEXT First */\n")
+    assert read_source_header(source).member_text == "First"
+
+    source.write_text("/* %METADATA */\n/* %TEXT Second text */\n")
+    os.utime(source, ns=(1, 1))
+    assert read_source_header(source).member_text == "Second text"
+    assert read_source_header(tmp_path / "missing.clle") is None
@@ -0,0 +1,46 @@
+import os
+
+from makei.stmf_ccsid import CcsidCache
+
+
+def _sources(tmp_path):
+    (tmp_path / "QRPGLESRC").mkdir()
+    (tmp_path / "QDDSSRC").mkdir()
+    sources = [tmp_path / "QRPGLESRC" / "main.rpgle", tmp_path / "QRPGLESRC" / "util.rpgle",
+               tmp_path / "QDDSSRC" / "cust.pf"]
+    for source in sources:
+        source.write_text("")
+    return sources
+
+
+def test_prefetch_queries_each_directory_once(tmp_path):
+    sources = _sources(tmp_path)
+    queries = []
+
+    def query(directories):
+        queries.append(directories)
+        return {str(source): "819" for source in sources}
+
+    cache = CcsidCache(tmp_path)
+    assert cache.prefetch(sources, query) == 3
+    cache.save()
+
+    assert queries == [[tmp_path / "QDDSSRC", tmp_path / "QRPGLESRC"]]
+    cache = CcsidCache(tmp_path)
+    assert cache.get(sources[0]) == "819"
+    # Nothing is queried again while the files are unchanged
+    assert cache.prefetch(sources, query) == 0
+    assert len(queries) == 1
+
+
+def test_changed_file_is_read_again(tmp_path):
+    sources = _sources(tmp_path)
+    cache = CcsidCache(tmp_path)
+    cache.prefetch(sources, lambda directories: {str(source): "37" for source in sources})
+
+    stat = sources[1].stat()
+    os.utime(sources[1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert cache.get(sources[0]) == "37"
+    assert cache.get(sources[1]) is None
+    assert cache.prefetch(sources, lambda directories: None) == 0
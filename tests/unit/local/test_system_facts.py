@@ -0,0 +1,40 @@
+from makei import system_facts
+from makei.system_facts import SystemFacts
+
+
+def test_valid_ccsids_are_cached_until_they_expire(tmp_path, monkeypatch):
+    path = tmp_path / "system_facts.json"
+    probes = []
+
+    def validate_ccsid(ccsid):
+        probes.append(ccsid)
+        return ccsid != "1234"
+    monkeypatch.setattr(system_facts, "validate_ccsid", validate_ccsid)
+
+    facts = SystemFacts(path)
+    assert facts.is_valid_ccsid("37")
+    assert not facts.is_valid_ccsid("1234")
+    facts.save()
+
+    facts = SystemFacts(path)
+    assert facts.is_valid_ccsid("37")
+    # Invalid CCSIDs are checked again, they may be installed since
+    assert not facts.is_valid_ccsid("1234")
+    assert probes == ["37", "1234", "1234"]
+
+    assert SystemFacts(path, ttl=0).is_valid_ccsid("37")
+    assert probes == ["37", "1234", "1234", "37"]
+
+
+def test_release_is_probed_once(tmp_path, monkeypatch):
+    path = tmp_path / "system_facts.json"
+    releases = iter(["750", "760"])
+    monkeypatch.setattr(system_facts, "_probe_release", lambda: next(releases))
+
+    facts = SystemFacts(path)
+    assert facts.ibmi_release() == "750"
+    facts.save()
+
+    assert SystemFacts(path).ibmi_release() == "750"
+    path.write_text("not json")
+    assert SystemFacts(path).ibmi_release() == "760"
@@ -1,4 +1,7 @@
-from makei.utils import make_include_dirs_absolute,decompose_filename
+import pytest
+
+from makei.utils import (atomic_write, decompose_filename, is_source_file, make_include_dirs_absolute,
+                         write_if_changed)
 
 
 # flake8: noqa: E501
@@ -56,4 +59,39 @@ def test_decompose_filename():
     expected = ('custinfo1', None, 'PFSQL', '')
     assert decompose_filename("custinfo1.pfsql") == expected
     expected = ('CUSTINFO1', None, 'PFSQL', '')
-    assert decompose_filename("CUSTINFO1.pfsql") == expected
\ No newline at end of file
+    assert decompose_filename("CUSTINFO1.pfsql") == expected
+
+
+def test_decompose_filename_edge_cases():
+    assert decompose_filename("a.b.pgm.rpgle") == ('a.b', None, 'PGM.RPGLE', '')
+    assert decompose_filename("x-y-z.rpgle") == ('x-y-z', None, 'RPGLE', '')
+    assert decompose_filename("pgm.rpgle") == ('', None, 'PGM.RPGLE', '')
+    assert not is_source_file("HELLO.PGM")
+    assert not is_source_file("")
+    with pytest.raises(ValueError, match="as PGM is not a recognized file extension"):
+        decompose_filename("HELLO.PGM")
+    # Cached results are returned as they are, failures are raised each time
+    assert decompose_filename("dir/hello.pgm.rpgle") is decompose_filename("dir/hello.pgm.rpgle")
+    with pytest.raises(ValueError):
+        decompose_filename("HELLO.PGM")
+
+
+def test_atomic_write(tmp_path):
+    path = tmp_path / "cache.json"
+    atomic_write(path, "{}")
+    atomic_write(path, b"[]")
+
+    assert path.read_text() == "[]"
+    assert [entry.name for entry in tmp_path.iterdir()] == ["cache.json"]
+
+    with pytest.raises(OSError):
+        atomic_write(tmp_path / "missing" / "cache.json", "{}")
+    assert [entry.name for entry in tmp_path.iterdir()] == ["cache.json"]
+
+
+def test_write_if_changed(tmp_path):
+    path = tmp_path / "build.mk"
+
+    assert write_if_changed(path, "content") is True
+    assert write_if_changed(path, "content") is False
+    assert path.read_text() == "content"
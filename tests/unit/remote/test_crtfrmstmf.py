@@ -7,7 +7,11 @@ from makei.crtfrmstmf import (
     get_physical_dependencies,
     delete_objects,
     filter_joblogs,
+    source_rcdlen,
+    source_records,
 )
+from makei.db_relations import DbRelations
+from makei.stmf_ccsid import CcsidCache
 
 
 def test_command_map():
@@ -180,6 +184,22 @@ def test_retrieve_ccsid(mock_popen):
     mock_popen.assert_called_once_with("/QOpenSys/usr/bin/attr /path/to/file")
 
 
+@patch("os.popen")
+def test_retrieve_ccsid_from_project_cache(mock_popen, tmp_path):
+    """Test the CCSIDs read by makei are looked up in the project directory, not the current one"""
+    srcstmf = tmp_path / "hello.pgm.clle"
+    srcstmf.write_text("PGM\nENDPGM\n")
+    cache = CcsidCache(tmp_path)
+    cache.prefetch([srcstmf], query=lambda directories: {str(srcstmf): "1208"})
+    cache.save()
+
+    crt = CrtFrmStmf(str(srcstmf), "HELLO", "TESTLIB", "CRTBNDCL", 32000, job=Mock(), setup_job=Mock(),
+                     project_dir=str(tmp_path))
+
+    assert crt.ccsid_c == "*JOB"
+    mock_popen.assert_not_called()
+
+
 def test_check_object_exists():
     """Test check_object_exists function"""
     with patch("pathlib.Path.exists") as mock_exists:
@@ -345,3 +365,189 @@ def test_crtfrmstmf_obj_type_mapping(
             srcstmf="/path/to/source", obj="TESTOBJ", lib="TESTLIB", cmd=cmd, rcdlen=112
         )
         assert crt.obj_type == expected_type, f"Failed for {cmd}"
+
+
+@patch("makei.crtfrmstmf.ibmi_release", return_value="750")
+@patch("makei.crtfrmstmf.retrieve_ccsid", return_value="1208")
+@patch("makei.crtfrmstmf.check_object_exists", return_value=False)
+def test_crtfrmstmf_compiles_from_stream_file(mock_check_exists, mock_retrieve_ccsid, mock_release):
+    """Test commands supporting SRCSTMF compile without the temporary source file"""
+    job = Mock(tmp_src_files={})
+
+    crt = CrtFrmStmf("/path/to/hello.pgm.clle", "HELLO", "TESTLIB", "CRTBNDCL", 32000, job=job, setup_job=Mock())
+    assert crt.run() is True
+
+    commands = [call.args[0] for call in job.run_cl.call_args_list]
+    assert "CRTBNDCL PGM(TESTLIB/HELLO) SRCSTMF('/path/to/hello.pgm.clle')" in commands
+    assert not any(command.startswith(("CRTSRCPF", "CPYFRMSTMF")) for command in commands)
+
+    mock_release.return_value = "720"
+    job.run_cl.reset_mock()
+    assert CrtFrmStmf("/path/to/hello.pgm.clle", "HELLO", "TESTLIB", "CRTBNDCL", 32000, job=job,
+                      setup_job=Mock()).run() is True
+    assert any(call.args[0].startswith("CRTSRCPF") for call in job.run_cl.call_args_list)
+
+
+@patch("makei.crtfrmstmf.ibmi_release", return_value="750")
+@patch("makei.crtfrmstmf.retrieve_ccsid", return_value="37")
+@patch("makei.crtfrmstmf.check_object_exists", return_value=False)
+def test_crtfrmstmf_reuses_temporary_source_file(mock_check_exists, mock_retrieve_ccsid, mock_release):
+    """Test a job compiling several objects creates the temporary source file once"""
+    job = Mock(tmp_src_files={})
+
+    for obj in ("SCREEN1", "SCREEN2"):
+        CrtFrmStmf(f"/path/to/{obj.lower()}.dspf", obj, "TESTLIB", "CRTDSPF", 32000, job=job, setup_job=Mock()).run()
+
+    commands = [call.args[0] for call in job.run_cl.call_args_list]
+    assert [command for command in commands if command.startswith(("DLTF", "CRTSRCPF"))] == [
+        "DLTF FILE(QTEMP/QSOURCE)", "CRTSRCPF FILE(QTEMP/QSOURCE) RCDLEN(32000) MBR(SCREEN1) CCSID(37)"]
+    assert 'CPYFRMSTMF FROMSTMF("/path/to/screen2.dspf") TOMBR("/QSYS.LIB/QTEMP.LIB/QSOURCE.FILE/SCREEN2.MBR") ' \
+           'MBROPT(*REPLACE)' in commands
+    assert "CRTDSPF FILE(TESTLIB/SCREEN2) SRCFILE(QTEMP/QSOURCE) SRCMBR(SCREEN2)" in commands
+
+
+def test_source_rcdlen(tmp_path):
+    """Test the record length fits the longest line, and is at least the default one of the command"""
+    dds = tmp_path / "cust.pf"
+    dds.write_text("     A          R CUSTREC\n     A            CUSTID         7P 0\n")
+    assert source_rcdlen(str(dds), "CRTPF") == 92
+    assert source_rcdlen(str(dds), "CRTQMQRY") == 91
+
+    clle = tmp_path / "hello.clle"
+    clle.write_text("PGM\n" + "x" * 150 + "\n\tSNDPGMMSG MSG('é')\r\nENDPGM\n")
+    assert source_rcdlen(str(clle), "CRTBNDCL") == 162
+    clle.write_text("\tSNDPGMMSG MSG('" + "あ" * 50 + "')\n")
+    assert source_rcdlen(str(clle), "CRTBNDCL") == 8 + 17 + 4 * 50 + 12
+
+    assert source_rcdlen(str(tmp_path / "missing.clle"), "CRTBNDCL") == 32000
+
+
+@patch("makei.crtfrmstmf.save_joblog_json")
+@patch("makei.crtfrmstmf.ibmi_release", return_value="750")
+@patch("makei.crtfrmstmf.retrieve_ccsid", return_value="37")
+@patch("makei.crtfrmstmf.check_object_exists", return_value=False)
+def test_crtfrmstmf_sizes_temporary_source_file(mock_check_exists, mock_retrieve_ccsid, mock_release,
+                                                mock_save_joblog, tmp_path):
+    """Test the temporary source file is created for the longest line and reused while not twice as long"""
+    job = Mock(tmp_src_files={})
+    for name, length in (("short", 70), ("longer", 150), ("longest", 400)):
+        (tmp_path / f"{name}.dspf").write_text("A" * length + "\n")
+
+    def compile_dspf(name):
+        crt = CrtFrmStmf(str(tmp_path / f"{name}.dspf"), name.upper(), "TESTLIB", "CRTDSPF", job=job,
+                         setup_job=Mock(), joblog_path=str(tmp_path / "joblog.json"))
+        crt.run()
+        return crt.rcdlen
+
+    assert [compile_dspf(name) for name in ("longer", "short", "longest")] == [162, 162, 412]
+    assert [call.args[0] for call in job.run_cl.call_args_list if call.args[0].startswith("CRTSRCPF")] == [
+        "CRTSRCPF FILE(QTEMP/QSOURCE) RCDLEN(162) MBR(LONGER) CCSID(37)",
+        "CRTSRCPF FILE(QTEMP/QSOURCE) RCDLEN(412) MBR(LONGEST) CCSID(37)"]
+    assert mock_save_joblog.call_args.kwargs["rcdlen"] == 412
+
+
+def test_source_records(tmp_path):
+    """Test the records carry the sequence numbers and the lines with the tabs expanded"""
+    menu = tmp_path / "main.menu"
+    menu.write_text("     A          R MAIN\r\n\tA  é\n")
+    assert source_records(str(menu)) == [(1, 0, "     A          R MAIN"), (2, 0, "        A  é")]
+
+    menu.write_text("A\n" * 10000)
+    records = source_records(str(menu))
+    assert str(records[0][0]) == "0.01" and str(records[-1][0]) == "100"
+
+
+@patch("makei.crtfrmstmf.ibmi_release", return_value="750")
+@patch("makei.crtfrmstmf.retrieve_ccsid", return_value="1208")
+@patch("makei.crtfrmstmf.check_object_exists", return_value=False)
+def test_crtfrmstmf_inserts_source_records(mock_check_exists, mock_retrieve_ccsid, mock_release, tmp_path):
+    """Test the insert engine uploads the records over the job, and falls back to CPYFRMSTMF"""
+    job = Mock(tmp_src_files={})
+    job.run_cl.side_effect = lambda cmd, *args, **kwargs: not cmd.startswith("CLRPFM")
+    dspf = tmp_path / "screen.dspf"
+    dspf.write_text("     A          R SCREEN\n")
+
+    CrtFrmStmf(str(dspf), "SCREEN", "TESTLIB", "CRTDSPF", job=job, setup_job=Mock(), upload="insert").run()
+    commands = [call.args[0] for call in job.run_cl.call_args_list]
+    assert "ADDPFM FILE(QTEMP/QSOURCE) MBR(SCREEN)" in commands
+    assert not any(command.startswith("CPYFRMSTMF") for command in commands)
+    job.run_sql.assert_any_call("CREATE OR REPLACE ALIAS QTEMP.MAKEI_UPLOAD FOR QTEMP.QSOURCE (SCREEN)")
+    job.insert_rows.assert_called_once_with("QTEMP.MAKEI_UPLOAD", ("SRCSEQ", "SRCDAT", "SRCDTA"),
+                                            [(1, 0, "     A          R SCREEN")], 500)
+
+    dspf.write_bytes(b"     A          R \xe9CRAN\n")
+    job.run_cl.reset_mock()
+    CrtFrmStmf(str(dspf), "SCREEN", "TESTLIB", "CRTDSPF", job=job, setup_job=Mock(), upload="insert").run()
+    assert any(call.args[0].startswith("CPYFRMSTMF") for call in job.run_cl.call_args_list)
+
+
+@patch("makei.crtfrmstmf.Path.exists", return_value=True)
+def test_get_physical_dependencies_from_db_relations(mock_exists, tmp_path):
+    """Test the dependents read for the build are used instead of DSPDBR"""
+    path = tmp_path / "dbrelations.json"
+    DbRelations.create(path, ["TESTLIB"], lambda libraries: {"TESTLIB/TESTPF": [["TESTLF", "TESTLIB"]]})
+    job = Mock()
+
+    deps = get_physical_dependencies("TESTPF", "TESTLIB", True, job, relations=DbRelations(path))
+    assert deps == [("TESTLF", "TESTLIB", "FILE"), ("TESTPF", "TESTLIB", "FILE")]
+    job.run_cl.assert_not_called()
+
+    job.run_sql.return_value = ([("          ", "          ")], ["WHREFI", "WHRELI"])
+    assert get_physical_dependencies("TESTPF", "OTHERLIB", True, job, relations=DbRelations(path)) == [
+        ("TESTPF", "OTHERLIB", "FILE")]
+    job.run_cl.assert_called_once_with("DSPDBR FILE(OTHERLIB/TESTPF) OUTPUT(*OUTFILE) OUTFILE(QTEMP/DEPOUT)")
+
+
+@patch("makei.crtfrmstmf.ibmi_release", return_value="750")
+@patch("makei.crtfrmstmf.retrieve_ccsid", return_value="37")
+@patch("makei.crtfrmstmf.check_object_exists", return_value=True)
+@patch("makei.crtfrmstmf.Path.exists", return_value=True)
+def test_crtfrmstmf_records_db_relations(mock_exists, mock_check_exists, mock_retrieve_ccsid, mock_release,
+                                         tmp_path):
+    """Test the files deleted and created by the compiles are seen by the next ones of the build"""
+    path = tmp_path / "dbrelations.json"
+    DbRelations.create(path, ["TESTLIB"], lambda libraries: {"TESTLIB/TESTPF": [["TESTLF", "TESTLIB"]]})
+    setup_job = Mock()
+    setup_job.run_sql.return_value = ([("TESTPF    ", "TESTLIB   ")], ["SYSTEM_TABLE_NAME", "SYSTEM_TABLE_SCHEMA"])
+
+    crt = CrtFrmStmf("/path/to/testpf.pf", "TESTPF", "TESTLIB", "CRTPF", 100, job=Mock(tmp_src_files={}),
+                     setup_job=setup_job, db_relations=str(path))
+    assert crt.back_up_obj_list == [("TESTLF", "TESTLIB", "FILE"), ("TESTPF", "TESTLIB", "FILE")]
+    assert crt.run() is True
+    assert DbRelations(path).dependents("TESTPF", "TESTLIB") == []
+
+    CrtFrmStmf("/path/to/testlf.lf", "TESTLF", "TESTLIB", "CRTLF", 100, job=Mock(tmp_src_files={}),
+               setup_job=setup_job, db_relations=str(path)).run()
+    assert DbRelations(path).dependents("TESTPF", "TESTLIB") == [("TESTLF", "TESTLIB")]
+
+
+@patch("makei.crtfrmstmf.ibmi_release", return_value="750")
+@patch("makei.crtfrmstmf.retrieve_ccsid", return_value="37")
+@patch("makei.crtfrmstmf.check_object_exists", return_value=True)
+def test_crtfrmstmf_recompiles_on_reused_job(mock_check_exists, mock_retrieve_ccsid, mock_release):
+    """Test a job kept by the compile server can back up objects of the same library again"""
+    setup_job = Mock()
+    for obj in ("SCREEN1", "SCREEN2"):
+        assert CrtFrmStmf(f"/path/to/{obj.lower()}.dspf", obj, "TESTLIB", "CRTDSPF", 100, job=Mock(tmp_src_files={}),
+                          setup_job=setup_job).run() is True
+
+    commands = [call.args[0] for call in setup_job.run_cl.call_args_list if "QTEMP/TESTLIB" in call.args[0]]
+    assert [command.split()[0] for command in commands] == ["DLTF", "CRTSAVF", "SAVOBJ", "DLTF"] * 2
+
+
+@patch("makei.crtfrmstmf.ibmi_release", return_value="750")
+@patch("makei.crtfrmstmf.retrieve_ccsid", return_value="37")
+@patch("makei.crtfrmstmf.check_object_exists", return_value=True)
+def test_crtfrmstmf_reports_failed_backup(mock_check_exists, mock_retrieve_ccsid, mock_release):
+    """Test a backup that cannot be made fails the compile instead of raising"""
+    def run_cl(cmd, *args, **kwargs):
+        if cmd.startswith(("CRTSAVF", "RSTOBJ")):
+            raise Exception(cmd)
+        return True
+
+    job = Mock(tmp_src_files={})
+    setup_job = Mock()
+    setup_job.run_cl.side_effect = run_cl
+    assert CrtFrmStmf("/path/to/screen.dspf", "SCREEN", "TESTLIB", "CRTDSPF", 100, job=job,
+                      setup_job=setup_job).run() is False
+    assert not any(call.args[0].startswith("CRTDSPF") for call in job.run_cl.call_args_list)
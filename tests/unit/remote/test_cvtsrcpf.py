@@ -1,8 +1,10 @@
+import json
 import pytest
 from pathlib import Path
 from unittest.mock import Mock, patch
 from tempfile import TemporaryDirectory
-from makei.cvtsrcpf import CvtSrcPf, retrieve_ccsid
+from makei.cvtsrcpf import ConversionProgress, CvtSrcPf, retrieve_ccsid, write_source
+from makei.ibm_job import JobEnv
 
 
 @pytest.fixture
@@ -380,3 +382,130 @@ def test_cvtsrcpf_import_member_text_no_style(
 
     # Should return False when no style dict
     assert result is False
+
+
+@patch("makei.cvtsrcpf.retrieve_ccsid", return_value="37")
+@patch("makei.cvtsrcpf.objlib_to_path")
+@patch("makei.cvtsrcpf.IBMJob")
+def test_cvtsrcpf_run_in_parallel(mock_ibm_job, mock_objlib_to_path, mock_retrieve_ccsid, temp_directory):
+    """Test run with several jobs, the member text comes from the list of members"""
+    jobs = []
+
+    def new_job():
+        job = Mock(env=JobEnv())
+        job.run_cl.return_value = True
+        job.run_sql.return_value = (
+            [("PGM1", "RPGLE", "First"), ("PGM2", "RPGLE", None), ("PGM3", "CLLE", "Third")],
+            ["SYSTEM_TABLE_MEMBER", "SOURCE_TYPE", "PARTITION_TEXT"],
+        )
+        jobs.append(job)
+        return job
+
+    mock_ibm_job.side_effect = new_job
+    mock_objlib_to_path.return_value = str(temp_directory)
+    (temp_directory / "PGM1.RPGLE").touch()
+
+    cvt = CvtSrcPf("QRPGLESRC", "MYLIB", False, text=True, save_path=temp_directory, jobs=3)
+    with patch.object(cvt, "import_member_text", return_value=True) as mock_import:
+        assert cvt.run() == 3
+    cvt.close()
+
+    assert cvt.member_texts == {"PGM1": "First", "PGM2": None, "PGM3": "Third"}
+    assert sorted(call.args for call in mock_import.call_args_list) == [
+        (temp_directory / "PGM1_1.RPGLE", "First"), (temp_directory / "PGM3.CLLE", "Third")]
+    # The member text is not queried member by member
+    assert sum(job.run_sql.call_count for job in jobs) == 1
+    assert sum(job.run_cl.call_count for job in jobs) == 3
+
+
+def test_conversion_progress():
+    """Test the progress reports of ConversionProgress"""
+    reports = []
+    progress = ConversionProgress(3, interval=0, report=reports.append)
+
+    progress.update(True)
+    progress.update(False)
+    progress.update(True)
+
+    assert len(reports) == 2
+    assert reports[0].startswith("Progress: 1/3 members, ")
+    assert progress.summary().startswith("Converted 2 of 3 members in ")
+    assert progress.summary().endswith(", 1 failed")
+
+
+@pytest.mark.parametrize("name, lines", [
+    ("test.rpgle", ["     H DFTACTGRP(*NO)", "     C                   RETURN"]),
+    ("free.rpgle", ["**FREE", "dcl-s myVar char(10);"]),
+    ("test.clle", ["PGM", "ENDPGM"]),
+])
+@patch("makei.cvtsrcpf.IBMJob")
+def test_write_source_matches_import_member_text(mock_ibm_job, name, lines, temp_directory):
+    """Test write_source writes the member text where import_member_text inserts it"""
+    cvt = CvtSrcPf("QRPGLESRC", "MYLIB", False, save_path=temp_directory)
+    (temp_directory / "imported").mkdir()
+    imported = temp_directory / "imported" / name
+    imported.write_text("".join(f"{line}\n" for line in lines))
+    cvt.import_member_text(imported, "Test description")
+
+    assert write_source(iter(lines), temp_directory / name, "Test description") is True
+    assert (temp_directory / name).read_text() == imported.read_text()
+    # An existing %TEXT is left alone
+    assert write_source(iter(imported.read_text().splitlines()), temp_directory / name, "Other") is False
+
+
+@patch("makei.cvtsrcpf.IBMJob")
+def test_cvtsrcpf_stream_src_mbr(mock_ibm_job, temp_directory):
+    """Test _stream_src_mbr writes the records of the member in UTF-8"""
+    mock_job_instance = Mock()
+    mock_ibm_job.return_value = mock_job_instance
+    mock_job_instance.iter_sql.return_value = iter([("**FREE   ",), ("dsply 'é';  ",)])
+
+    cvt = CvtSrcPf("QRPGLESRC", "MYLIB", False, save_path=temp_directory)
+    dst_path = temp_directory / "testpgm.rpgle"
+
+    assert cvt._stream_src_mbr("TESTPGM", "testpgm.rpgle", dst_path, None) is True
+    assert dst_path.read_bytes() == "**FREE\ndsply 'é';\n".encode("utf-8")
+    mock_job_instance.run_sql.assert_called_once_with(
+        "CREATE OR REPLACE ALIAS QTEMP.MAKEI_CVTSRCPF FOR MYLIB.QRPGLESRC (TESTPGM)")
+    mock_job_instance.run_cl.assert_called_once()
+    assert list(temp_directory.iterdir()) == [dst_path]
+
+
+@patch("makei.cvtsrcpf.retrieve_ccsid", return_value="37")
+@patch("makei.cvtsrcpf.objlib_to_path")
+@patch("makei.cvtsrcpf.IBMJob")
+def test_cvtsrcpf_sync(mock_ibm_job, mock_objlib_to_path, mock_retrieve_ccsid, temp_directory):
+    """Test run with sync only converts the new and changed members, over their files"""
+    mock_job_instance = Mock()
+    mock_ibm_job.return_value = mock_job_instance
+    mock_objlib_to_path.return_value = str(temp_directory)
+
+    def convert(cmd, **kwargs):
+        Path(cmd.split("TOSTMF('")[1].split("')")[0]).touch()
+        return True
+
+    mock_job_instance.run_cl.side_effect = convert
+    mock_job_instance.run_sql.return_value = (
+        [("PGM1", "RPGLE", None, "2024-01-01 10:00:00", 100), ("PGM2", "RPGLE", None, "2024-01-01 10:00:00", 100)],
+        ["SYSTEM_TABLE_MEMBER", "SOURCE_TYPE", "PARTITION_TEXT", "LAST_CHANGE_TIMESTAMP", "DATA_SIZE"],
+    )
+    # Converted by an earlier run without --sync
+    (temp_directory / "PGM1.RPGLE").touch()
+
+    assert CvtSrcPf("QRPGLESRC", "MYLIB", False, save_path=temp_directory, sync=True).run() == 2
+    assert sorted(path.name for path in temp_directory.iterdir()) == [
+        ".cvtsrcpf.json", ".ibmi.json", "PGM1.RPGLE", "PGM2.RPGLE"]
+
+    mock_job_instance.run_sql.return_value = (
+        [("PGM1", "RPGLE", None, "2024-01-01 10:00:00", 100), ("PGM2", "RPGLE", None, "2024-02-01 10:00:00", 120),
+         ("PGM3", "RPGLE", None, "2024-02-01 10:00:00", 80)],
+        ["SYSTEM_TABLE_MEMBER", "SOURCE_TYPE", "PARTITION_TEXT", "LAST_CHANGE_TIMESTAMP", "DATA_SIZE"],
+    )
+    mock_job_instance.run_cl.reset_mock()
+
+    assert CvtSrcPf("QRPGLESRC", "MYLIB", False, save_path=temp_directory, sync=True).run() == 2
+    converted = sorted(call.args[0].split("TOSTMF('")[1].split("')")[0]
+                       for call in mock_job_instance.run_cl.call_args_list)
+    assert converted == [str(temp_directory / "PGM2.RPGLE"), str(temp_directory / "PGM3.RPGLE")]
+    manifest = json.loads((temp_directory / ".cvtsrcpf.json").read_text())["members"]
+    assert manifest["MYLIB/QRPGLESRC/PGM2"] == {"file": "PGM2.RPGLE", "changed": "2024-02-01 10:00:00", "size": 120}
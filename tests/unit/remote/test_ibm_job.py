@@ -3,7 +3,8 @@ import json
 from unittest.mock import Mock, patch, MagicMock
 from pathlib import Path
 from tempfile import NamedTemporaryFile
-from makei.ibm_job import IBMJob, get_joblog_for_job, save_joblog_json
+from makei.ibm_job import IBMJob, IBMJobPool, JobEnv, get_joblog_for_job, save_joblog_json
+from makei.joblog_store import merge_segments
 
 
 @patch("makei.ibm_job.ibm_db_dbi")
@@ -195,6 +196,25 @@ def test_ibmjob_run_sql_failure(mock_ibm_db):
         job.run_sql("INVALID SQL")
 
 
+@patch("makei.ibm_job.ibm_db_dbi")
+def test_ibmjob_insert_rows(mock_ibm_db):
+    """Test insert_rows sends the rows in multi-row INSERTs of batch_size rows"""
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_cursor.fetchall.return_value = [("123456/USER/JOBNAME",)]
+    mock_cursor.description = [("JOB_NAME",)]
+    mock_conn.cursor.return_value = mock_cursor
+    mock_ibm_db.connect.return_value = mock_conn
+
+    job = IBMJob()
+    mock_cursor.execute.reset_mock()
+
+    assert job.insert_rows("QTEMP.T", ("A", "B"), [(1, "x"), (2, "y"), (3, "z")], batch_size=2) == 3
+    assert [call.args for call in mock_cursor.execute.call_args_list] == [
+        ("INSERT INTO QTEMP.T (A, B) VALUES (?, ?), (?, ?)", [1, "x", 2, "y"]),
+        ("INSERT INTO QTEMP.T (A, B) VALUES (?, ?)", [3, "z"])]
+
+
 @patch("makei.ibm_job.ibm_db_dbi")
 def test_ibmjob_run_sql_failure_ignored(mock_ibm_db):
     """Test run_sql method with failed query and ignore_errors=True"""
@@ -363,7 +383,7 @@ def test_save_joblog_json_new_file(mock_format_dt, mock_get_joblog):
             cmd="CRTPGM PGM(TEST)",
             cmd_time="2024-01-01 12:00:00",
             jobid="123456/USER/JOBNAME",
-            object="TEST.PGM",
+            build_object="TEST.PGM",
             source="/path/to/source.rpgle",
             output="",
             failed=False,
@@ -371,6 +391,7 @@ def test_save_joblog_json_new_file(mock_format_dt, mock_get_joblog):
         )
 
         # Verify file was created and contains data
+        merge_segments(temp_path)
         with open(temp_path, "r") as f:
             data = json.load(f)
 
@@ -401,7 +422,7 @@ def test_save_joblog_json_append(mock_format_dt, mock_get_joblog):
             cmd="NEW COMMAND",
             cmd_time="2024-01-01 12:00:00",
             jobid="123456/USER/JOBNAME",
-            object="NEW.PGM",
+            build_object="NEW.PGM",
             source="/path/to/source.rpgle",
             output="",
             failed=False,
@@ -409,6 +430,7 @@ def test_save_joblog_json_append(mock_format_dt, mock_get_joblog):
         )
 
         # Verify data was appended
+        merge_segments(temp_path)
         with open(temp_path, "r") as f:
             data = json.load(f)
 
@@ -473,7 +495,7 @@ def test_save_joblog_json_with_filter(mock_format_dt, mock_get_joblog):
             cmd="TEST",
             cmd_time="2024-01-01 12:00:00",
             jobid="123456/USER/JOBNAME",
-            object="TEST.PGM",
+            build_object="TEST.PGM",
             source="/path/to/source.rpgle",
             output="",
             failed=False,
@@ -481,6 +503,7 @@ def test_save_joblog_json_with_filter(mock_format_dt, mock_get_joblog):
             filter_func=filter_func,
         )
 
+        merge_segments(temp_path)
         with open(temp_path, "r") as f:
             data = json.load(f)
 
@@ -490,3 +513,165 @@ def test_save_joblog_json_with_filter(mock_format_dt, mock_get_joblog):
     finally:
         if Path(temp_path).exists():
             Path(temp_path).unlink()
+
+
+def _fake_job():
+    job = Mock()
+    job.env = JobEnv()
+    job.untracked_changes = False
+    job.apply_env.side_effect = lambda settings: _apply(job, settings)
+    return job
+
+
+def _apply(job, settings):
+    target = JobEnv.from_settings(settings)
+    changed = int(target != job.env)
+    job.env = target
+    return changed
+
+
+def test_job_env_reset_commands():
+    """Only the parts of the library list that differ are changed when a job is reset"""
+    job = IBMJob.__new__(IBMJob)
+    job.env = JobEnv.from_settings({"curlib": "MYLIB", "preUsrlibl": "LIB1", "postUsrlibl": "LIB3"})
+    job.added_libs = {"LIB1", "LIB3"}
+    job.job_id = "123456/USER/JOBNAME"
+    job.run_cl = Mock(return_value=True)
+
+    count = job.apply_env({"curlib": "MYLIB", "preUsrlibl": "LIB2", "postUsrlibl": "LIB3"})
+
+    cmds = [call.args[0] for call in job.run_cl.call_args_list]
+    assert cmds == ["RMVLIBLE LIB(LIB1)", "ADDLIBLE LIB(LIB2) POSITION(*FIRST)"]
+    assert count == 2
+    assert job.added_libs == {"LIB2", "LIB3"}
+
+
+def test_job_env_cannot_undo_env_cmds():
+    """Jobs with environment commands can only be leased again for the same commands"""
+    env = JobEnv.from_settings({"IBMiEnvCmd": "CHGJOB CCSID(37)"})
+
+    assert not env.can_reset_to(JobEnv())
+    assert env.can_reset_to(JobEnv.from_settings({"curlib": "MYLIB", "IBMiEnvCmd": "CHGJOB CCSID(37)"}))
+    assert JobEnv().can_reset_to(env)
+
+
+def test_job_env_runs_env_cmds_once():
+    """Environment commands run when they change, and the job stays poolable"""
+    job = IBMJob.__new__(IBMJob)
+    job.env = JobEnv()
+    job.added_libs = set()
+    job.untracked_changes = False
+    job.job_id = "123456/USER/JOBNAME"
+    job.run_cl = Mock(return_value=True)
+
+    assert job.apply_env({"IBMiEnvCmd": "CHGJOB CCSID(37)"}) == 1
+    assert job.apply_env({"IBMiEnvCmd": "CHGJOB CCSID(37)"}) == 0
+    with pytest.raises(ValueError):
+        job.apply_env({"IBMiEnvCmd": "CHGJOB CCSID(500)"})
+
+    assert [call.args[0] for call in job.run_cl.call_args_list] == ["CHGJOB CCSID(37)"]
+    assert not job.untracked_changes
+
+
+def test_job_pool_reuse_and_reset():
+    """Jobs are reused as is for the same environment and reset for another one"""
+    pool = IBMJobPool(max_size=2, job_factory=_fake_job)
+
+    job = pool.lease({"curlib": "MYLIB"})
+    pool.release(job)
+    assert pool.lease({"curlib": "MYLIB"}) is job
+    pool.release(job)
+    assert pool.lease({"curlib": "OTHER"}) is job
+
+    stats = pool.stats()
+    assert stats["connects"] == 1
+    assert stats["reuse_hits"] == 1
+    assert stats["resets"] == 1
+
+
+def test_job_pool_keeps_jobs_with_env_cmds():
+    """Jobs that ran environment commands are only handed out again for the same commands"""
+    pool = IBMJobPool(max_size=1, job_factory=_fake_job)
+    env_cmds = {"IBMiEnvCmd": "CHGJOB CCSID(37)"}
+
+    job = pool.lease(env_cmds)
+    pool.release(job)
+    assert pool.lease(env_cmds) is job
+    pool.release(job)
+    assert pool.lease(dict(env_cmds, curlib="MYLIB")) is job
+    pool.release(job)
+    job.close.assert_not_called()
+
+    other = pool.lease({"IBMiEnvCmd": "CHGJOB CCSID(500)"})
+    assert other is not job
+    job.close.assert_called_once()
+
+    stats = pool.stats()
+    assert stats["reuse_hits"] == 1
+    assert stats["resets"] == 1
+    assert stats["evictions"] == 1
+    assert stats["size"] == 1
+
+
+def test_job_pool_discards_jobs_with_untracked_changes():
+    """Jobs that ran a precmd or a postcmd are not handed out again"""
+    pool = IBMJobPool(max_size=1, job_factory=_fake_job)
+
+    job = pool.lease({})
+    job.untracked_changes = True
+    pool.release(job)
+    other = pool.lease({})
+
+    assert other is not job
+    job.close.assert_called_once()
+    assert pool.stats()["size"] == 1
+
+
+def test_job_env_restores_initial_curlib():
+    """An empty curlib puts back the current library the job started with"""
+    job = IBMJob.__new__(IBMJob)
+    job.env = JobEnv()
+    job.added_libs = set()
+    job.initial_curlib = None
+    job.untracked_changes = False
+    job.run_cl = Mock(return_value=True)
+    job.run_sql = Mock(return_value=([("USRLIB    ",)], ["SYSTEM_SCHEMA_NAME"]))
+
+    job.apply_env({"curlib": "MYLIB"})
+    job.apply_env({})
+    job.apply_env({"curlib": "OTHER"})
+
+    assert [call.args[0] for call in job.run_cl.call_args_list] == [
+        "CHGCURLIB CURLIB(MYLIB)", "CHGCURLIB CURLIB(USRLIB)", "CHGCURLIB CURLIB(OTHER)"]
+    job.run_sql.assert_called_once()
+
+    job.initial_curlib = None
+    job.env = JobEnv()
+    job.run_sql.return_value = ([], ["SYSTEM_SCHEMA_NAME"])
+    job.apply_env({"curlib": "MYLIB"})
+    job.apply_env({})
+    assert job.run_cl.call_args_list[-1].args[0] == "CHGCURLIB CURLIB(*CRTDFT)"
+
+
+def test_job_pool_idle_eviction():
+    """Jobs idle for longer than the timeout are closed"""
+    pool = IBMJobPool(max_size=2, idle_timeout=0, job_factory=_fake_job)
+
+    job = pool.lease()
+    pool.release(job)
+
+    job.close.assert_called_once()
+    assert pool.stats()["idle"] == 0
+    assert pool.stats()["size"] == 0
+
+
+def test_job_pool_discard_on_failure():
+    """Jobs are not handed out again when the code using them failed"""
+    pool = IBMJobPool(max_size=2, job_factory=_fake_job)
+
+    with pytest.raises(RuntimeError):
+        with pool.job() as job:
+            raise RuntimeError("compile failed")
+
+    job.close.assert_called_once()
+    assert pool.stats()["size"] == 0
@@ -0,0 +1,105 @@
+from unittest.mock import Mock, patch
+
+from makei.crtfrmstmf import CrtFrmStmf
+from makei.obj_backup import BACKUP_STRATEGIES, MoveBackup, ObjectBackup, RenameBackup, SavfBackup
+
+OBJECTS = [("CUSTL1", "APPLIB", "FILE"), ("CUST", "APPLIB", "FILE")]
+
+
+def _commands(job):
+    return [call.args[0] for call in job.run_cl.call_args_list]
+
+
+def test_backup_strategies():
+    assert set(BACKUP_STRATEGIES) == {"savf", "move", "rename", "none"}
+
+
+def test_savf_backup():
+    """Test the objects are saved to a save file and deleted, and restored from it"""
+    job = Mock()
+    backup = SavfBackup(job, OBJECTS)
+    backup.backup()
+    backup.restore()
+
+    commands = _commands(job)
+    assert commands[:3] == ["DLTF FILE(QTEMP/APPLIB)", "CRTSAVF FILE(QTEMP/APPLIB)", commands[2]]
+    assert commands[2].startswith("SAVOBJ OBJ(") and " LIB(APPLIB) " in commands[2]
+    assert commands[3:5] == ["DLTOBJ OBJ(APPLIB/CUSTL1) OBJTYPE(*FILE)", "DLTOBJ OBJ(APPLIB/CUST) OBJTYPE(*FILE)"]
+    assert commands[5].startswith("RSTOBJ OBJ(") and " SAVLIB(APPLIB) " in commands[5]
+    assert set(backup.timings) == {"backup", "restore"}
+    assert backup.to_dict()["strategy"] == "savf"
+    assert backup.to_dict()["objects"] == 2
+
+
+def test_move_backup():
+    """Test the objects are moved to QTEMP, and back with the physical file first"""
+    job = Mock()
+    backup = MoveBackup(job, OBJECTS)
+    backup.backup()
+    assert [command for command in _commands(job) if command.startswith("MOVOBJ")] == [
+        "MOVOBJ OBJ(APPLIB/CUSTL1) OBJTYPE(*FILE) TOLIB(QTEMP)", "MOVOBJ OBJ(APPLIB/CUST) OBJTYPE(*FILE) TOLIB(QTEMP)"]
+
+    job.run_cl.reset_mock()
+    backup.restore()
+    assert [command for command in _commands(job) if command.startswith("MOVOBJ")] == [
+        "MOVOBJ OBJ(QTEMP/CUST) OBJTYPE(*FILE) TOLIB(APPLIB)", "MOVOBJ OBJ(QTEMP/CUSTL1) OBJTYPE(*FILE) TOLIB(APPLIB)"]
+
+
+def test_rename_backup():
+    """Test the objects are renamed in their library, and deleted once the compile succeeded"""
+    job = Mock()
+    backup = RenameBackup(job, OBJECTS)
+    assert all(len(name) <= 10 for name in backup.backup_names)
+    assert len(set(backup.backup_names)) == 2
+
+    backup.backup()
+    backup.discard()
+    assert _commands(job) == [
+        f"RNMOBJ OBJ(APPLIB/CUSTL1) OBJTYPE(*FILE) NEWOBJ({backup.backup_names[0]})",
+        f"RNMOBJ OBJ(APPLIB/CUST) OBJTYPE(*FILE) NEWOBJ({backup.backup_names[1]})",
+        f"DLTOBJ OBJ(APPLIB/{backup.backup_names[0]}) OBJTYPE(*FILE)",
+        f"DLTOBJ OBJ(APPLIB/{backup.backup_names[1]}) OBJTYPE(*FILE)"]
+    assert set(backup.timings) == {"backup", "discard"}
+
+
+def test_no_backup():
+    """Test the objects are only deleted, and nothing runs without objects"""
+    job = Mock()
+    backup = ObjectBackup(job, OBJECTS)
+    backup.backup()
+    backup.restore()
+    assert _commands(job) == ["DLTOBJ OBJ(APPLIB/CUSTL1) OBJTYPE(*FILE)", "DLTOBJ OBJ(APPLIB/CUST) OBJTYPE(*FILE)"]
+
+    job.run_cl.reset_mock()
+    backup = SavfBackup(job, [])
+    backup.backup()
+    backup.discard()
+    job.run_cl.assert_not_called()
+    assert backup.timings == {}
+
+
+@patch("makei.crtfrmstmf.save_joblog_json")
+@patch("makei.crtfrmstmf.ibmi_release", return_value="750")
+@patch("makei.crtfrmstmf.retrieve_ccsid", return_value="37")
+@patch("makei.crtfrmstmf.check_object_exists", return_value=True)
+def test_crtfrmstmf_restores_with_backup_strategy(mock_check_exists, mock_retrieve_ccsid, mock_release,
+                                                  mock_save_joblog, tmp_path):
+    """Test a failed compile puts the objects back with the chosen strategy and records its timings"""
+    def run_cl(cmd, *args, **kwargs):
+        if cmd.startswith("CRTDSPF"):
+            raise Exception(cmd)
+        return True
+
+    job = Mock(tmp_src_files={})
+    job.run_cl.side_effect = run_cl
+    setup_job = Mock()
+
+    crt = CrtFrmStmf("/path/to/screen.dspf", "SCREEN", "APPLIB", "CRTDSPF", 100, job=job, setup_job=setup_job,
+                     joblog_path=str(tmp_path / "joblog.json"), backup="move")
+    assert crt.run() is False
+
+    assert _commands(setup_job)[-1] == "MOVOBJ OBJ(QTEMP/SCREEN) OBJTYPE(*FILE) TOLIB(APPLIB)"
+    backup = mock_save_joblog.call_args.kwargs["backup"]
+    assert backup["strategy"] == "move"
+    assert backup["objects"] == 1
+    assert set(backup) == {"strategy", "objects", "backup", "restore"}